@@ -0,0 +1,126 @@
+"""Throughput comparison of ResourceManager and AsyncResourceManager.
+
+Runs the same search_resource call many times against a real mongod, first from a
+thread pool with the sync manager and then as coroutines with the async manager.
+
+Usage:
+    PYTHONPATH=src python benchmark/async_manager_benchmark.py \
+        --host mongodb://localhost:27017 --domain-id domain-xxx \
+        --resource-type inventory.CloudService --requests 1000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from spaceone.core import config
+
+from cloudforet.search.manager.resource_manager import ResourceManager
+from cloudforet.search.manager.async_resource_manager import AsyncResourceManager
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="mongodb://localhost:27017")
+    parser.add_argument("--username", default="")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--db-prefix", default="")
+    parser.add_argument("--domain-id", required=True)
+    parser.add_argument("--resource-type", default="inventory.CloudService")
+    parser.add_argument("--keyword", default="")
+    parser.add_argument("--limit", type=int, default=15)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    return parser.parse_args()
+
+
+def _init_config(args: argparse.Namespace) -> None:
+    config.init_conf(package="cloudforet.search")
+    config.set_global(
+        DATABASES={
+            "default": {
+                "db_prefix": args.db_prefix,
+                "username": args.username,
+                "password": args.password,
+                "host": args.host,
+            }
+        }
+    )
+    # identical concurrent calls would share one query and time only the first
+    config.set_global_force(
+        SEARCH_SINGLE_FLIGHT={"enabled": False},
+        SEARCH_RESULT_CACHE={"enabled": False},
+    )
+
+
+def _make_search_args(args: argparse.Namespace) -> tuple:
+    find_filter = {
+        "$and": [
+            {"domain_id": args.domain_id},
+            {"name": {"$regex": f".*{args.keyword}.*", "$options": "i"}},
+        ]
+    }
+    return args.domain_id, find_filter, {}, args.resource_type, args.limit
+
+
+def _summarize(name: str, latencies: list, elapsed: float) -> None:
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(
+        f"{name:<6} requests: {len(latencies)}, "
+        f"throughput: {len(latencies) / elapsed:.1f} req/s, "
+        f"mean: {statistics.mean(latencies) * 1000:.2f} ms, "
+        f"p50: {p50:.2f} ms, p99: {p99:.2f} ms"
+    )
+
+
+def run_sync(args: argparse.Namespace) -> None:
+    resource_mgr = ResourceManager()
+    search_args = _make_search_args(args)
+
+    def _search() -> float:
+        start = time.perf_counter()
+        resource_mgr.search_resource(*search_args)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        start = time.perf_counter()
+        latencies = list(executor.map(lambda _: _search(), range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    _summarize("sync", latencies, elapsed)
+
+
+def run_async(args: argparse.Namespace) -> None:
+    resource_mgr = AsyncResourceManager()
+    search_args = _make_search_args(args)
+
+    async def _run_all() -> tuple:
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def _search() -> float:
+            async with semaphore:
+                start = time.perf_counter()
+                await resource_mgr.search_resource(*search_args)
+                return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*[_search() for _ in range(args.requests)])
+        return latencies, time.perf_counter() - start
+
+    latencies, elapsed = resource_mgr.run_coroutine(_run_all())
+    _summarize("async", latencies, elapsed)
+
+
+def main() -> None:
+    args = _parse_args()
+    _init_config(args)
+    run_sync(args)
+    run_async(args)
+
+
+if __name__ == "__main__":
+    main()
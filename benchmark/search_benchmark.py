@@ -0,0 +1,315 @@
+"""Benchmark suite for ResourceService.search with synthetic tenants.
+
+Generates a synthetic domain (workspaces, projects, role bindings, cloud services,
+...), then calls ResourceService.search as a DOMAIN_ADMIN, a WORKSPACE_OWNER and a
+WORKSPACE_MEMBER and reports p50/p99 latency, Mongo round trips and bytes read per
+request. Workspaces and role bindings are read from the synthetic identity database
+by the workspace directory, so no identity gRPC service is needed.
+
+Results can be saved as a baseline and compared with a later run:
+
+    PYTHONPATH=src python benchmark/search_benchmark.py --save-baseline benchmark/baselines/main.json
+    PYTHONPATH=src python benchmark/search_benchmark.py --baseline benchmark/baselines/main.json
+
+--backend mongomock (default) needs no server but cannot evaluate the aggregation
+expressions in the CloudService, CloudServiceType and ServiceAccount projections or in
+the identity.Project pipeline, so it only runs the resource types with plain
+projections. --backend mongod runs every resource type against --host.
+The exit code is 1 when a scenario regresses beyond --threshold.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import bson
+from pymongo import monitoring
+from spaceone.core import config
+from spaceone.core.transaction import create_transaction
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import Tenant, TenantSpec, generate_tenant  # noqa: E402
+
+SCOPES = ["DOMAIN_ADMIN", "WORKSPACE_OWNER", "WORKSPACE_MEMBER"]
+DEFAULT_RESOURCE_TYPES = {
+    "mongomock": ["identity.Workspace", "dashboard.PublicDashboard"],
+    "mongod": [
+        "inventory.CloudService",
+        "identity.ServiceAccount",
+        "identity.Project",
+        "dashboard.PublicDashboard",
+    ],
+}
+DEFAULT_KEYWORDS = ["", "ins", "bucket-1", "10.0.3"]
+
+
+class MongoStats(monitoring.CommandListener):
+    """Counts Mongo round trips and reply bytes of the current request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.round_trips = 0
+        self.bytes = 0
+
+    def reset(self) -> None:
+        with self._lock:
+            self.round_trips = 0
+            self.bytes = 0
+
+    def add(self, round_trips: int, size: int) -> None:
+        with self._lock:
+            self.round_trips += round_trips
+            self.bytes += size
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.add(1, len(bson.encode(event.reply)))
+
+    def failed(self, event):
+        self.add(1, 0)
+
+
+def _instrument_mongomock(stats: MongoStats) -> None:
+    from mongomock.collection import Collection
+
+    original_find = Collection.find
+    original_find_one = Collection.find_one
+    original_aggregate = Collection.aggregate
+
+    # mongomock runs $lookup with nested finds, which are not round trips
+    local = threading.local()
+
+    def _measure(method, *args, **kwargs) -> list:
+        if getattr(local, "active", False):
+            return list(method(*args, **kwargs))
+
+        local.active = True
+        try:
+            documents = list(method(*args, **kwargs))
+        finally:
+            local.active = False
+
+        stats.add(
+            1, sum(len(bson.encode(document)) for document in documents if document)
+        )
+        return documents
+
+    def find(self, *args, **kwargs):
+        return _measure(original_find, self, *args, **kwargs)
+
+    def find_one(self, *args, **kwargs):
+        return _measure(lambda: [original_find_one(self, *args, **kwargs)])[0]
+
+    def aggregate(self, *args, **kwargs):
+        return _measure(original_aggregate, self, *args, **kwargs)
+
+    Collection.find = find
+    Collection.find_one = find_one
+    Collection.aggregate = aggregate
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["mongomock", "mongod"], default="mongomock")
+    parser.add_argument("--host", default="mongodb://localhost:27017")
+    parser.add_argument("--username", default="")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--db-prefix", default="bench_")
+    parser.add_argument("--workspaces", type=int, default=TenantSpec.workspaces)
+    parser.add_argument("--member-workspaces", type=int, default=TenantSpec.member_workspaces)
+    parser.add_argument(
+        "--projects-per-workspace", type=int, default=TenantSpec.projects_per_workspace
+    )
+    parser.add_argument("--cloud-services", type=int, default=TenantSpec.cloud_services)
+    parser.add_argument("--resource-types", nargs="+")
+    parser.add_argument("--keywords", nargs="+", default=DEFAULT_KEYWORDS)
+    parser.add_argument("--limit", type=int, default=15)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--baseline", help="compare the results with this baseline file")
+    parser.add_argument("--save-baseline", help="save the results as a baseline file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="allowed relative p99 regression against the baseline",
+    )
+    return parser.parse_args()
+
+
+def _init_environment(args: argparse.Namespace, stats: MongoStats):
+    config.init_conf(package="cloudforet.search")
+    config.set_global_force(
+        CACHES={},
+        DATABASES={
+            "default": {
+                "db_prefix": args.db_prefix,
+                "username": args.username,
+                "password": args.password,
+                "host": args.host,
+            }
+        },
+    )
+
+    from cloudforet.search.lib.pymongo_client import SpaceONEPymongoClient
+
+    if args.backend == "mongomock":
+        import mongomock
+
+        _instrument_mongomock(stats)
+        SpaceONEPymongoClient._client = mongomock.MongoClient()
+        SpaceONEPymongoClient.prefix = args.db_prefix
+    else:
+        monitoring.register(stats)
+        client = SpaceONEPymongoClient()
+        for db_name in ["identity", "inventory", "dashboard", "search"]:
+            client.drop_database(f"{args.db_prefix}{db_name}")
+
+    return SpaceONEPymongoClient.get_client()
+
+
+def _make_metadata(tenant: Tenant, scope: str) -> dict:
+    user_id = {
+        "DOMAIN_ADMIN": tenant.domain_admin_id,
+        "WORKSPACE_OWNER": tenant.workspace_owner_id,
+        "WORKSPACE_MEMBER": tenant.workspace_member_id,
+    }[scope]
+    return {
+        "token": "benchmark-token",
+        "authorization.user_id": user_id,
+        "authorization.role_type": scope,
+        "disable_info_log": "true",
+    }
+
+
+def run_scenario(
+    tenant: Tenant,
+    stats: MongoStats,
+    scope: str,
+    resource_type: str,
+    keywords: list,
+    limit: int,
+    requests: int,
+) -> dict:
+    from cloudforet.search.service.resource import ResourceService
+
+    metadata = _make_metadata(tenant, scope)
+    thread_id = str(threading.current_thread().ident)
+    latencies, round_trips, sizes = [], [], []
+
+    for index in range(requests):
+        params = {
+            "resource_type": resource_type,
+            "keyword": keywords[index % len(keywords)],
+            "limit": limit,
+            "domain_id": tenant.spec.domain_id,
+            "all_workspaces": scope != "DOMAIN_ADMIN",
+        }
+
+        # without a sampled trace, services read the thread transaction, which the
+        # authentication handlers would fill in and the pipeline drops after a call
+        create_transaction(meta=metadata, thread_id=thread_id)
+
+        stats.reset()
+        start = time.perf_counter()
+        ResourceService(metadata=metadata).search(params)
+        latencies.append(time.perf_counter() - start)
+        round_trips.append(stats.round_trips)
+        sizes.append(stats.bytes)
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3),
+        "round_trips": round(sum(round_trips) / len(round_trips), 2),
+        "bytes": round(sum(sizes) / len(sizes)),
+    }
+
+
+def compare_with_baseline(results: dict, baseline: dict, threshold: float) -> bool:
+    passed = True
+    print(f"\ncompared with baseline {baseline.get('commit')} ({baseline.get('created_at')})")
+    for scenario, result in results.items():
+        if scenario not in baseline["results"]:
+            print(f"{scenario:<55} new scenario")
+            continue
+
+        base = baseline["results"][scenario]
+        p99_delta = (result["p99_ms"] - base["p99_ms"]) / max(base["p99_ms"], 1e-6)
+        regressed = p99_delta > threshold or result["round_trips"] > base["round_trips"]
+        passed = passed and not regressed
+        print(
+            f"{scenario:<55} p99 {base['p99_ms']:>9.2f} -> {result['p99_ms']:>9.2f} ms ({p99_delta:+.0%}), "
+            f"round trips {base['round_trips']} -> {result['round_trips']}, "
+            f"bytes {base['bytes']} -> {result['bytes']}"
+            f"{'  REGRESSED' if regressed else ''}"
+        )
+    return passed
+
+
+def _get_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> None:
+    args = _parse_args()
+    stats = MongoStats()
+    client = _init_environment(args, stats)
+
+    spec = TenantSpec(
+        workspaces=args.workspaces,
+        member_workspaces=args.member_workspaces,
+        projects_per_workspace=args.projects_per_workspace,
+        cloud_services=args.cloud_services,
+    )
+    tenant = generate_tenant(client, args.db_prefix, spec)
+
+    results = {}
+    resource_types = args.resource_types or DEFAULT_RESOURCE_TYPES[args.backend]
+    for scope in SCOPES:
+        for resource_type in resource_types:
+            scenario = f"{scope}:{resource_type}"
+            results[scenario] = run_scenario(
+                tenant, stats, scope, resource_type, args.keywords, args.limit, args.requests
+            )
+            result = results[scenario]
+            print(
+                f"{scenario:<55} p50 {result['p50_ms']:>9.2f} ms, p99 {result['p99_ms']:>9.2f} ms, "
+                f"round trips {result['round_trips']:>5}, bytes {result['bytes']:>9}"
+            )
+
+    report = {
+        "commit": _get_commit(),
+        "created_at": datetime.datetime.utcnow().isoformat(),
+        "backend": args.backend,
+        "spec": spec.__dict__,
+        "results": results,
+    }
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if not compare_with_baseline(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Synthetic tenant generator for the search benchmarks.
+
+Writes identity, inventory and dashboard documents shaped like the ones the search
+service reads, so that ResourceService.search can run against mongomock or a local
+mongod without the other Cloudforet services.
+"""
+
+import random
+from dataclasses import dataclass, field
+
+from pymongo import ASCENDING
+
+
+@dataclass
+class TenantSpec:
+    domain_id: str = "domain-bench"
+    workspaces: int = 10
+    disabled_workspaces: int = 2
+    projects_per_workspace: int = 20
+    project_groups_per_workspace: int = 4
+    member_workspaces: int = 5
+    cloud_services: int = 10000
+    service_accounts: int = 500
+    public_dashboards: int = 200
+    seed: int = 42
+
+
+@dataclass
+class Tenant:
+    spec: TenantSpec
+    workspace_ids: list = field(default_factory=list)
+    enabled_workspace_ids: list = field(default_factory=list)
+    domain_admin_id: str = "admin@bench"
+    workspace_owner_id: str = "owner@bench"
+    workspace_member_id: str = "member@bench"
+
+
+def generate_tenant(client, db_prefix: str, spec: TenantSpec) -> Tenant:
+    rand = random.Random(spec.seed)
+    tenant = Tenant(spec=spec)
+    domain_id = spec.domain_id
+
+    identity_db = client[f"{db_prefix}identity"]
+    inventory_db = client[f"{db_prefix}inventory"]
+    dashboard_db = client[f"{db_prefix}dashboard"]
+
+    workspaces = []
+    for index in range(spec.workspaces):
+        workspace_id = f"workspace-{index:04d}"
+        state = "DISABLED" if index >= spec.workspaces - spec.disabled_workspaces else "ENABLED"
+        workspaces.append(
+            {
+                "workspace_id": workspace_id,
+                "name": f"Workspace {index}",
+                "state": state,
+                "domain_id": domain_id,
+            }
+        )
+        tenant.workspace_ids.append(workspace_id)
+        if state == "ENABLED":
+            tenant.enabled_workspace_ids.append(workspace_id)
+    identity_db["workspace"].insert_many(workspaces)
+
+    project_groups = []
+    projects = []
+    for workspace_id in tenant.workspace_ids:
+        pg_ids = []
+        for index in range(spec.project_groups_per_workspace):
+            project_group_id = f"pg-{workspace_id}-{index:03d}"
+            pg_ids.append(project_group_id)
+            project_groups.append(
+                {
+                    "project_group_id": project_group_id,
+                    "name": f"Group {index}",
+                    # every other group is nested under the previous one
+                    "parent_group_id": pg_ids[-2] if index % 2 else None,
+                    "workspace_id": workspace_id,
+                    "domain_id": domain_id,
+                }
+            )
+
+        for index in range(spec.projects_per_workspace):
+            is_private = index % 3 == 0
+            projects.append(
+                {
+                    "project_id": f"project-{workspace_id}-{index:04d}",
+                    "name": f"Project {index}",
+                    "project_type": "PRIVATE" if is_private else "PUBLIC",
+                    "users": [tenant.workspace_member_id] if index % 6 == 0 else [],
+                    "project_group_id": rand.choice(pg_ids) if pg_ids else None,
+                    "workspace_id": workspace_id,
+                    "domain_id": domain_id,
+                }
+            )
+    if project_groups:
+        identity_db["project_group"].insert_many(project_groups)
+    identity_db["project"].insert_many(projects)
+
+    member_workspaces = tenant.enabled_workspace_ids[: spec.member_workspaces]
+    role_bindings = [
+        {
+            "user_id": tenant.domain_admin_id,
+            "role_type": "DOMAIN_ADMIN",
+            "workspace_id": "*",
+            "domain_id": domain_id,
+        }
+    ]
+    for workspace_id in member_workspaces:
+        role_bindings.append(
+            {
+                "user_id": tenant.workspace_owner_id,
+                "role_type": "WORKSPACE_OWNER",
+                "workspace_id": workspace_id,
+                "domain_id": domain_id,
+            }
+        )
+        role_bindings.append(
+            {
+                "user_id": tenant.workspace_member_id,
+                "role_type": "WORKSPACE_MEMBER",
+                "workspace_id": workspace_id,
+                "domain_id": domain_id,
+            }
+        )
+    identity_db["role_binding"].insert_many(role_bindings)
+
+    identity_db["service_account"].insert_many(
+        [
+            {
+                "service_account_id": f"sa-{index:06d}",
+                "name": f"account-{index}",
+                "data": {"account_id": f"{rand.randrange(10**11, 10**12)}"},
+                "project_id": rand.choice(projects)["project_id"],
+                "workspace_id": rand.choice(tenant.workspace_ids),
+                "domain_id": domain_id,
+            }
+            for index in range(spec.service_accounts)
+        ]
+    )
+
+    providers = ["aws", "google_cloud", "azure"]
+    groups = [("EC2", "Instance"), ("S3", "Bucket"), ("RDS", "Database"), ("VPC", "Subnet")]
+    batch = []
+    for index in range(spec.cloud_services):
+        project = rand.choice(projects)
+        group, cloud_service_type = rand.choice(groups)
+        batch.append(
+            {
+                "cloud_service_id": f"cloud-svc-{index:08d}",
+                "name": f"{cloud_service_type.lower()}-{rand.randrange(10**6):06d}",
+                "state": "ACTIVE" if index % 10 else "DELETED",
+                "provider": rand.choice(providers),
+                "cloud_service_group": group,
+                "cloud_service_type": cloud_service_type,
+                "account": f"{rand.randrange(10**11, 10**12)}",
+                "ip_addresses": [f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}"],
+                "reference": {"resource_id": f"arn:bench:{index}"},
+                "data": {"payload": "x" * 512},
+                "project_id": project["project_id"],
+                "workspace_id": project["workspace_id"],
+                "domain_id": domain_id,
+            }
+        )
+        if len(batch) >= 1000:
+            inventory_db["cloud_service"].insert_many(batch)
+            batch = []
+    if batch:
+        inventory_db["cloud_service"].insert_many(batch)
+
+    dashboards = []
+    for index in range(spec.public_dashboards):
+        project_id = "*" if index % 4 == 0 else rand.choice(projects)["project_id"]
+        dashboards.append(
+            {
+                "public_dashboard_id": f"public-dash-{index:06d}",
+                "name": f"dashboard {index}",
+                "description": "",
+                "project_id": project_id,
+                "workspace_id": rand.choice(tenant.workspace_ids),
+                "domain_id": domain_id,
+            }
+        )
+    if dashboards:
+        dashboard_db["public_dashboard"].insert_many(dashboards)
+
+    _create_indexes(identity_db, inventory_db)
+    return tenant
+
+
+def _create_indexes(identity_db, inventory_db) -> None:
+    inventory_db["cloud_service"].create_index(
+        [("domain_id", ASCENDING), ("workspace_id", ASCENDING)]
+    )
+    identity_db["project"].create_index(
+        [("domain_id", ASCENDING), ("workspace_id", ASCENDING)]
+    )
+    identity_db["role_binding"].create_index(
+        [("domain_id", ASCENDING), ("user_id", ASCENDING)]
+    )
@@ -1,13 +1,27 @@
 # Pymongo Databases Settings
+# Each service entry gets its own client and connection pool, and inherits the
+# settings of default it doesn't set (credentials only when host is not set).
+# Client settings: max_pool_size, min_pool_size, max_idle_time_ms,
+# wait_queue_timeout_ms, connect_timeout_ms, server_selection_timeout_ms,
+# socket_timeout_ms, compressors and read_preference (default: primary). The
+# MongoClient names (e.g. maxPoolSize) of DATABASES are accepted as well.
 # PYMONGO_DATABASES = {
 #     "default": {
 #         "db_prefix": "dev2",
 #         "username": "cloudforet",
 #         "password": "password1234",
 #         "host": "mongodb://localhost:27017",
+#         "max_pool_size": 100,
+#         "server_selection_timeout_ms": 5000,
+#         "compressors": "zstd,zlib",
 #     },
 #     "identity": {
 #         "db": "identity",
+#         "max_pool_size": 20,
+#     },
+#     "inventory": {
+#         "max_pool_size": 200,
+#         "socket_timeout_ms": 10000,
 #     },
 # }
 
@@ -19,6 +33,93 @@ DATABASES = {
     }
 }
 
+# Read preference of the search queries on the collections of other services.
+# Identity, permission and index state reads stay on the client read_preference.
+SEARCH_READ_PREFERENCE = "secondaryPreferred"
+
+# Run the search queries on the asyncio pymongo client, which shares one event loop
+# between the gRPC worker threads (requires pymongo >= 4.10)
+ASYNC_RESOURCE_MANAGER = False
+
+# Search Metrics Settings
+# enabled: serve Prometheus metrics of search stages and Mongo usage on port
+# trace_log: log the stage durations and Mongo usage of every search request
+SEARCH_METRICS = {
+    "enabled": False,
+    "port": 9091,
+    "trace_log": False,
+}
+
+# Project Group Tree Settings (seconds)
+# refresh_interval: pick up new project groups
+# reload_interval: reload the whole tree, including renamed and moved groups
+PROJECT_GROUP_TREE = {
+    "refresh_interval": 30,
+    "reload_interval": 600,
+}
+
+# Ranked Search Settings
+# enabled: rank keyword searches of resource types without request.rank in search_conf
+SEARCH_RANKING = {
+    "enabled": False,
+}
+
+# Search Time Budget Settings (milliseconds)
+# max_time_ms: maxTimeMS of search queries, which return partial results when it runs
+# out, 0 for no limit. Requests can pass a shorter max_time_ms.
+# resource_type_max_time_ms: {resource_type: max_time_ms} overrides of max_time_ms
+SEARCH_TIME_BUDGET = {
+    "max_time_ms": 3000,
+    "resource_type_max_time_ms": {},
+}
+
+# Single Flight Settings
+# enabled: identical concurrent searches and lookups share one query
+SEARCH_SINGLE_FLIGHT = {
+    "enabled": True,
+}
+
+# Search Result Cache Settings (seconds, needs a cache with expire and increment)
+# expire: serve repeated searches from the cache for this long, 0 to skip
+# resource_type_expires: {resource_type: expire} overrides of expire
+SEARCH_RESULT_CACHE = {
+    "enabled": False,
+    "expire": 5,
+    "resource_type_expires": {},
+}
+
+# Workspace Directory Settings (seconds)
+# refresh_interval: reload the workspaces and role bindings of a domain. Cached
+# access scopes are keyed on the loaded directory, so without IDENTITY_CHANGE_STREAM
+# a revoked role binding or disabled workspace stops granting access after at most
+# refresh_interval. With it, changes are applied as they happen.
+WORKSPACE_DIRECTORY = {
+    "refresh_interval": 10,
+}
+
+# Evicts identity caches from a change stream on the identity database
+# (needs a replica set; pre_images needs MongoDB >= 6.0 with changeStreamPreAndPostImages)
+IDENTITY_CHANGE_STREAM = {
+    "enabled": False,
+    "pre_images": False,
+    "retry_interval": 5,
+}
+
+# Maintains search.search_index, search.ngram_index and search.prefix_index of
+# resource types with request.search_index, request.ngram_index or match prefix from
+# change streams on their databases (needs a replica set). The indexes are only
+# searched while this is enabled. Changes of project groups and projects re-index the
+# search index entries enriched with their names.
+# batch_size: changed documents re-indexed with one query
+# lease_ttl: seconds the process that watches a database holds it, so only one of
+# the processes applies its changes and the others take over when it stops
+SEARCH_INDEX_CHANGE_STREAM = {
+    "enabled": False,
+    "retry_interval": 5,
+    "batch_size": 500,
+    "lease_ttl": 60,
+}
+
 # Cache Settings
 CACHES = {
     "default": {},
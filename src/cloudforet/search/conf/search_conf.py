@@ -8,6 +8,8 @@ RESOURCE_TYPES = {
                 "data.tenant_id",
                 "data.project_id",
             ],
+            # account ids are typed from their first digits
+            "match": "prefix",
             "projection": {
                 "name": 1,
                 "data": 1,
@@ -42,7 +44,47 @@ RESOURCE_TYPES = {
         },
     },
     "identity.Project": {
-        "request": {"search": ["name"]},
+        "request": {
+            "search": ["name"],
+            # entries hold the path, so group and project renames re-index them
+            "search_index": True,
+            # prefixes the name with the full project group path in the same query
+            "pipeline": [
+                {
+                    "$graphLookup": {
+                        "from": "project_group",
+                        "startWith": "$project_group_id",
+                        "connectFromField": "parent_group_id",
+                        "connectToField": "project_group_id",
+                        "as": "project_groups",
+                        "depthField": "depth",
+                    }
+                },
+                {
+                    "$set": {
+                        "name": {
+                            "$reduce": {
+                                "input": {"$range": [0, {"$size": "$project_groups"}]},
+                                "initialValue": "$name",
+                                "in": {
+                                    "$concat": [
+                                        {
+                                            "$arrayElemAt": [
+                                                "$project_groups.name",
+                                                {"$indexOfArray": ["$project_groups.depth", "$$this"]},
+                                            ]
+                                        },
+                                        " > ",
+                                        "$$value",
+                                    ]
+                                },
+                            }
+                        }
+                    }
+                },
+                {"$unset": "project_groups"},
+            ],
+        },
         "response": {"resource_id": "project_id", "name": "{name}"},
     },
     "identity.Workspace": {
@@ -52,6 +94,8 @@ RESOURCE_TYPES = {
     "inventory.CloudServiceType": {
         "request": {
             "search": ["name", "group", "provider"],
+            # short catalog names, looked up as they are typed
+            "match": "prefix",
             "projection": {
                 "group": 1,
                 "name": 1,
@@ -77,6 +121,7 @@ RESOURCE_TYPES = {
         "request": {
             "search": ["name", "ip_addresses", "account"],
             "filter": [{"state": "ACTIVE"}],
+            "ngram_index": True,
             "projection": {
                 "cloud_service_id": 1,
                 "cloud_service_type": 1,
@@ -113,7 +158,7 @@ RESOURCE_TYPES = {
         },
     },
     "dashboard.PublicDashboard": {
-        "request": {"search": ["name"]},
+        "request": {"search": ["name"], "search_index": True},
         "response": {
             "resource_id": "public_dashboard_id",
             "name": "{name}",
@@ -0,0 +1 @@
+from cloudforet.search.error.search import *
@@ -0,0 +1,9 @@
+from spaceone.core.error import *
+
+
+class ERROR_INVALID_SEARCH_CONF(ERROR_BASE):
+    _message = "Invalid search config. (resource_type = {resource_type}, reason = {reason})"
+
+
+class ERROR_SEARCH_TIME_BUDGET_EXCEEDED(ERROR_REQUEST_TIMEOUT):
+    _message = "Search ran out of time before any result was read. (resource_type = {resource_type}, max_time_ms = {max_time_ms})"
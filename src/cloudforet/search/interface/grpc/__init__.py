@@ -1,7 +1,21 @@
 from spaceone.core.pygrpc.server import GRPCServer
 from cloudforet.search.interface.grpc.resource import Resource
+from cloudforet.search.lib.metrics import start_metrics_server
+from cloudforet.search.lib.search_plan import get_search_plans
+from cloudforet.search.manager.identity_change_manager import (
+    start_identity_change_watcher,
+)
+from cloudforet.search.manager.search_index_change_manager import (
+    start_search_index_watchers,
+)
 
 _all_ = ["app"]
 
+# compile search_conf at boot so that an invalid config fails before the first request
+get_search_plans()
+start_metrics_server()
+start_identity_change_watcher()
+start_search_index_watchers()
+
 app = GRPCServer()
 app.add_service(Resource)
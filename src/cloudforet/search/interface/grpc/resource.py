@@ -12,4 +12,7 @@ class Resource(BaseAPI, resource_pb2_grpc.ResourceServicer):
         params, metadata = self.parse_request(request, context)
         resource_svc = ResourceService(metadata)
         response: dict = resource_svc.search(params)
+        if response.pop("partial", False):
+            # ResourcesInfo has no partial field, so it is sent as trailing metadata
+            context.set_trailing_metadata((("search-partial", "true"),))
         return self.dict_to_message(response)
@@ -0,0 +1,70 @@
+import json
+import logging
+
+from spaceone.core import cache
+from spaceone.core.cache.redis_cache import RedisCache
+
+__all__ = ["get_many", "set_many"]
+
+_LOGGER = logging.getLogger("spaceone")
+
+
+def get_many(key_prefix: str, ids: list) -> dict:
+    """Returns {id: value} of the ids cached under f"{key_prefix}:{id}"."""
+
+    if not ids or not cache.is_set():
+        return {}
+
+    try:
+        values = _get_many([f"{key_prefix}:{entity_id}" for entity_id in ids])
+    except Exception as e:
+        _LOGGER.warning(f"[get_many] failed to get caches of {key_prefix}: {e}")
+        return {}
+
+    return {
+        entity_id: value
+        for entity_id, value in zip(ids, values)
+        if value is not None
+    }
+
+
+def set_many(key_prefix: str, values: dict, expire: int) -> None:
+    """Caches each {id: value} under f"{key_prefix}:{id}"."""
+
+    if not values or not cache.is_set():
+        return
+
+    try:
+        _set_many(
+            {
+                f"{key_prefix}:{entity_id}": value
+                for entity_id, value in values.items()
+            },
+            expire,
+        )
+    except Exception as e:
+        _LOGGER.warning(f"[set_many] failed to set caches of {key_prefix}: {e}")
+
+
+@cache.connect
+def _get_many(cache_cls, keys: list) -> list:
+    if isinstance(cache_cls, RedisCache):
+        return [
+            json.loads(cache_value) if cache_value else None
+            for cache_value in cache_cls.conn.mget(keys)
+        ]
+
+    return [cache_cls.get(key) for key in keys]
+
+
+@cache.connect
+def _set_many(cache_cls, values: dict, expire: int) -> None:
+    if isinstance(cache_cls, RedisCache):
+        pipeline = cache_cls.conn.pipeline(transaction=False)
+        for key, value in values.items():
+            pipeline.set(key, json.dumps(value), ex=expire)
+        pipeline.execute()
+        return
+
+    for key, value in values.items():
+        cache_cls.set(key, value, expire=expire)
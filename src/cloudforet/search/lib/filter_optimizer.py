@@ -0,0 +1,189 @@
+import json
+from typing import Iterable, Union
+
+__all__ = ["SCALAR_FIELDS", "optimize_filter"]
+
+# values that can be moved into an $in list without changing what they match
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+# fields that never hold arrays in the searched collections
+SCALAR_FIELDS = frozenset(["_id", "domain_id", "workspace_id", "project_id"])
+
+
+def optimize_filter(
+    find_filter: dict, scalar_fields: Iterable[str] = SCALAR_FIELDS
+) -> dict:
+    """Returns a canonical filter that matches the same documents as find_filter.
+
+    - nested $and and $or are flattened and single-clause ones are unwrapped
+    - always-true $or and empty clauses are dropped
+    - duplicate clauses and duplicate $in/$nin values are dropped
+    - $in of the same field are merged in $or, and intersected in $and when the
+      field is in scalar_fields. An array field can match two $in lists with
+      different elements, so their clauses are kept as they are.
+    - clauses and $in/$nin values are sorted, so equal filters are equal dicts
+      and hash to the same cache key
+    """
+
+    scalar_fields = frozenset(scalar_fields)
+    clauses = _optimize_and(_split_clauses(find_filter, scalar_fields), scalar_fields)
+    if not clauses:
+        return {}
+    elif len(clauses) == 1:
+        return clauses[0]
+
+    keys = [key for clause in clauses for key in clause.keys()]
+    if len(set(keys)) == len(clauses) and not any(k.startswith("$") for k in keys):
+        # conditions on distinct fields read better as one document
+        return {key: value for clause in clauses for key, value in clause.items()}
+    return {"$and": clauses}
+
+
+def _split_clauses(find_filter: dict, scalar_fields: frozenset) -> list:
+    clauses = []
+    for key, value in find_filter.items():
+        if key == "$and":
+            for sub_filter in value:
+                clauses.extend(_split_clauses(sub_filter, scalar_fields))
+        elif key == "$or":
+            or_filter = _optimize_or(value, scalar_fields)
+            if "$or" in or_filter:
+                clauses.append(or_filter)
+            else:
+                clauses.extend(_split_clauses(or_filter, scalar_fields))
+        elif key == "$nor":
+            clauses.append({"$nor": [optimize_filter(f, scalar_fields) for f in value]})
+        else:
+            clauses.append({key: _normalize_condition(value)})
+    return clauses
+
+
+def _optimize_and(clauses: list, scalar_fields: frozenset) -> list:
+    in_clauses = {}
+    nin_clauses = {}
+    other_clauses = []
+
+    for clause in clauses:
+        if not clause:
+            continue
+
+        key, value = _get_single_condition(clause)
+        if _is_operator_condition(value, "$in") and _is_scalar_in(key, value):
+            if key not in scalar_fields:
+                other_clauses.append(clause)
+            elif key in in_clauses:
+                value_keys = {_make_sort_key(v) for v in value["$in"]}
+                in_clauses[key] = [
+                    v for v in in_clauses[key] if _make_sort_key(v) in value_keys
+                ]
+            else:
+                in_clauses[key] = value["$in"]
+        elif _is_operator_condition(value, "$nin"):
+            nin_clauses[key] = nin_clauses.get(key, []) + value["$nin"]
+        else:
+            other_clauses.append(clause)
+
+    other_clauses.extend({key: {"$in": values}} for key, values in in_clauses.items())
+    other_clauses.extend(
+        {key: {"$nin": values}} for key, values in nin_clauses.items()
+    )
+    return _sort_unique([_normalize_clause(clause) for clause in other_clauses])
+
+
+def _optimize_or(sub_filters: list, scalar_fields: frozenset) -> dict:
+    branches = []
+    for sub_filter in sub_filters:
+        branch = optimize_filter(sub_filter, scalar_fields)
+        if not branch:
+            # a branch that matches everything makes the whole $or match everything
+            return {}
+        elif list(branch.keys()) == ["$or"]:
+            branches.extend(branch["$or"])
+        else:
+            branches.append(branch)
+
+    in_values = {}
+    other_branches = []
+    for branch in branches:
+        key, value = _get_single_condition(branch)
+        if key is None or key.startswith("$"):
+            other_branches.append(branch)
+        elif isinstance(value, _SCALAR_TYPES):
+            in_values.setdefault(key, []).append(value)
+        elif _is_operator_condition(value, "$in"):
+            in_values.setdefault(key, []).extend(value["$in"])
+        else:
+            other_branches.append(branch)
+
+    for key, values in in_values.items():
+        values = _sort_unique(values)
+        if len(values) == 1:
+            other_branches.append({key: values[0]})
+        else:
+            other_branches.append({key: {"$in": values}})
+
+    # an empty $in matches nothing, so it only matters when it is the only branch
+    branches = [
+        branch
+        for branch in other_branches
+        if not _is_empty_in_condition(branch)
+    ] or _sort_unique(other_branches)[:1]
+    branches = _sort_unique(branches)
+    if len(branches) == 1:
+        return branches[0]
+    return {"$or": branches}
+
+
+def _normalize_clause(clause: dict) -> dict:
+    key, value = _get_single_condition(clause)
+    if key is None:
+        return clause
+    return {key: _normalize_condition(value)}
+
+
+def _normalize_condition(condition):
+    if isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+        return {
+            operator: (
+                _sort_unique(value)
+                if operator in ["$in", "$nin"] and isinstance(value, list)
+                else value
+            )
+            for operator, value in condition.items()
+        }
+    return condition
+
+
+def _get_single_condition(clause: dict) -> tuple:
+    if len(clause) != 1:
+        return None, None
+    return next(iter(clause.items()))
+
+
+def _is_scalar_in(key: Union[str, None], value: dict) -> bool:
+    # a regex in the list matches values the intersection would drop
+    return key is not None and all(isinstance(v, _SCALAR_TYPES) for v in value["$in"])
+
+
+def _is_empty_in_condition(clause: dict) -> bool:
+    _, value = _get_single_condition(clause)
+    return _is_operator_condition(value, "$in") and not value["$in"]
+
+
+def _is_operator_condition(value, operator: str) -> bool:
+    return (
+        isinstance(value, dict)
+        and list(value.keys()) == [operator]
+        and isinstance(value[operator], list)
+    )
+
+
+def _sort_unique(values: list) -> list:
+    unique_values = {}
+    for value in values:
+        unique_values.setdefault(_make_sort_key(value), value)
+    return [unique_values[key] for key in sorted(unique_values)]
+
+
+def _make_sort_key(value: Union[dict, list, str, int, float, bool, None]) -> str:
+    return json.dumps(value, sort_keys=True, default=str)
@@ -0,0 +1,303 @@
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Union
+
+import bson
+from opentelemetry import trace
+from prometheus_client import Counter, Histogram, start_http_server
+from pymongo import monitoring
+from spaceone.core import config
+
+__all__ = [
+    "SearchTrace",
+    "MongoCommandMetrics",
+    "is_enabled",
+    "is_trace_log_enabled",
+    "get_event_listeners",
+    "start_metrics_server",
+    "trace_request",
+    "measure",
+    "measured",
+    "get_current_trace",
+    "count_coalesced_request",
+    "count_result_cache",
+    "count_time_budget_exceeded",
+]
+
+_LOGGER = logging.getLogger("spaceone")
+_TRACER = trace.get_tracer(__name__)
+
+DEFAULT_METRICS_PORT = 9091
+
+STAGE_DURATION = Histogram(
+    "search_stage_duration_seconds",
+    "Duration of each stage of a search request",
+    ["stage", "resource_type"],
+)
+MONGO_ROUND_TRIPS = Counter(
+    "search_mongo_round_trips_total",
+    "Mongo commands sent while searching",
+    ["resource_type", "collection", "command"],
+)
+MONGO_DOCUMENTS = Counter(
+    "search_mongo_documents_total",
+    "Documents returned by Mongo while searching",
+    ["resource_type", "collection"],
+)
+MONGO_REPLY_BYTES = Counter(
+    "search_mongo_reply_bytes_total",
+    "BSON bytes of Mongo replies decoded while searching",
+    ["resource_type", "collection"],
+)
+COALESCED_REQUESTS = Counter(
+    "search_coalesced_requests_total",
+    "Calls answered by the result of an identical call already in flight",
+    ["name"],
+)
+RESULT_CACHE_REQUESTS = Counter(
+    "search_result_cache_requests_total",
+    "Lookups of the search result cache by result",
+    ["resource_type", "result"],
+)
+TIME_BUDGET_EXCEEDED = Counter(
+    "search_time_budget_exceeded_total",
+    "Searches that ran out of their maxTimeMS budget and returned partial results",
+    ["resource_type"],
+)
+
+_CURRENT_TRACE = contextvars.ContextVar("search_trace", default=None)
+_CURRENT_RESOURCE_TYPE = contextvars.ContextVar("search_resource_type", default="")
+
+_METRICS_CONF = None
+_METRICS_SERVER_LOCK = threading.Lock()
+_METRICS_SERVER_STARTED = False
+
+
+class SearchTrace:
+    """Stage durations and Mongo usage of one request, written to the trace log."""
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.stages = []
+        self.mongo = {"round_trips": 0, "documents": 0, "bytes": 0}
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: str, resource_type: str, duration: float) -> None:
+        with self._lock:
+            self.stages.append(
+                {
+                    "stage": stage,
+                    "resource_type": resource_type,
+                    "duration_ms": round(duration * 1000, 3),
+                }
+            )
+
+    def add_mongo(self, documents: int, size: int) -> None:
+        with self._lock:
+            self.mongo["round_trips"] += 1
+            self.mongo["documents"] += documents
+            self.mongo["bytes"] += size
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                **self.attributes,
+                "stages": list(self.stages),
+                "mongo": dict(self.mongo),
+            }
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Counts round trips, documents and reply bytes per searched resource type.
+
+    pymongo calls listeners on the thread (or task) that runs the command, so the
+    resource type of the current search is taken from the context.
+    """
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+
+        if isinstance(collection, str):
+            self._collections[event.request_id] = f"{event.database_name}.{collection}"
+
+    def succeeded(self, event):
+        collection = self._collections.pop(event.request_id, event.database_name)
+        resource_type = _CURRENT_RESOURCE_TYPE.get()
+
+        documents = self._count_documents(event.reply)
+        size = len(bson.encode(event.reply))
+
+        if is_enabled():
+            MONGO_ROUND_TRIPS.labels(
+                resource_type, collection, event.command_name
+            ).inc()
+            MONGO_DOCUMENTS.labels(resource_type, collection).inc(documents)
+            MONGO_REPLY_BYTES.labels(resource_type, collection).inc(size)
+
+        if search_trace := _CURRENT_TRACE.get():
+            search_trace.add_mongo(documents, size)
+
+    def failed(self, event):
+        collection = self._collections.pop(event.request_id, event.database_name)
+        if is_enabled():
+            MONGO_ROUND_TRIPS.labels(
+                _CURRENT_RESOURCE_TYPE.get(), collection, event.command_name
+            ).inc()
+
+    @staticmethod
+    def _count_documents(reply: dict) -> int:
+        cursor = reply.get("cursor")
+        if isinstance(cursor, dict):
+            return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+        return 0
+
+
+def _get_metrics_conf() -> dict:
+    global _METRICS_CONF
+
+    if _METRICS_CONF is None:
+        _METRICS_CONF = config.get_global("SEARCH_METRICS", {})
+    return _METRICS_CONF
+
+
+def is_enabled() -> bool:
+    return bool(_get_metrics_conf().get("enabled", False))
+
+
+def is_trace_log_enabled() -> bool:
+    return bool(_get_metrics_conf().get("trace_log", False))
+
+
+def get_event_listeners() -> list:
+    # encoding every reply to count its bytes is only paid when someone reads it
+    if is_enabled() or is_trace_log_enabled():
+        return [MongoCommandMetrics()]
+    return []
+
+
+def start_metrics_server() -> None:
+    global _METRICS_SERVER_STARTED
+
+    if not is_enabled():
+        return
+
+    with _METRICS_SERVER_LOCK:
+        if not _METRICS_SERVER_STARTED:
+            port = _get_metrics_conf().get("port", DEFAULT_METRICS_PORT)
+            start_http_server(port)
+            _METRICS_SERVER_STARTED = True
+            _LOGGER.debug(f"[start_metrics_server] serve metrics on port {port}")
+
+
+def count_coalesced_request(name: str) -> None:
+    if is_enabled():
+        COALESCED_REQUESTS.labels(name).inc()
+
+
+def count_result_cache(resource_type: str, hit: bool) -> None:
+    if is_enabled():
+        RESULT_CACHE_REQUESTS.labels(resource_type, "hit" if hit else "miss").inc()
+
+
+def count_time_budget_exceeded(resource_type: str) -> None:
+    if is_enabled():
+        TIME_BUDGET_EXCEEDED.labels(resource_type).inc()
+
+
+def get_current_trace() -> Union[SearchTrace, None]:
+    return _CURRENT_TRACE.get()
+
+
+@contextmanager
+def trace_request(name: str, resource_type: str = "", **attributes):
+    """Collects the stages of a request and logs them when trace_log is on."""
+
+    if not is_trace_log_enabled():
+        resource_type_token = _CURRENT_RESOURCE_TYPE.set(resource_type)
+        try:
+            yield None
+        finally:
+            _CURRENT_RESOURCE_TYPE.reset(resource_type_token)
+        return
+
+    search_trace = SearchTrace(name, resource_type=resource_type, **attributes)
+    trace_token = _CURRENT_TRACE.set(search_trace)
+    resource_type_token = _CURRENT_RESOURCE_TYPE.set(resource_type)
+    start_time = time.perf_counter()
+    try:
+        yield search_trace
+    finally:
+        _CURRENT_RESOURCE_TYPE.reset(resource_type_token)
+        _CURRENT_TRACE.reset(trace_token)
+
+        trace_info = search_trace.to_dict()
+        trace_info["duration_ms"] = round((time.perf_counter() - start_time) * 1000, 3)
+        _LOGGER.info(f"[search_trace] {json.dumps(trace_info, default=str)}")
+
+
+@contextmanager
+def measure(stage: str, resource_type: str = None):
+    """Times a stage with a span, the stage histogram and the request trace."""
+
+    resource_type_token = None
+    if resource_type is None:
+        resource_type = _CURRENT_RESOURCE_TYPE.get()
+    else:
+        resource_type_token = _CURRENT_RESOURCE_TYPE.set(resource_type)
+
+    start_time = time.perf_counter()
+    try:
+        with _TRACER.start_as_current_span(stage) as span:
+            if resource_type:
+                span.set_attribute("search.resource_type", resource_type)
+            yield
+    finally:
+        duration = time.perf_counter() - start_time
+        if resource_type_token is not None:
+            _CURRENT_RESOURCE_TYPE.reset(resource_type_token)
+
+        if is_enabled():
+            STAGE_DURATION.labels(stage, resource_type).observe(duration)
+
+        if search_trace := _CURRENT_TRACE.get():
+            search_trace.add_stage(stage, resource_type, duration)
+
+
+def measured(stage: str):
+    """Decorator version of measure() for functions and coroutine functions.
+
+    Place it above cache.cacheable, which reads the argument names of the function
+    it wraps.
+    """
+
+    def wrapper(func):
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapped_coroutine(*args, **kwargs):
+                with measure(stage):
+                    return await func(*args, **kwargs)
+
+            return wrapped_coroutine
+
+        @functools.wraps(func)
+        def wrapped_func(*args, **kwargs):
+            with measure(stage):
+                return func(*args, **kwargs)
+
+        return wrapped_func
+
+    return wrapper
@@ -1,49 +1,241 @@
+import asyncio
+import contextvars
 import logging
+import threading
+from typing import Tuple, Union
 
 from spaceone.core import config
-from pymongo import MongoClient
+from pymongo import MongoClient, ReadPreference
+
+from cloudforet.search.lib.metrics import get_event_listeners
 
 _LOGGER = logging.getLogger("spaceone")
 
 
+# client settings of PYMONGO_DATABASES and the MongoClient options they set
+CLIENT_OPTION_NAMES = {
+    "max_pool_size": "maxPoolSize",
+    "min_pool_size": "minPoolSize",
+    "max_idle_time_ms": "maxIdleTimeMS",
+    "wait_queue_timeout_ms": "waitQueueTimeoutMS",
+    "connect_timeout_ms": "connectTimeoutMS",
+    "server_selection_timeout_ms": "serverSelectionTimeoutMS",
+    "socket_timeout_ms": "socketTimeoutMS",
+    "compressors": "compressors",
+    "read_preference": "readPreference",
+}
+CONNECTION_FIELDS = ["username", "password", "host", "port"]
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+# search queries tolerate replica lag, permission and index state reads don't
+DEFAULT_SEARCH_READ_PREFERENCE = "secondaryPreferred"
+
+
+class PymongoClientRouter:
+    """Routes each database to the client of the service it belongs to.
+
+    Services with their own entry in PYMONGO_DATABASES get their own client and
+    connection pool, created on first use. Other services share the default client.
+    Databases are looked up the same way as on a MongoClient: client[db_name].
+    """
+
+    def __init__(self, client_cls: type):
+        self.client_cls = client_cls
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, db_name: str):
+        return self.get_service_client(self._get_service(db_name))[db_name]
+
+    def get_database(self, db_name: str, **kwargs):
+        return self.get_service_client(self._get_service(db_name)).get_database(
+            db_name, **kwargs
+        )
+
+    def drop_database(self, db_name: str):
+        return self.get_service_client(self._get_service(db_name)).drop_database(
+            db_name
+        )
+
+    def get_service_client(self, service: str):
+        if service not in SpaceONEPymongoClient.config:
+            service = "default"
+
+        client = self._clients.get(service)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(service)
+                if client is None:
+                    client = self._clients[service] = self._create_client(service)
+        return client
+
+    def close(self) -> None:
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+    def _create_client(self, service: str):
+        uri, port = SpaceONEPymongoClient.get_connection_args(service)
+        client_options = SpaceONEPymongoClient.get_client_options(service)
+        client = self.client_cls(
+            uri, port=port, event_listeners=get_event_listeners(), **client_options
+        )
+
+        _LOGGER.debug(
+            f"[_create_client] Create {self.client_cls.__name__} of {service}: "
+            f"{client_options}"
+        )
+        return client
+
+    @staticmethod
+    def _get_service(db_name: str) -> str:
+        prefix = SpaceONEPymongoClient.prefix
+        if prefix and db_name.startswith(prefix):
+            db_name = db_name[len(prefix) :]
+        return db_name.lower()
+
+
 class SpaceONEPymongoClient:
     config = None
     prefix = None
     _client = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._client:
+            with cls._lock:
+                if not cls._client:
+                    cls.load_config()
+                    cls._client = PymongoClientRouter(MongoClient)
+
+                    _LOGGER.debug(
+                        f"[__new__] Create pymongo client prefix: {cls.prefix}"
+                    )
+        return cls._client
+
+    @classmethod
+    def get_client(cls):
+        return cls._client
+
+    @classmethod
+    def load_config(cls) -> None:
+        SpaceONEPymongoClient.config = config.get_global(
+            "PYMONGO_DATABASES", config.get_global("DATABASES")
+        )
+
+        SpaceONEPymongoClient.prefix = SpaceONEPymongoClient.config.get("default").get(
+            "db_prefix"
+        ) or config.get_global("DATABASE_NAME_PREFIX")
+
+    @classmethod
+    def get_db_conf(cls, service: str = "default") -> dict:
+        if SpaceONEPymongoClient.config is None:
+            cls.load_config()
+
+        default_db_conf = SpaceONEPymongoClient.config.get("default")
+        if service == "default":
+            return default_db_conf
+
+        service_db_conf = SpaceONEPymongoClient.config.get(service, {})
+        if any(field in service_db_conf for field in CONNECTION_FIELDS):
+            # a service on another server doesn't inherit the default credentials
+            default_db_conf = {
+                key: value
+                for key, value in default_db_conf.items()
+                if key not in CONNECTION_FIELDS
+            }
+        return {**default_db_conf, **service_db_conf}
+
+    @classmethod
+    def get_connection_args(
+        cls, service: str = "default"
+    ) -> Tuple[str, Union[int, None]]:
+        db_conf = cls.get_db_conf(service)
+        username = db_conf.get("username")
+        password = db_conf.get("password")
+        host = db_conf.get("host")
+        port = db_conf.get("port")
+
+        if not host.startswith("mongodb://") and not host.startswith(
+            "mongodb+srv://"
+        ):
+            protocol = "mongodb"
+        else:
+            protocol, host = host.split("://")
+
+        return f"{protocol}://{username}:{password}@{host}", port
+
+    @classmethod
+    def get_client_options(cls, service: str = "default") -> dict:
+        db_conf = cls.get_db_conf(service)
+
+        client_options = {}
+        for key, option_name in CLIENT_OPTION_NAMES.items():
+            # DATABASES is shared with mongoengine, which takes the MongoClient names
+            value = db_conf.get(key, db_conf.get(option_name))
+            if value is not None:
+                client_options[option_name] = value
+        return client_options
+
+    @staticmethod
+    def get_search_read_preference():
+        name = config.get_global(
+            "SEARCH_READ_PREFERENCE", DEFAULT_SEARCH_READ_PREFERENCE
+        )
+        if name not in READ_PREFERENCES:
+            _LOGGER.warning(f"[get_search_read_preference] unknown value: {name}")
+            name = DEFAULT_SEARCH_READ_PREFERENCE
+        return READ_PREFERENCES[name]
+
+
+class SpaceONEAsyncPymongoClient:
+    _client = None
+    _loop = None
+    _lock = threading.Lock()
 
-    # todo: need to apply service config
     def __new__(cls, *args, **kwargs):
         if not cls._client:
-            cls.config = config.get_global(
-                "PYMONGO_DATABASES", config.get_global("DATABASES")
-            )
-
-            cls.prefix = cls.config.get("default").get(
-                "db_prefix"
-            ) or config.get_global("DATABASE_NAME_PREFIX")
-
-            default_db_conf = cls.config.get("default")
-            username = default_db_conf.get("username")
-            password = default_db_conf.get("password")
-            host = default_db_conf.get("host")
-            port = default_db_conf.get("port")
-
-            if not host.startswith("mongodb://") and not host.startswith(
-                "mongodb+srv://"
-            ):
-                protocol = "mongodb"
-            else:
-                protocol, host = host.split("://")
-
-            cls._client = MongoClient(
-                f"{protocol}://{username}:{password}@{host}", port=port
-            )
-
-            _LOGGER.debug(
-                f"[__new__] Create pymongo client prefix: {cls.prefix}, protocol: {protocol})"
-            )
+            with cls._lock:
+                if not cls._client:
+                    # requires pymongo >= 4.10
+                    from pymongo import AsyncMongoClient
+
+                    cls._loop = asyncio.new_event_loop()
+                    threading.Thread(
+                        target=cls._loop.run_forever,
+                        name="pymongo-async-loop",
+                        daemon=True,
+                    ).start()
+
+                    SpaceONEPymongoClient.load_config()
+                    cls._client = PymongoClientRouter(AsyncMongoClient)
+
+                    _LOGGER.debug(
+                        f"[__new__] Create async pymongo client prefix: {SpaceONEPymongoClient.prefix}"
+                    )
         return cls._client
 
     @classmethod
     def get_client(cls):
         return cls._client
+
+    @classmethod
+    def run_coroutine(cls, coroutine):
+        # block the calling worker thread until the coroutine finishes on the shared loop
+        return asyncio.run_coroutine_threadsafe(
+            cls._run_in_context(coroutine, contextvars.copy_context()), cls._loop
+        ).result()
+
+    @staticmethod
+    async def _run_in_context(coroutine, context: contextvars.Context):
+        # tasks on the loop thread start from its context, not the caller's
+        for context_var, value in context.items():
+            context_var.set(value)
+        return await coroutine
@@ -0,0 +1,120 @@
+import logging
+from typing import Tuple, Union
+
+from bson import json_util
+from spaceone.core import cache
+from spaceone.core import config
+
+from cloudforet.search.lib.metrics import count_result_cache
+
+__all__ = [
+    "is_enabled",
+    "make_key",
+    "get_results",
+    "set_results",
+    "invalidate",
+    "invalidate_all",
+]
+
+_LOGGER = logging.getLogger("spaceone")
+
+DEFAULT_RESULT_CACHE_CONF = {
+    "enabled": False,
+    # seconds a search result is served from the cache
+    "expire": 5,
+    # {resource_type: expire} for resource types that change more or less often
+    "resource_type_expires": {},
+}
+
+
+def _get_result_cache_conf() -> dict:
+    return {
+        **DEFAULT_RESULT_CACHE_CONF,
+        **config.get_global("SEARCH_RESULT_CACHE", {}),
+    }
+
+
+def is_enabled() -> bool:
+    return bool(_get_result_cache_conf()["enabled"]) and cache.is_set()
+
+
+def make_key(domain_id: str, resource_type: str, query_hash: str) -> Union[str, None]:
+    """Returns the cache key of a query in the current version of the domain.
+
+    query_hash must cover the canonical find filter, projection, limit and cursor.
+    Returns None when results of the resource type are not cached or the version
+    can't be read.
+    """
+
+    if not is_enabled() or not _get_expire(resource_type):
+        return None
+
+    try:
+        version = cache.get(_make_version_key(domain_id)) or 0
+    except Exception as e:
+        _LOGGER.warning(f"[make_key] failed to get result cache version: {e}")
+        return None
+
+    return f"search:result:{domain_id}:{version}:{resource_type}:{query_hash}"
+
+
+def get_results(
+    cache_key: str, resource_type: str
+) -> Union[Tuple[list, Union[dict, None]], None]:
+    try:
+        cache_value = cache.get(cache_key)
+    except Exception as e:
+        _LOGGER.warning(f"[get_results] failed to get result cache: {e}")
+        cache_value = None
+
+    count_result_cache(resource_type, cache_value is not None)
+    if cache_value is None:
+        return None
+
+    # ObjectIds and datetimes of the results don't survive plain json
+    value = json_util.loads(cache_value)
+    return value["results"], value["next_last_key"]
+
+
+def set_results(
+    cache_key: str,
+    resource_type: str,
+    results: list,
+    next_last_key: Union[dict, None],
+) -> None:
+    try:
+        cache.set(
+            cache_key,
+            json_util.dumps({"results": results, "next_last_key": next_last_key}),
+            expire=_get_expire(resource_type),
+        )
+    except Exception as e:
+        _LOGGER.warning(f"[set_results] failed to set result cache: {e}")
+
+
+def invalidate(domain_id: str) -> None:
+    """Moves the domain to a new version, so none of its cached results are read."""
+
+    if not is_enabled():
+        return
+
+    try:
+        cache.increment(_make_version_key(domain_id))
+    except Exception as e:
+        _LOGGER.warning(f"[invalidate] failed to increment result cache version: {e}")
+
+
+def invalidate_all() -> None:
+    if not is_enabled():
+        return
+
+    cache.delete_pattern("search:result:*")
+
+
+def _get_expire(resource_type: str) -> int:
+    conf = _get_result_cache_conf()
+    return conf["resource_type_expires"].get(resource_type, conf["expire"])
+
+
+def _make_version_key(domain_id: str) -> str:
+    return f"search:result-version:{domain_id}"
@@ -0,0 +1,444 @@
+import copy
+import dataclasses
+import logging
+import re
+import string
+import threading
+from dataclasses import dataclass
+from typing import Tuple, Union
+
+from spaceone.core import config
+from spaceone.core.utils import get_dict_value
+
+from cloudforet.search.error.search import ERROR_INVALID_SEARCH_CONF
+
+_LOGGER = logging.getLogger("spaceone")
+
+DEFAULT_SORT_KEY = "_id"
+
+# contains: keyword anywhere in a search field, prefix: search field starts with it
+MATCH_MODES = ("contains", "prefix")
+
+# fields read by ResourceResponse and by the enrichment in ResourceManager.search_resource
+RESPONSE_FIELDS = ["domain_id", "workspace_id", "project_id"]
+ENRICHMENT_FIELDS = {
+    "identity.Project": ["project_group_id"],
+    "dashboard.PublicDashboard": ["project_id"],
+}
+
+# stages allowed in request.pipeline, which runs after the matched page is sorted,
+# limited and projected
+PIPELINE_STAGES = {"$lookup", "$graphLookup", "$set", "$addFields", "$unset", "$project"}
+
+# denormalized entries of resource types with request.search_index
+SEARCH_INDEX_TYPE = "search.SearchIndex"
+# lowercase copies of the search fields in a search index entry, by field path
+SEARCH_KEYS_FIELD = "keys"
+# value of request.sort in a search index entry
+SEARCH_SORT_VALUE_FIELD = "sort_value"
+SEARCH_INDEX_FIELDS = ["resource_id", "name", "description", "tags", *RESPONSE_FIELDS]
+
+# match classes of the relevance score, from the best to the worst
+RANK_EXACT = 4
+RANK_PREFIX = 3
+RANK_WORD = 2
+RANK_SUBSTRING = 1
+
+_SEARCH_PLANS = None
+_SEARCH_INDEX_PLANS = None
+_SEARCH_PLANS_LOCK = threading.Lock()
+
+
+class ResponseFormatter:
+    """str.format template parsed once and rendered with a result dict."""
+
+    def __init__(self, template: str):
+        self.template = template
+        self._pieces = []
+        self._simple = True
+
+        for literal, field_name, format_spec, conversion in string.Formatter().parse(
+            template
+        ):
+            if field_name is not None and (
+                format_spec or conversion or not field_name.isidentifier()
+            ):
+                self._simple = False
+            self._pieces.append((literal, field_name))
+
+        self.fields = tuple(
+            re.split(r"[.\[]", field_name, 1)[0]
+            for _, field_name in self._pieces
+            if field_name
+        )
+
+    def format(self, result: dict) -> str:
+        if not self._simple:
+            return self.template.format(**result)
+
+        return "".join(
+            literal if field_name is None else f"{literal}{result[field_name]}"
+            for literal, field_name in self._pieces
+        )
+
+
+class TagExtractor:
+    """Copies configured result fields to response tags, skipping empty values."""
+
+    def __init__(self, tags: dict):
+        self.tags = tuple(
+            (tag_key, path, "." in path) for tag_key, path in tags.items()
+        )
+
+    def extract(self, result: dict) -> dict:
+        response_tags = {}
+        for tag_key, path, is_dotted in self.tags:
+            if is_dotted:
+                target_value = get_dict_value(result, path)
+            else:
+                target_value = result.get(path)
+
+            if target_value:
+                response_tags[tag_key] = target_value
+        return response_tags
+
+
+@dataclass(frozen=True)
+class ResourceTypePlan:
+    """Validated, precompiled form of one RESOURCE_TYPES entry in search_conf.
+
+    Plans are shared by every request, so projection, request_filters and pipeline
+    must be treated as read-only. A non-empty pipeline switches the resource type to
+    the aggregation mode, in which enrichment runs in Mongo instead of Python.
+    rank is None when the resource type follows SEARCH_RANKING.enabled.
+    collection_type is the resource type of the queried collection, which is
+    SEARCH_INDEX_TYPE for plans made by make_search_index_plan.
+    """
+
+    resource_type: str
+    collection_type: str
+    search_fields: Tuple[str, ...]
+    request_filters: Tuple[dict, ...]
+    projection: dict
+    pipeline: Tuple[dict, ...]
+    sort_key: str
+    ngram_index: bool
+    search_index: bool
+    match: str
+    rank: Union[bool, None]
+    resource_id_key: str
+    name_formatter: ResponseFormatter
+    description_formatter: Union[ResponseFormatter, None]
+    tag_extractor: Union[TagExtractor, None]
+
+    def bind_filter(self, regex_pattern: str) -> list:
+        find_filters = copy.deepcopy(list(self.request_filters))
+        find_filters.append(
+            {
+                "$or": [
+                    {field: {"$regex": regex_pattern, "$options": "i"}}
+                    for field in self.search_fields
+                ]
+            }
+        )
+        return find_filters
+
+    def format_result(self, result: dict) -> dict:
+        # Make description at response
+        if self.description_formatter:
+            result["description"] = self.description_formatter.format(result)
+        if self.tag_extractor:
+            result["tags"] = self.tag_extractor.extract(result)
+        else:
+            result["tags"] = {}
+
+        result["name"] = self.name_formatter.format(result)
+        result["resource_id"] = result[self.resource_id_key]
+        return result
+
+    @property
+    def is_search_index_plan(self) -> bool:
+        return self.collection_type == SEARCH_INDEX_TYPE
+
+    def make_score_expression(self, keyword: str) -> dict:
+        """Returns an aggregation expression that scores a document for keyword.
+
+        The best match over the search fields wins: exact, prefix, word and then
+        substring matches. Within a match class, earlier search fields rank higher.
+        """
+
+        keyword = keyword.lower()
+        word_pattern = f"(^|\\W){re.escape(keyword)}"
+        field_count = len(self.search_fields)
+
+        field_scores = []
+        for index, field in enumerate(self.search_fields):
+            weight = field_count - index
+            field_scores.append(
+                {
+                    "$let": {
+                        "vars": {
+                            "value": {
+                                "$toLower": {
+                                    "$convert": {
+                                        "input": f"${field}",
+                                        "to": "string",
+                                        "onError": "",
+                                        "onNull": "",
+                                    }
+                                }
+                            }
+                        },
+                        "in": {
+                            "$switch": {
+                                "branches": [
+                                    {
+                                        "case": {"$eq": ["$$value", keyword]},
+                                        "then": RANK_EXACT * (field_count + 1) + weight,
+                                    },
+                                    {
+                                        "case": {
+                                            "$eq": [
+                                                {"$indexOfCP": ["$$value", keyword]},
+                                                0,
+                                            ]
+                                        },
+                                        "then": RANK_PREFIX * (field_count + 1) + weight,
+                                    },
+                                    {
+                                        "case": {
+                                            "$regexMatch": {
+                                                "input": "$$value",
+                                                "regex": word_pattern,
+                                            }
+                                        },
+                                        "then": RANK_WORD * (field_count + 1) + weight,
+                                    },
+                                    {
+                                        "case": {
+                                            "$gt": [
+                                                {"$indexOfCP": ["$$value", keyword]},
+                                                0,
+                                            ]
+                                        },
+                                        "then": RANK_SUBSTRING * (field_count + 1)
+                                        + weight,
+                                    },
+                                ],
+                                "default": 0,
+                            }
+                        },
+                    }
+                }
+            )
+
+        return {"$max": field_scores}
+
+
+def get_search_plans() -> dict:
+    global _SEARCH_PLANS
+
+    if _SEARCH_PLANS is None:
+        with _SEARCH_PLANS_LOCK:
+            if _SEARCH_PLANS is None:
+                _SEARCH_PLANS = compile_search_plans(_load_resource_types())
+
+    return _SEARCH_PLANS
+
+
+def get_search_index_plans() -> dict:
+    """Returns the plans that query search.search_index instead of the source."""
+
+    global _SEARCH_INDEX_PLANS
+
+    if _SEARCH_INDEX_PLANS is None:
+        search_plans = get_search_plans()
+        with _SEARCH_PLANS_LOCK:
+            if _SEARCH_INDEX_PLANS is None:
+                _SEARCH_INDEX_PLANS = {
+                    resource_type: make_search_index_plan(plan)
+                    for resource_type, plan in search_plans.items()
+                    if plan.search_index
+                }
+
+    return _SEARCH_INDEX_PLANS
+
+
+def make_search_index_plan(plan: ResourceTypePlan) -> ResourceTypePlan:
+    """Returns the plan of the same resource type over its search index entries.
+
+    Entries hold the formatted name, description and tags, so the plan only copies
+    them. Request filters were applied when the entries were indexed.
+    """
+
+    tag_extractor = None
+    if plan.tag_extractor:
+        tag_extractor = TagExtractor(
+            {tag_key: f"tags.{tag_key}" for tag_key, _, _ in plan.tag_extractor.tags}
+        )
+
+    return dataclasses.replace(
+        plan,
+        collection_type=SEARCH_INDEX_TYPE,
+        search_fields=tuple(
+            f"{SEARCH_KEYS_FIELD}.{field}" for field in plan.search_fields
+        ),
+        request_filters=({"resource_type": plan.resource_type},),
+        projection={field: 1 for field in SEARCH_INDEX_FIELDS},
+        pipeline=(),
+        sort_key=(
+            DEFAULT_SORT_KEY
+            if plan.sort_key == DEFAULT_SORT_KEY
+            else SEARCH_SORT_VALUE_FIELD
+        ),
+        resource_id_key="resource_id",
+        name_formatter=ResponseFormatter("{name}"),
+        description_formatter=(
+            ResponseFormatter("{description}") if plan.description_formatter else None
+        ),
+        tag_extractor=tag_extractor,
+    )
+
+
+def compile_search_plans(resource_types: dict) -> dict:
+    search_plans = {
+        resource_type: _compile_plan(resource_type, resource_type_conf)
+        for resource_type, resource_type_conf in resource_types.items()
+    }
+    _LOGGER.debug(f"[compile_search_plans] resource types: {list(search_plans)}")
+    return search_plans
+
+
+def _compile_plan(resource_type: str, resource_type_conf: dict) -> ResourceTypePlan:
+    def _error(reason: str):
+        return ERROR_INVALID_SEARCH_CONF(resource_type=resource_type, reason=reason)
+
+    if len(resource_type.split(".")) != 2:
+        raise _error("resource type must be formatted as <service>.<Resource>.")
+
+    request_conf = resource_type_conf.get("request")
+    response_conf = resource_type_conf.get("response")
+    if not isinstance(request_conf, dict) or not isinstance(response_conf, dict):
+        raise _error("request and response are required.")
+
+    search_fields = request_conf.get("search")
+    if not search_fields or not all(isinstance(f, str) for f in search_fields):
+        raise _error("request.search must be a non-empty list of fields.")
+
+    request_filters = request_conf.get("filter", [])
+    if not isinstance(request_filters, list) or not all(
+        isinstance(f, dict) for f in request_filters
+    ):
+        raise _error("request.filter must be a list of filter dicts.")
+
+    projection = request_conf.get("projection")
+    if projection is not None and not isinstance(projection, dict):
+        raise _error("request.projection must be a dict.")
+
+    pipeline = request_conf.get("pipeline", [])
+    if not isinstance(pipeline, list) or not all(
+        isinstance(stage, dict) and len(stage) == 1 and set(stage) <= PIPELINE_STAGES
+        for stage in pipeline
+    ):
+        raise _error(
+            f"request.pipeline must be a list of single stages in {sorted(PIPELINE_STAGES)}."
+        )
+
+    sort_key = request_conf.get("sort", DEFAULT_SORT_KEY)
+    if not isinstance(sort_key, str):
+        raise _error("request.sort must be a field name.")
+
+    ngram_index = request_conf.get("ngram_index", False)
+    if not isinstance(ngram_index, bool):
+        raise _error("request.ngram_index must be a boolean.")
+
+    search_index = request_conf.get("search_index", False)
+    if not isinstance(search_index, bool):
+        raise _error("request.search_index must be a boolean.")
+
+    match = request_conf.get("match", MATCH_MODES[0])
+    if match not in MATCH_MODES:
+        raise _error(f"request.match must be one of {list(MATCH_MODES)}.")
+
+    rank = request_conf.get("rank")
+    if rank is not None and not isinstance(rank, bool):
+        raise _error("request.rank must be a boolean.")
+
+    resource_id_key = response_conf.get("resource_id")
+    if not isinstance(resource_id_key, str):
+        raise _error("response.resource_id is required.")
+
+    tags = response_conf.get("tags")
+    if tags is not None and (
+        not isinstance(tags, dict)
+        or not all(isinstance(path, str) for path in tags.values())
+    ):
+        raise _error("response.tags must map tag keys to result fields.")
+
+    try:
+        name_formatter = ResponseFormatter(response_conf["name"])
+        description_formatter = None
+        if description_format := response_conf.get("description"):
+            description_formatter = ResponseFormatter(description_format)
+    except (KeyError, ValueError, TypeError) as e:
+        raise _error(f"response.name and response.description must be valid formats: {e}")
+
+    tag_extractor = TagExtractor(tags) if tags else None
+
+    if projection is None:
+        projection = _infer_projection(
+            resource_type,
+            resource_id_key,
+            name_formatter,
+            description_formatter,
+            tag_extractor,
+        )
+
+    return ResourceTypePlan(
+        resource_type=resource_type,
+        collection_type=resource_type,
+        search_fields=tuple(search_fields),
+        request_filters=tuple(request_filters),
+        projection=projection,
+        pipeline=tuple(pipeline),
+        sort_key=sort_key,
+        ngram_index=ngram_index,
+        search_index=search_index,
+        match=match,
+        rank=rank,
+        resource_id_key=resource_id_key,
+        name_formatter=name_formatter,
+        description_formatter=description_formatter,
+        tag_extractor=tag_extractor,
+    )
+
+
+def _infer_projection(
+    resource_type: str,
+    resource_id_key: str,
+    name_formatter: ResponseFormatter,
+    description_formatter: Union[ResponseFormatter, None],
+    tag_extractor: Union[TagExtractor, None],
+) -> dict:
+    fields = [*RESPONSE_FIELDS, resource_id_key, *name_formatter.fields]
+    if description_formatter:
+        fields.extend(description_formatter.fields)
+    if tag_extractor:
+        fields.extend(path for _, path, _ in tag_extractor.tags)
+    fields.extend(ENRICHMENT_FIELDS.get(resource_type, []))
+
+    # a parent path already returns its children and mongo rejects both together
+    paths = sorted(set(fields))
+    return {
+        path: 1
+        for path in paths
+        if not any(path.startswith(f"{parent}.") for parent in paths)
+    }
+
+
+def _load_resource_types() -> dict:
+    package = config.get_package()
+    search_conf_module = __import__(
+        f"{package}.conf.search_conf", fromlist=["search_conf"]
+    )
+    return getattr(search_conf_module, "RESOURCE_TYPES", {})
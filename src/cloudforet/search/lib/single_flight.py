@@ -0,0 +1,131 @@
+import asyncio
+import copy
+import hashlib
+import json
+import threading
+
+from spaceone.core import config
+
+from cloudforet.search.lib.metrics import count_coalesced_request
+
+__all__ = ["AsyncSingleFlight", "SingleFlight", "make_flight_key"]
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs one call per key at a time and shares its result with concurrent callers.
+
+    Callers that arrive while a call with the same key is running wait for it
+    instead of running their own. Each waiter gets a deep copy of the result, so
+    callers can keep mutating what they get back, unless copy_result is off for
+    results that are shared anyway.
+    """
+
+    def __init__(self, name: str, copy_result: bool = True):
+        self.name = name
+        self.copy_result = copy_result
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, func: callable, *args, **kwargs):
+        if not _is_enabled():
+            return func(*args, **kwargs)
+
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                is_leader = True
+            else:
+                call.waiters += 1
+                is_leader = False
+
+        if not is_leader:
+            call.event.wait()
+            count_coalesced_request(self.name)
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result) if self.copy_result else call.result
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            # cancellations too, or waiters would return an empty result
+            call.error = e
+            raise
+        else:
+            # copied before the leader returns and its caller starts mutating it
+            with self._lock:
+                if call.waiters:
+                    call.result = (
+                        copy.deepcopy(result) if self.copy_result else result
+                    )
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+
+class _AsyncCall:
+    def __init__(self):
+        self.event = asyncio.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines.
+
+    Calls must all run on one event loop, which is what makes the bookkeeping
+    safe without a lock.
+    """
+
+    def __init__(self, name: str, copy_result: bool = True):
+        self.name = name
+        self.copy_result = copy_result
+        self._calls = {}
+
+    async def do(self, key: str, func: callable, *args, **kwargs):
+        if not _is_enabled():
+            return await func(*args, **kwargs)
+
+        call = self._calls.get(key)
+        if call is not None:
+            call.waiters += 1
+            await call.event.wait()
+            count_coalesced_request(self.name)
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result) if self.copy_result else call.result
+
+        call = self._calls[key] = _AsyncCall()
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        else:
+            if call.waiters:
+                call.result = copy.deepcopy(result) if self.copy_result else result
+            return result
+        finally:
+            self._calls.pop(key, None)
+            call.event.set()
+
+
+def make_flight_key(*parts) -> str:
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _is_enabled() -> bool:
+    return config.get_global("SEARCH_SINGLE_FLIGHT", {}).get("enabled", True)
@@ -1 +1,10 @@
 from cloudforet.search.manager.identity_manager import IdentityManager
+from cloudforet.search.manager.cache_manager import CacheManager
+from cloudforet.search.manager.project_group_tree_manager import ProjectGroupTreeManager
+from cloudforet.search.manager.workspace_directory_manager import (
+    WorkspaceDirectoryManager,
+)
+from cloudforet.search.manager.identity_change_manager import IdentityChangeManager
+from cloudforet.search.manager.search_index_change_manager import (
+    SearchIndexChangeManager,
+)
@@ -0,0 +1,261 @@
+import asyncio
+import inspect
+import logging
+from typing import Callable, Sequence, Tuple, Union
+
+from pymongo.errors import ExecutionTimeout
+from spaceone.core.manager import BaseManager
+
+from cloudforet.search.lib import entity_cache, result_cache
+from cloudforet.search.lib.metrics import measure, measured
+from cloudforet.search.lib.pymongo_client import SpaceONEAsyncPymongoClient
+from cloudforet.search.lib.single_flight import AsyncSingleFlight, make_flight_key
+from cloudforet.search.manager.resource_manager import (
+    ENTITY_CACHE_EXPIRE,
+    ResourceManager,
+)
+
+_LOGGER = logging.getLogger("spaceone")
+
+_SEARCH_RESOURCE_FLIGHT = AsyncSingleFlight("resource_manager.search_resource")
+
+
+class AsyncResourceManager(ResourceManager):
+    """Coroutine version of the searches of ResourceManager.
+
+    search_resource and its enrichment lookups have the same names and arguments as
+    in ResourceManager but must be awaited on the loop of SpaceONEAsyncPymongoClient,
+    e.g. with run_coroutine(). Access scope lookups stay on ResourceManager.
+    """
+
+    def __init__(self, *args, **kwargs):
+        BaseManager.__init__(self, *args, **kwargs)
+        self.client = SpaceONEAsyncPymongoClient()
+
+    @staticmethod
+    def run_coroutine(coroutine):
+        return SpaceONEAsyncPymongoClient.run_coroutine(coroutine)
+
+    async def search_resource(
+        self,
+        domain_id: str,
+        find_filter: dict,
+        projection: dict,
+        resource_type: str,
+        limit: int,
+        sort_key: str = "_id",
+        last_key: dict = None,
+        score: dict = None,
+        max_time_ms: int = None,
+        pipeline: Sequence[dict] = None,
+    ) -> Tuple[list, Union[dict, None], bool]:
+        query_hash, cache_key = self._make_search_cache_key(
+            domain_id,
+            find_filter,
+            projection,
+            resource_type,
+            limit,
+            sort_key,
+            last_key,
+            score,
+            pipeline,
+        )
+        if cache_key:
+            if cached := await self._run_blocking(
+                result_cache.get_results, cache_key, resource_type
+            ):
+                return (*cached, False)
+
+        # a caller with a longer budget must not get the partial results of another
+        return await _SEARCH_RESOURCE_FLIGHT.do(
+            make_flight_key(query_hash, max_time_ms),
+            self._search_resource,
+            domain_id,
+            find_filter,
+            projection,
+            resource_type,
+            limit,
+            sort_key,
+            last_key,
+            score,
+            pipeline,
+            cache_key,
+            max_time_ms,
+        )
+
+    async def _search_resource(
+        self,
+        domain_id: str,
+        find_filter: dict,
+        projection: dict,
+        resource_type: str,
+        limit: int,
+        sort_key: str,
+        last_key: Union[dict, None],
+        score: Union[dict, None],
+        pipeline: Union[Sequence[dict], None],
+        cache_key: Union[str, None],
+        max_time_ms: Union[int, None],
+    ) -> Tuple[list, Union[dict, None], bool]:
+        with measure(
+            self._get_search_metric_name(score, pipeline), resource_type=resource_type
+        ):
+            results, partial = await self._read_results(
+                self._make_search_cursor_opener(
+                    find_filter,
+                    projection,
+                    resource_type,
+                    limit,
+                    sort_key,
+                    last_key,
+                    score,
+                    pipeline,
+                    max_time_ms,
+                )
+            )
+
+        # last key must be taken before enrichment changes the display fields
+        next_last_key = self._make_next_last_key(results, sort_key, score, pipeline)
+
+        if partial:
+            self._check_time_budget_exceeded(
+                domain_id, resource_type, results, max_time_ms
+            )
+
+        # a declared pipeline already enriched the results in the same round trip
+        if not pipeline:
+            with measure("resource_manager.enrichment", resource_type=resource_type):
+                await self._enrich_results(domain_id, resource_type, results)
+
+        if cache_key and not partial:
+            await self._run_blocking(
+                result_cache.set_results,
+                cache_key,
+                resource_type,
+                results,
+                next_last_key,
+            )
+
+        _LOGGER.debug(
+            f"[search] resource_type: {resource_type}, find_filter: {find_filter}"
+        )
+        return results, next_last_key, partial
+
+    @staticmethod
+    async def _read_results(open_cursor: Callable) -> Tuple[list, bool]:
+        results = []
+        try:
+            cursor = open_cursor()
+            if inspect.isawaitable(cursor):
+                # aggregate runs its first batch when the cursor is opened
+                cursor = await cursor
+            async for result in cursor:
+                results.append(result)
+        except ExecutionTimeout:
+            return results, True
+        return results, False
+
+    async def _enrich_results(self, domain_id: str, resource_type: str, results: list):
+        if resource_type == "identity.Project":
+            self._set_project_group_paths(
+                results,
+                await self.get_project_group_map(
+                    domain_id, self._get_project_group_ids(results)
+                ),
+            )
+        elif resource_type == "dashboard.PublicDashboard":
+            self._set_dashboard_descriptions(
+                results,
+                await self.get_project_and_project_group_name_map(
+                    domain_id, self._get_project_ids(results)
+                ),
+            )
+
+    @measured("resource_manager.get_project_and_project_group_name_map")
+    async def get_project_and_project_group_name_map(
+        self, domain_id: str, project_ids: list
+    ) -> dict:
+        key_prefix = f"search:project:{domain_id}"
+        project_ids = list(dict.fromkeys(project_ids))
+        project_map = await self._run_blocking(
+            entity_cache.get_many, key_prefix, project_ids
+        )
+
+        # paths of the groups of cached projects are looked up while the missing
+        # projects are read
+        missing_project_map, project_group_map = await asyncio.gather(
+            self._find_projects(
+                domain_id, self._get_missing_ids(project_ids, project_map)
+            ),
+            self.get_project_group_map(
+                domain_id, self._get_project_group_ids(project_map.values())
+            ),
+        )
+        project_map.update(missing_project_map)
+
+        if missing_project_group_ids := self._get_missing_ids(
+            self._get_project_group_ids(missing_project_map.values()),
+            project_group_map,
+        ):
+            project_group_map.update(
+                await self.get_project_group_map(domain_id, missing_project_group_ids)
+            )
+
+        return self._make_project_and_project_group_name_map(
+            project_map, project_group_map
+        )
+
+    @measured("resource_manager.get_project_map")
+    async def _find_projects(self, domain_id: str, project_ids: list) -> dict:
+        if not project_ids:
+            return {}
+
+        db_name, collection_name = self._get_collection_and_db_name("identity.Project")
+        response = self.client[db_name][collection_name].find(
+            {
+                "domain_id": domain_id,
+                "project_id": {"$in": project_ids},
+            },
+            projection={
+                "_id": 0,
+                "project_id": 1,
+                "name": 1,
+                "project_group_id": 1,
+            },
+        )
+        project_map = {
+            project_info["project_id"]: self._make_project_info(project_info)
+            async for project_info in response
+        }
+
+        await self._run_blocking(
+            entity_cache.set_many,
+            f"search:project:{domain_id}",
+            project_map,
+            ENTITY_CACHE_EXPIRE,
+        )
+        return project_map
+
+    @measured("resource_manager.get_project_group_map")
+    async def get_project_group_map(
+        self, domain_id: str, project_group_ids: list
+    ) -> dict:
+        project_group_tree_mgr = self.locator.get_manager("ProjectGroupTreeManager")
+        project_group_ids = list(dict.fromkeys(project_group_ids))
+
+        if project_group_tree_mgr.is_fresh(domain_id, project_group_ids):
+            return project_group_tree_mgr.get_project_group_paths(
+                domain_id, project_group_ids
+            )
+
+        # the tree is loaded with the sync client, so keep it off the event loop
+        return await self._run_blocking(
+            project_group_tree_mgr.get_project_group_paths,
+            domain_id,
+            project_group_ids,
+        )
+
+    @staticmethod
+    async def _run_blocking(func: Callable, *args):
+        # cache and sync client calls would stall every search on the shared loop
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
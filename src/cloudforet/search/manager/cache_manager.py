@@ -0,0 +1,47 @@
+import logging
+
+from spaceone.core import cache
+from spaceone.core.manager import BaseManager
+
+from cloudforet.search.lib import result_cache
+
+_LOGGER = logging.getLogger("spaceone")
+
+
+class CacheManager(BaseManager):
+    def delete_role_binding_caches(self, domain_id: str, user_id: str) -> None:
+        self._delete_pattern(f"search:workspaces:{domain_id}:{user_id}")
+        self._delete_pattern(f"search:access-scope:{domain_id}:{user_id}:*")
+
+    def delete_project_caches(self, domain_id: str) -> None:
+        self._delete_pattern(f"search:access-scope:{domain_id}:*")
+        self._delete_pattern(f"search:project:{domain_id}:*")
+
+    def delete_workspace_caches(self, domain_id: str) -> None:
+        self._delete_pattern(f"search:access-scope:{domain_id}:*")
+        self._delete_pattern(f"search:workspaces:{domain_id}:*")
+
+    def delete_project_cache(self, domain_id: str, project_id: str) -> None:
+        self._delete_pattern(f"search:project:{domain_id}:{project_id}")
+
+    def delete_access_scope_caches(self, domain_id: str) -> None:
+        self._delete_pattern(f"search:access-scope:{domain_id}:*")
+
+    def delete_identity_caches(self) -> None:
+        # used when changes may have been missed, e.g. the resume token expired
+        self._delete_pattern("search:workspaces:*")
+        self._delete_pattern("search:access-scope:*")
+        self._delete_pattern("search:project:*")
+        result_cache.invalidate_all()
+
+    @staticmethod
+    def delete_result_caches(domain_id: str) -> None:
+        result_cache.invalidate(domain_id)
+
+    @staticmethod
+    def _delete_pattern(pattern: str) -> None:
+        if not cache.is_set():
+            return
+
+        _LOGGER.debug(f"[_delete_pattern] delete cache: {pattern}")
+        cache.delete_pattern(pattern)
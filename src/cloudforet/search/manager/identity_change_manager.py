@@ -0,0 +1,217 @@
+import logging
+import threading
+from typing import Union
+
+from pymongo.errors import OperationFailure, PyMongoError
+from spaceone.core import config
+
+from cloudforet.search.manager.cache_manager import CacheManager
+from cloudforet.search.manager.project_group_tree_manager import (
+    ProjectGroupTreeManager,
+)
+from cloudforet.search.manager.resource_manager import ResourceManager
+from cloudforet.search.manager.workspace_directory_manager import (
+    WorkspaceDirectoryManager,
+)
+
+_LOGGER = logging.getLogger("spaceone")
+
+DEFAULT_IDENTITY_CHANGE_STREAM_CONF = {
+    "enabled": False,
+    # read deleted documents from pre-images (MongoDB >= 6.0, enabled per collection)
+    "pre_images": False,
+    "retry_interval": 5,
+}
+# resuming is impossible, so changes may have been missed
+UNRESUMABLE_ERROR_CODES = {260, 280, 286}
+
+# project fields that decide which users can see a project
+PROJECT_ACCESS_FIELDS = {"project_type", "users", "user_groups", "workspace_id"}
+
+_WATCHER_THREAD = None
+_WATCHER_STOP_EVENT = threading.Event()
+_WATCHER_LOCK = threading.Lock()
+
+
+class IdentityChangeManager(ResourceManager):
+    """Evicts caches built from identity collections when their documents change.
+
+    Consumes one change stream on the identity database, filtered to role_binding,
+    project, project_group and workspace, and removes only the cache entries the
+    changed document can affect.
+
+    The resume token is kept per process, as the project group tree and workspace
+    directories it keeps up to date are. A position saved by another process would
+    skip changes this process has not applied yet.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_mgr = CacheManager()
+        self.project_group_tree_mgr = ProjectGroupTreeManager()
+        self.workspace_directory_mgr = WorkspaceDirectoryManager()
+        self.watch_conf = {
+            **DEFAULT_IDENTITY_CHANGE_STREAM_CONF,
+            **config.get_global("IDENTITY_CHANGE_STREAM", {}),
+        }
+
+        self.handlers = {}
+        for resource_type, handler in [
+            ("identity.RoleBinding", self._handle_role_binding_change),
+            ("identity.Project", self._handle_project_change),
+            ("identity.ProjectGroup", self._handle_project_group_change),
+            ("identity.Workspace", self._handle_workspace_change),
+        ]:
+            self.db_name, collection_name = self._get_collection_and_db_name(
+                resource_type
+            )
+            self.handlers[collection_name] = handler
+
+        self._saved_resume_token = None
+
+    def watch(self, stop_event: threading.Event) -> None:
+        while not stop_event.is_set():
+            try:
+                self._watch_changes(stop_event)
+            except OperationFailure as e:
+                if e.code in UNRESUMABLE_ERROR_CODES:
+                    _LOGGER.warning(f"[watch] cannot resume identity changes: {e}")
+                    self._save_resume_token(None)
+                else:
+                    _LOGGER.error(f"[watch] identity change stream failed: {e}")
+                    stop_event.wait(self.watch_conf["retry_interval"])
+            except PyMongoError as e:
+                _LOGGER.error(f"[watch] identity change stream failed: {e}")
+                stop_event.wait(self.watch_conf["retry_interval"])
+
+    def handle_change(self, change: dict) -> None:
+        operation_type = change["operationType"]
+        if operation_type in ["drop", "rename", "dropDatabase", "invalidate"]:
+            self._delete_identity_caches()
+            return
+
+        collection_name = change.get("ns", {}).get("coll")
+        if handler := self.handlers.get(collection_name):
+            document = change.get("fullDocument") or change.get(
+                "fullDocumentBeforeChange"
+            )
+            handler(operation_type, document, self._get_changed_fields(change))
+
+    def _watch_changes(self, stop_event: threading.Event) -> None:
+        resume_token = self._get_resume_token()
+        if resume_token is None:
+            # nothing tells which changes were made while no one was watching
+            self._delete_identity_caches()
+
+        options = {
+            "full_document": "updateLookup",
+            "max_await_time_ms": 1000,
+            "resume_after": resume_token,
+        }
+        if self.watch_conf["pre_images"]:
+            options["full_document_before_change"] = "whenAvailable"
+
+        pipeline = [{"$match": {"ns.coll": {"$in": list(self.handlers.keys())}}}]
+        with self.client[self.db_name].watch(pipeline, **options) as stream:
+            _LOGGER.debug(f"[_watch_changes] watch {list(self.handlers.keys())}")
+            while stream.alive and not stop_event.is_set():
+                if change := stream.try_next():
+                    self.handle_change(change)
+                self._save_resume_token(stream.resume_token)
+
+    def _handle_role_binding_change(
+        self, operation_type: str, document: Union[dict, None], changed_fields: set
+    ) -> None:
+        if document and document.get("user_id"):
+            self.workspace_directory_mgr.reset(document["domain_id"])
+            self.cache_mgr.delete_role_binding_caches(
+                document["domain_id"], document["user_id"]
+            )
+        elif operation_type == "delete":
+            # without a pre-image the user of a deleted role binding is unknown
+            self._delete_identity_caches()
+
+    def _handle_project_change(
+        self, operation_type: str, document: Union[dict, None], changed_fields: set
+    ) -> None:
+        # a deleted project left behind in a cached access scope matches nothing
+        if document is None:
+            return
+
+        domain_id = document["domain_id"]
+        self.cache_mgr.delete_project_cache(domain_id, document["project_id"])
+        self.cache_mgr.delete_result_caches(domain_id)
+
+        if operation_type != "update" or changed_fields & PROJECT_ACCESS_FIELDS:
+            self.cache_mgr.delete_access_scope_caches(domain_id)
+
+    def _handle_project_group_change(
+        self, operation_type: str, document: Union[dict, None], changed_fields: set
+    ) -> None:
+        # without a pre-image, the tree drops deleted groups on its next refresh
+        if document is None:
+            return
+
+        self.cache_mgr.delete_result_caches(document["domain_id"])
+        if operation_type == "delete":
+            self.project_group_tree_mgr.delete_project_groups(
+                document["domain_id"], [document["project_group_id"]]
+            )
+        else:
+            self.project_group_tree_mgr.apply_changes(document["domain_id"], [document])
+
+    def _handle_workspace_change(
+        self, operation_type: str, document: Union[dict, None], changed_fields: set
+    ) -> None:
+        if document:
+            self.workspace_directory_mgr.reset(document["domain_id"])
+            self.cache_mgr.delete_workspace_caches(document["domain_id"])
+            self.cache_mgr.delete_result_caches(document["domain_id"])
+        elif operation_type == "delete":
+            self._delete_identity_caches()
+
+    def _delete_identity_caches(self) -> None:
+        self.cache_mgr.delete_identity_caches()
+        self.project_group_tree_mgr.reset()
+        self.workspace_directory_mgr.reset()
+
+    def _get_resume_token(self) -> Union[dict, None]:
+        return self._saved_resume_token
+
+    def _save_resume_token(self, resume_token: Union[dict, None]) -> None:
+        self._saved_resume_token = resume_token
+
+    @staticmethod
+    def _get_changed_fields(change: dict) -> set:
+        update_description = change.get("updateDescription") or {}
+        changed_fields = list(update_description.get("updatedFields", {}).keys())
+        changed_fields.extend(update_description.get("removedFields", []))
+        return {field.split(".", 1)[0] for field in changed_fields}
+
+
+def start_identity_change_watcher() -> None:
+    global _WATCHER_THREAD
+
+    if not config.get_global("IDENTITY_CHANGE_STREAM", {}).get("enabled", False):
+        return
+
+    with _WATCHER_LOCK:
+        if _WATCHER_THREAD is None:
+            _WATCHER_THREAD = threading.Thread(
+                target=IdentityChangeManager().watch,
+                args=(_WATCHER_STOP_EVENT,),
+                name="identity-change-stream",
+                daemon=True,
+            )
+            _WATCHER_THREAD.start()
+
+
+def stop_identity_change_watcher() -> None:
+    global _WATCHER_THREAD
+
+    with _WATCHER_LOCK:
+        if _WATCHER_THREAD is not None:
+            _WATCHER_STOP_EVENT.set()
+            _WATCHER_THREAD.join()
+            _WATCHER_THREAD = None
+            _WATCHER_STOP_EVENT.clear()
@@ -4,6 +4,8 @@ from spaceone.core import cache
 from spaceone.core.manager import BaseManager
 from spaceone.core.connector.space_connector import SpaceConnector
 
+from cloudforet.search.lib.metrics import measured
+
 _LOGGER = logging.getLogger("spaceone")
 
 
@@ -14,6 +16,7 @@ class IdentityManager(BaseManager):
             SpaceConnector, service="identity"
         )
 
+    @measured("identity_manager.get_workspaces")
     @cache.cacheable(
         key="search:workspaces:{domain_id}:{user_id}",
         expire=180,
@@ -21,5 +24,6 @@ class IdentityManager(BaseManager):
     def get_workspaces(self, domain_id: str, user_id: str) -> dict:
         return self.identity_conn.dispatch("UserProfile.get_workspaces")
 
+    @measured("identity_manager.list_workspace")
     def list_workspace(self, query: dict) -> dict:
         return self.identity_conn.dispatch("Workspace.list", {"query": query})
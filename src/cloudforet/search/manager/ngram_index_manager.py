@@ -0,0 +1,287 @@
+import logging
+from datetime import datetime
+from typing import Union
+
+from pymongo import ASCENDING, ReplaceOne
+from spaceone.core import cache, config
+from spaceone.core.utils import get_dict_value
+
+from cloudforet.search.lib.metrics import measured
+from cloudforet.search.lib.search_plan import ResourceTypePlan
+from cloudforet.search.manager.resource_manager import ResourceManager
+
+_LOGGER = logging.getLogger("spaceone")
+
+NGRAM_SIZE = 3
+NGRAM_MAX_CANDIDATES = 5000
+NGRAM_BULK_SIZE = 1000
+REGEX_SPECIAL_CHARACTERS = set(".^$*+?{}[]\\|()")
+
+
+class NgramIndexManager(ResourceManager):
+    """Maintains lowercase trigram entries of searchable fields in search.ngram_index.
+
+    Entries are kept up to date by SearchIndexChangeManager, which re-indexes the
+    source documents of change stream events by their _id. A resource type is only
+    searched through the index while SEARCH_INDEX_CHANGE_STREAM is enabled and a
+    full rebuild has marked it READY for the domain; otherwise the regex scan is
+    used.
+    """
+
+    index_name = "ngram-index"
+    index_resource_type = "search.NgramIndex"
+    state_resource_type = "search.NgramIndexState"
+    entry_field = "grams"
+
+    @measured("ngram_index_manager.find_candidate_ids")
+    def find_candidate_ids(
+        self, domain_id: str, plan: ResourceTypePlan, keyword: str
+    ) -> Union[list, None]:
+        if not self._is_indexable_keyword(keyword):
+            return None
+
+        if not self.is_index_ready(domain_id, plan.resource_type):
+            return None
+
+        db_name, collection_name = self._get_collection_and_db_name(
+            self.index_resource_type
+        )
+        response = list(
+            self.client[db_name][collection_name].find(
+                {
+                    "domain_id": domain_id,
+                    "resource_type": plan.resource_type,
+                    "grams": {"$all": sorted(self.make_ngrams(keyword))},
+                },
+                projection={"_id": 0, "resource_id": 1},
+                limit=NGRAM_MAX_CANDIDATES + 1,
+            )
+        )
+
+        # an unselective keyword is cheaper to answer with the regex scan and limit
+        if len(response) > NGRAM_MAX_CANDIDATES:
+            return None
+
+        return [ngram_info["resource_id"] for ngram_info in response]
+
+    def is_index_ready(self, domain_id: str, resource_type: str) -> bool:
+        # without the change stream, entries miss every change since the rebuild
+        if not config.get_global("SEARCH_INDEX_CHANGE_STREAM", {}).get(
+            "enabled", False
+        ):
+            return False
+        return self._is_index_ready(self.index_name, domain_id, resource_type)
+
+    @cache.cacheable(
+        key="search:{index_name}-state:{domain_id}:{resource_type}", expire=300
+    )
+    def _is_index_ready(
+        self, index_name: str, domain_id: str, resource_type: str
+    ) -> bool:
+        db_name, collection_name = self._get_collection_and_db_name(
+            self.state_resource_type
+        )
+        state_info = self.client[db_name][collection_name].find_one(
+            {"domain_id": domain_id, "resource_type": resource_type}
+        )
+        return bool(state_info and state_info.get("state") == "READY")
+
+    def rebuild_index(self, domain_id: str, plan: ResourceTypePlan) -> int:
+        self.create_indexes()
+
+        indexed_at = datetime.utcnow()
+        count = self._index_source(plan, {"domain_id": domain_id}, indexed_at)
+
+        # entries not touched by this rebuild belong to deleted resources
+        db_name, collection_name = self._get_collection_and_db_name(
+            self.index_resource_type
+        )
+        self.client[db_name][collection_name].delete_many(
+            {
+                "domain_id": domain_id,
+                "resource_type": plan.resource_type,
+                "indexed_at": {"$lt": indexed_at},
+            }
+        )
+
+        self._set_index_state(domain_id, plan.resource_type, "READY", indexed_at)
+
+        _LOGGER.debug(
+            f"[rebuild_index] {self.index_name} domain_id: {domain_id}, "
+            f"resource_type: {plan.resource_type}, count: {count}"
+        )
+        return count
+
+    @measured("ngram_index_manager.index_source_ids")
+    def index_source_ids(self, plan: ResourceTypePlan, source_ids: list) -> int:
+        """Re-indexes changed source documents by their _id."""
+
+        indexed_at = datetime.utcnow()
+        count = self._index_source(plan, {"_id": {"$in": source_ids}}, indexed_at)
+
+        # deleted documents and documents that stopped matching request.filter
+        self.delete_source_ids(plan, source_ids, indexed_at)
+        return count
+
+    def index_source_filter(self, plan: ResourceTypePlan, match_filter: dict) -> int:
+        """Re-indexes the source documents that match the filter."""
+
+        return self._index_source(plan, match_filter, datetime.utcnow())
+
+    def index_resources(
+        self, plan: ResourceTypePlan, resources: list, indexed_at: datetime
+    ) -> int:
+        operations = []
+        for resource in resources:
+            resource_id = resource.get(plan.resource_id_key)
+            if not resource_id:
+                continue
+
+            operations.append(
+                ReplaceOne(
+                    {"resource_type": plan.resource_type, "resource_id": resource_id},
+                    {
+                        "resource_type": plan.resource_type,
+                        "resource_id": resource_id,
+                        "source_id": resource["_id"],
+                        "domain_id": resource.get("domain_id"),
+                        self.entry_field: self._make_entry_values(resource, plan),
+                        "indexed_at": indexed_at,
+                    },
+                    upsert=True,
+                )
+            )
+
+        if operations:
+            db_name, collection_name = self._get_collection_and_db_name(
+                self.index_resource_type
+            )
+            self.client[db_name][collection_name].bulk_write(operations, ordered=False)
+
+        return len(operations)
+
+    def delete_source_ids(
+        self, plan: ResourceTypePlan, source_ids: list, indexed_at: datetime = None
+    ) -> None:
+        find_filter = {
+            "resource_type": plan.resource_type,
+            "source_id": {"$in": source_ids},
+        }
+        if indexed_at:
+            find_filter["indexed_at"] = {"$lt": indexed_at}
+
+        db_name, collection_name = self._get_collection_and_db_name(
+            self.index_resource_type
+        )
+        self.client[db_name][collection_name].delete_many(find_filter)
+
+    def get_indexed_domains(self, resource_type: str) -> list:
+        db_name, collection_name = self._get_collection_and_db_name(
+            self.state_resource_type
+        )
+        return self.client[db_name][collection_name].distinct(
+            "domain_id", {"resource_type": resource_type}
+        )
+
+    def set_index_stale(self, domain_id: str, resource_type: str) -> None:
+        # searches go back to the source collection until the next rebuild
+        self._set_index_state(domain_id, resource_type, "STALE", datetime.utcnow())
+
+    def create_indexes(self) -> None:
+        db_name, collection_name = self._get_collection_and_db_name(
+            self.index_resource_type
+        )
+        collection = self.client[db_name][collection_name]
+        collection.create_index(
+            [("resource_type", ASCENDING), ("resource_id", ASCENDING)], unique=True
+        )
+        collection.create_index(
+            [("resource_type", ASCENDING), ("source_id", ASCENDING)]
+        )
+        collection.create_index(
+            [
+                ("domain_id", ASCENDING),
+                ("resource_type", ASCENDING),
+                (self.entry_field, ASCENDING),
+            ]
+        )
+
+        db_name, collection_name = self._get_collection_and_db_name(
+            self.state_resource_type
+        )
+        self.client[db_name][collection_name].create_index(
+            [("domain_id", ASCENDING), ("resource_type", ASCENDING)], unique=True
+        )
+
+    def _set_index_state(
+        self, domain_id: str, resource_type: str, state: str, indexed_at: datetime
+    ) -> None:
+        db_name, collection_name = self._get_collection_and_db_name(
+            self.state_resource_type
+        )
+        self.client[db_name][collection_name].update_one(
+            {"domain_id": domain_id, "resource_type": resource_type},
+            {"$set": {"state": state, "indexed_at": indexed_at}},
+            upsert=True,
+        )
+
+        if cache.is_set():
+            cache.delete(f"search:{self.index_name}-state:{domain_id}:{resource_type}")
+
+    def _index_source(
+        self, plan: ResourceTypePlan, match_filter: dict, indexed_at: datetime
+    ) -> int:
+        source_db_name, source_collection_name = self._get_collection_and_db_name(
+            plan.resource_type
+        )
+        projection = {field: 1 for field in plan.search_fields}
+        projection.update({plan.resource_id_key: 1, "domain_id": 1})
+
+        cursor = self.client[source_db_name][source_collection_name].find(
+            match_filter, projection=projection, batch_size=NGRAM_BULK_SIZE
+        )
+        return self._index_cursor(plan, cursor, indexed_at, NGRAM_BULK_SIZE)
+
+    def _index_cursor(
+        self, plan: ResourceTypePlan, cursor, indexed_at: datetime, bulk_size: int
+    ) -> int:
+        count = 0
+        resources = []
+        for resource in cursor:
+            resources.append(resource)
+            if len(resources) >= bulk_size:
+                count += self.index_resources(plan, resources, indexed_at)
+                resources = []
+
+        if resources:
+            count += self.index_resources(plan, resources, indexed_at)
+
+        return count
+
+    def _make_entry_values(self, resource: dict, plan: ResourceTypePlan) -> list:
+        return sorted(self._make_resource_ngrams(resource, plan))
+
+    def _make_resource_ngrams(self, resource: dict, plan: ResourceTypePlan) -> set:
+        ngrams = set()
+        for field in plan.search_fields:
+            value = get_dict_value(resource, field)
+            values = value if isinstance(value, list) else [value]
+            for value in values:
+                if isinstance(value, str):
+                    ngrams.update(self.make_ngrams(value))
+        return ngrams
+
+    @staticmethod
+    def make_ngrams(value: str) -> set:
+        value = value.lower()
+        return {
+            value[index : index + NGRAM_SIZE]
+            for index in range(len(value) - NGRAM_SIZE + 1)
+        }
+
+    @staticmethod
+    def _is_indexable_keyword(keyword: Union[str, None]) -> bool:
+        # keywords are regex fragments, so only plain text can be answered by ngrams
+        if not keyword or len(keyword) < NGRAM_SIZE:
+            return False
+        return not REGEX_SPECIAL_CHARACTERS.intersection(keyword)
@@ -0,0 +1,87 @@
+import logging
+import re
+from typing import Union
+
+from spaceone.core.utils import get_dict_value
+
+from cloudforet.search.lib.metrics import measured
+from cloudforet.search.lib.search_plan import ResourceTypePlan
+from cloudforet.search.manager.ngram_index_manager import (
+    NgramIndexManager,
+    REGEX_SPECIAL_CHARACTERS,
+)
+
+_LOGGER = logging.getLogger("spaceone")
+
+PREFIX_MAX_CANDIDATES = 5000
+# longer values are cut, which keeps index keys small and cannot change a prefix
+# match of a shorter keyword
+PREFIX_VALUE_MAX_LENGTH = 128
+
+
+class PrefixIndexManager(NgramIndexManager):
+    """Maintains lowercase copies of searchable fields in search.prefix_index.
+
+    The resource collections belong to other services, so the normalized values
+    are kept here. A prefix search becomes a range scan on domain_id, resource_type
+    and values, whose resource ids then narrow down the resource query. Like the
+    ngram index, entries are kept up to date by SearchIndexChangeManager.
+    """
+
+    index_name = "prefix-index"
+    index_resource_type = "search.PrefixIndex"
+    state_resource_type = "search.PrefixIndexState"
+    entry_field = "values"
+
+    @measured("prefix_index_manager.find_candidate_ids")
+    def find_candidate_ids(
+        self, domain_id: str, plan: ResourceTypePlan, keyword: str
+    ) -> Union[list, None]:
+        if not self._is_indexable_keyword(keyword):
+            return None
+
+        if not self.is_index_ready(domain_id, plan.resource_type):
+            return None
+
+        db_name, collection_name = self._get_collection_and_db_name(
+            self.index_resource_type
+        )
+        response = list(
+            self.client[db_name][collection_name].find(
+                {
+                    "domain_id": domain_id,
+                    "resource_type": plan.resource_type,
+                    # an anchored, case-sensitive regex is answered by an index range
+                    "values": {
+                        "$regex": f"^{re.escape(self.normalize_value(keyword))}"
+                    },
+                },
+                projection={"_id": 0, "resource_id": 1},
+                limit=PREFIX_MAX_CANDIDATES + 1,
+            )
+        )
+
+        if len(response) > PREFIX_MAX_CANDIDATES:
+            return None
+
+        return [prefix_info["resource_id"] for prefix_info in response]
+
+    def _make_entry_values(self, resource: dict, plan: ResourceTypePlan) -> list:
+        values = set()
+        for field in plan.search_fields:
+            value = get_dict_value(resource, field)
+            for value in value if isinstance(value, list) else [value]:
+                if isinstance(value, str) and value:
+                    values.add(self.normalize_value(value))
+        return sorted(values)
+
+    @staticmethod
+    def normalize_value(value: str) -> str:
+        return value.lower()[:PREFIX_VALUE_MAX_LENGTH]
+
+    @staticmethod
+    def _is_indexable_keyword(keyword: Union[str, None]) -> bool:
+        # keywords are regex fragments, so only plain text can be answered here
+        if not keyword or len(keyword) > PREFIX_VALUE_MAX_LENGTH:
+            return False
+        return not REGEX_SPECIAL_CHARACTERS.intersection(keyword)
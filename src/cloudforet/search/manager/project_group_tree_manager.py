@@ -0,0 +1,221 @@
+import logging
+import threading
+import time
+from typing import Union
+
+from spaceone.core import config
+
+from cloudforet.search.lib.metrics import measured
+from cloudforet.search.manager.resource_manager import ResourceManager
+
+_LOGGER = logging.getLogger("spaceone")
+
+DEFAULT_PROJECT_GROUP_TREE_CONF = {
+    # seconds between incremental refreshes, which pick up new project groups
+    "refresh_interval": 30,
+    # seconds between full reloads, which also pick up renamed and moved groups
+    "reload_interval": 600,
+}
+PATH_SEPARATOR = " > "
+
+_PROJECT_GROUP_TREES = {}
+_PROJECT_GROUP_TREES_LOCK = threading.Lock()
+
+
+class ProjectGroupTree:
+    """Project groups of one domain with lazily materialized ancestor paths."""
+
+    def __init__(self, domain_id: str):
+        self.domain_id = domain_id
+        self.nodes = {}
+        self.paths = {}
+        self.last_object_id = None
+        self.loaded_at = None
+        self.refreshed_at = None
+        self.lock = threading.Lock()
+
+    def update(self, project_groups: list) -> None:
+        if not project_groups:
+            return
+
+        for pg_info in project_groups:
+            self.nodes[pg_info["project_group_id"]] = (
+                pg_info.get("name"),
+                pg_info.get("parent_group_id"),
+            )
+            if object_id := pg_info.get("_id"):
+                if self.last_object_id is None or object_id > self.last_object_id:
+                    self.last_object_id = object_id
+
+        # a renamed or moved group changes the path of all of its descendants
+        self.paths = {}
+
+    def delete(self, project_group_ids: list) -> None:
+        for project_group_id in project_group_ids:
+            self.nodes.pop(project_group_id, None)
+        self.paths = {}
+
+    def get_path(self, project_group_id: str) -> Union[str, None]:
+        if project_group_id in self.paths:
+            return self.paths[project_group_id]
+
+        if project_group_id not in self.nodes:
+            return None
+
+        names = []
+        visited = set()
+        current_id = project_group_id
+        while current_id in self.nodes and current_id not in visited:
+            if current_id in self.paths:
+                names.append(self.paths[current_id])
+                break
+
+            visited.add(current_id)
+            name, parent_group_id = self.nodes[current_id]
+            names.append(name)
+            current_id = parent_group_id
+
+        path = PATH_SEPARATOR.join(reversed(names))
+        self.paths[project_group_id] = path
+        return path
+
+
+class ProjectGroupTreeManager(ResourceManager):
+    """Serves project group paths from a per-domain tree kept in process memory.
+
+    The tree is loaded in bulk once per domain. After that, requests cost no Mongo
+    query until the next incremental refresh or full reload.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tree_conf = {
+            **DEFAULT_PROJECT_GROUP_TREE_CONF,
+            **config.get_global("PROJECT_GROUP_TREE", {}),
+        }
+
+    def get_project_group_paths(
+        self, domain_id: str, project_group_ids: list
+    ) -> dict:
+        tree = self._get_tree(domain_id)
+
+        if any(pg_id not in tree.nodes for pg_id in project_group_ids):
+            # groups created since the last refresh
+            tree = self._get_tree(domain_id, refresh=True)
+
+        with tree.lock:
+            return {
+                pg_id: path
+                for pg_id in project_group_ids
+                if (path := tree.get_path(pg_id)) is not None
+            }
+
+    def is_fresh(self, domain_id: str, project_group_ids: list) -> bool:
+        tree = _PROJECT_GROUP_TREES.get(domain_id)
+        if tree is None or self._is_expired(tree):
+            return False
+        return all(pg_id in tree.nodes for pg_id in project_group_ids)
+
+    def apply_changes(self, domain_id: str, project_groups: list) -> None:
+        if tree := _PROJECT_GROUP_TREES.get(domain_id):
+            with tree.lock:
+                tree.update(project_groups)
+
+    def delete_project_groups(self, domain_id: str, project_group_ids: list) -> None:
+        if tree := _PROJECT_GROUP_TREES.get(domain_id):
+            with tree.lock:
+                tree.delete(project_group_ids)
+
+    @staticmethod
+    def reset(domain_id: str = None) -> None:
+        with _PROJECT_GROUP_TREES_LOCK:
+            if domain_id:
+                _PROJECT_GROUP_TREES.pop(domain_id, None)
+            else:
+                _PROJECT_GROUP_TREES.clear()
+
+    def _get_tree(self, domain_id: str, refresh: bool = False) -> ProjectGroupTree:
+        tree = _PROJECT_GROUP_TREES.get(domain_id)
+        if tree is None:
+            with _PROJECT_GROUP_TREES_LOCK:
+                tree = _PROJECT_GROUP_TREES.setdefault(
+                    domain_id, ProjectGroupTree(domain_id)
+                )
+
+        if self._is_reload_required(tree):
+            self._reload(tree)
+        elif refresh or self._is_expired(tree):
+            self._refresh(tree)
+
+        return tree
+
+    @measured("project_group_tree_manager.reload")
+    def _reload(self, tree: ProjectGroupTree) -> None:
+        with tree.lock:
+            # another thread may have reloaded while this one waited for the lock
+            if not self._is_reload_required(tree):
+                return
+
+            project_groups = list(
+                self._get_collection().find(
+                    {"domain_id": tree.domain_id}, projection=self._get_projection()
+                )
+            )
+            tree.nodes = {}
+            tree.last_object_id = None
+            tree.update(project_groups)
+            tree.loaded_at = tree.refreshed_at = time.monotonic()
+
+        _LOGGER.debug(
+            f"[_reload] domain_id: {tree.domain_id}, project groups: {len(tree.nodes)}"
+        )
+
+    @measured("project_group_tree_manager.refresh")
+    def _refresh(self, tree: ProjectGroupTree) -> None:
+        with tree.lock:
+            # bounds the refreshes caused by project group ids that do not exist
+            if tree.refreshed_at and time.monotonic() - tree.refreshed_at < 1:
+                return
+
+            collection = self._get_collection()
+            find_filter = {"domain_id": tree.domain_id}
+            if tree.last_object_id:
+                find_filter["_id"] = {"$gt": tree.last_object_id}
+
+            project_groups = list(
+                collection.find(find_filter, projection=self._get_projection())
+            )
+            tree.update(project_groups)
+            tree.refreshed_at = time.monotonic()
+
+            # deleted groups leave the count behind the tree
+            if collection.count_documents({"domain_id": tree.domain_id}) != len(
+                tree.nodes
+            ):
+                tree.loaded_at = None
+
+        if tree.loaded_at is None:
+            self._reload(tree)
+
+    def _is_reload_required(self, tree: ProjectGroupTree) -> bool:
+        return (
+            tree.loaded_at is None
+            or time.monotonic() - tree.loaded_at >= self.tree_conf["reload_interval"]
+        )
+
+    def _is_expired(self, tree: ProjectGroupTree) -> bool:
+        return (
+            tree.refreshed_at is None
+            or time.monotonic() - tree.refreshed_at
+            >= self.tree_conf["refresh_interval"]
+        )
+
+    def _get_collection(self):
+        db_name, collection_name = self._get_collection_and_db_name(
+            "identity.ProjectGroup"
+        )
+        return self.client[db_name][collection_name]
+
+    @staticmethod
+    def _get_projection() -> dict:
+        return {"_id": 1, "project_group_id": 1, "name": 1, "parent_group_id": 1}
@@ -1,14 +1,41 @@
+import functools
 import logging
 import re
-from typing import Tuple
+from typing import Callable, Iterable, Sequence, Tuple, Union
 
-from spaceone.core import cache
+from bson import ObjectId
+from pymongo.errors import ExecutionTimeout
+from spaceone.core.utils import get_dict_value
 from spaceone.core.manager import BaseManager
 
+from cloudforet.search.error.search import ERROR_SEARCH_TIME_BUDGET_EXCEEDED
+from cloudforet.search.lib import entity_cache, result_cache
+from cloudforet.search.lib.metrics import (
+    count_time_budget_exceeded,
+    measure,
+    measured,
+)
 from cloudforet.search.lib.pymongo_client import SpaceONEPymongoClient
+from cloudforet.search.lib.single_flight import SingleFlight, make_flight_key
 
 _LOGGER = logging.getLogger("spaceone")
 
+# names are cached per project so that pages sharing most of their projects still
+# hit the cache
+ENTITY_CACHE_EXPIRE = 180
+
+# relevance score of the ranked search, removed from the results
+SCORE_FIELD = "_search_score"
+
+# copy of the sort value taken before request.pipeline can rewrite it
+SORT_VALUE_FIELD = "_search_sort_value"
+
+# documents per batch of a search with a time budget. A page comes back in several
+# batches, so the ones read before maxTimeMS runs out are kept as partial results.
+TIME_BUDGET_BATCH_SIZE = 5
+
+_SEARCH_RESOURCE_FLIGHT = SingleFlight("resource_manager.search_resource")
+
 
 class ResourceManager(BaseManager):
     client = None
@@ -24,138 +51,359 @@ class ResourceManager(BaseManager):
         projection: dict,
         resource_type: str,
         limit: int,
-        page: int,
-    ) -> list:
-        db_name, collection_name = self._get_collection_and_db_name(resource_type)
-        skip_count = page * limit
+        sort_key: str = "_id",
+        last_key: dict = None,
+        score: dict = None,
+        max_time_ms: int = None,
+        pipeline: Sequence[dict] = None,
+    ) -> Tuple[list, Union[dict, None], bool]:
+        """Returns (results, next_last_key, partial).
+
+        partial is True when max_time_ms ran out, and results are the ones read
+        until then. If none was read, ERROR_SEARCH_TIME_BUDGET_EXCEEDED is raised.
+        """
+
+        query_hash, cache_key = self._make_search_cache_key(
+            domain_id,
+            find_filter,
+            projection,
+            resource_type,
+            limit,
+            sort_key,
+            last_key,
+            score,
+            pipeline,
+        )
+        if cache_key:
+            if cached := result_cache.get_results(cache_key, resource_type):
+                return (*cached, False)
+
+        # a caller with a longer budget must not get the partial results of another
+        return _SEARCH_RESOURCE_FLIGHT.do(
+            make_flight_key(query_hash, max_time_ms),
+            self._search_resource,
+            domain_id,
+            find_filter,
+            projection,
+            resource_type,
+            limit,
+            sort_key,
+            last_key,
+            score,
+            pipeline,
+            cache_key,
+            max_time_ms,
+        )
 
-        results = list(
-            self.client[db_name][collection_name].find(
-                filter=find_filter, projection=projection, limit=limit, skip=skip_count
+    def _search_resource(
+        self,
+        domain_id: str,
+        find_filter: dict,
+        projection: dict,
+        resource_type: str,
+        limit: int,
+        sort_key: str,
+        last_key: Union[dict, None],
+        score: Union[dict, None],
+        pipeline: Union[Sequence[dict], None],
+        cache_key: Union[str, None],
+        max_time_ms: Union[int, None],
+    ) -> Tuple[list, Union[dict, None], bool]:
+        with measure(
+            self._get_search_metric_name(score, pipeline), resource_type=resource_type
+        ):
+            results, partial = self._read_results(
+                self._make_search_cursor_opener(
+                    find_filter,
+                    projection,
+                    resource_type,
+                    limit,
+                    sort_key,
+                    last_key,
+                    score,
+                    pipeline,
+                    max_time_ms,
+                )
             )
-        )
 
-        if resource_type == "identity.Project":
-            project_group_ids = self._get_project_group_ids(results)
-            project_group_map = self.get_project_group_map(domain_id, project_group_ids)
-            for result in results:
-                if pg_id := result.get("project_group_id"):
-                    _name = result.get("name")
-                    result["name"] = f"{project_group_map.get(pg_id)} > {_name}"
-        elif resource_type == "dashboard.PublicDashboard":
-            project_ids = self._get_project_ids(results)
-            project_and_project_group_name_map = (
-                self.get_project_and_project_group_name_map(domain_id, project_ids)
+        # last key must be taken before enrichment changes the display fields
+        next_last_key = self._make_next_last_key(results, sort_key, score, pipeline)
+
+        if partial:
+            self._check_time_budget_exceeded(
+                domain_id, resource_type, results, max_time_ms
             )
 
-            for result in results:
-                dashboard_type = self._get_dashboard_type(result)
-                if result["project_id"] != "*":
-                    project_path = self._make_project_path(
-                        result["project_id"], project_and_project_group_name_map
-                    )
-                    result["description"] = f"{dashboard_type} ({project_path})"
-                else:
-                    result["description"] = dashboard_type
+        # a declared pipeline already enriched the results in the same round trip
+        if not pipeline:
+            with measure("resource_manager.enrichment", resource_type=resource_type):
+                self._enrich_results(domain_id, resource_type, results)
+
+        if cache_key and not partial:
+            result_cache.set_results(cache_key, resource_type, results, next_last_key)
 
         _LOGGER.debug(
             f"[search] resource_type: {resource_type}, find_filter: {find_filter}"
         )
-        return results
+        return results, next_last_key, partial
 
-    def list_workspaces(self, find_filter: dict) -> list:
-        db_name, collection_name = self._get_collection_and_db_name(
-            "identity.Workspace"
+    @staticmethod
+    def _read_results(open_cursor: Callable) -> Tuple[list, bool]:
+        # documents read before maxTimeMS ran out are kept as partial results
+        results = []
+        try:
+            results.extend(open_cursor())
+        except ExecutionTimeout:
+            return results, True
+        return results, False
+
+    def _make_search_cache_key(
+        self,
+        domain_id: str,
+        find_filter: dict,
+        projection: dict,
+        resource_type: str,
+        limit: int,
+        sort_key: str,
+        last_key: Union[dict, None],
+        score: Union[dict, None],
+        pipeline: Union[Sequence[dict], None],
+    ) -> Tuple[str, Union[str, None]]:
+        # the find filter carries the access scope, so equal keys see equal results
+        query_hash = make_flight_key(
+            domain_id,
+            resource_type,
+            find_filter,
+            projection,
+            limit,
+            sort_key,
+            last_key,
+            score,
+            pipeline,
         )
-        response = list(self.client[db_name][collection_name].find(filter=find_filter))
-        return response
+        return query_hash, result_cache.make_key(domain_id, resource_type, query_hash)
 
-    def list_public_projects(self, domain_id: str, workspace_id: str) -> list:
-        db_name, collection_name = self._get_collection_and_db_name("identity.Project")
-        response = list(
-            self.client[db_name][collection_name].find(
-                {
-                    "domain_id": domain_id,
-                    "project_type": "PUBLIC",
-                    "workspace_id": workspace_id,
-                }
+    def _make_search_cursor_opener(
+        self,
+        find_filter: dict,
+        projection: dict,
+        resource_type: str,
+        limit: int,
+        sort_key: str,
+        last_key: Union[dict, None],
+        score: Union[dict, None],
+        pipeline: Union[Sequence[dict], None],
+        max_time_ms: Union[int, None],
+    ) -> Callable:
+        # sync and async collections take the same find and aggregate arguments
+        db_name, collection_name = self._get_collection_and_db_name(resource_type)
+        collection = self._get_search_collection(db_name, collection_name)
+
+        if score is not None:
+            return functools.partial(
+                collection.aggregate,
+                self._make_ranked_pipeline(
+                    find_filter, projection, limit, last_key, score, pipeline
+                ),
+                **self._make_aggregate_options(max_time_ms),
             )
+
+        find_filter, projection, sort = self._make_sorted_query(
+            find_filter, projection, sort_key, last_key
         )
-        return response
+        if pipeline:
+            return functools.partial(
+                collection.aggregate,
+                self._make_sorted_pipeline(
+                    find_filter, projection, sort, limit, pipeline
+                ),
+                **self._make_aggregate_options(max_time_ms),
+            )
+
+        return functools.partial(
+            collection.find,
+            filter=find_filter,
+            projection=projection,
+            limit=limit,
+            sort=sort,
+            max_time_ms=max_time_ms,
+            batch_size=TIME_BUDGET_BATCH_SIZE if max_time_ms else 0,
+        )
+
+    @staticmethod
+    def _get_search_metric_name(
+        score: Union[dict, None], pipeline: Union[Sequence[dict], None]
+    ) -> str:
+        if score is not None:
+            return "resource_manager.ranked_aggregate"
+        if pipeline:
+            return "resource_manager.aggregate"
+        return "resource_manager.find"
 
-    def list_private_projects(
+    def _make_next_last_key(
         self,
+        results: list,
+        sort_key: str,
+        score: Union[dict, None],
+        pipeline: Union[Sequence[dict], None],
+    ) -> Union[dict, None]:
+        if score is not None:
+            return self._pop_ranked_last_key(results)
+        if pipeline and sort_key != "_id":
+            return self._pop_sort_value_last_key(results)
+        return self._make_last_key(results, sort_key)
+
+    @staticmethod
+    def _make_aggregate_options(max_time_ms: Union[int, None]) -> dict:
+        if max_time_ms:
+            return {"maxTimeMS": max_time_ms, "batchSize": TIME_BUDGET_BATCH_SIZE}
+        return {}
+
+    @staticmethod
+    def _check_time_budget_exceeded(
         domain_id: str,
-        workspace_id: str,
-        user_id: str,
-    ) -> list:
-        db_name, collection_name = self._get_collection_and_db_name("identity.Project")
+        resource_type: str,
+        results: list,
+        max_time_ms: Union[int, None],
+    ) -> None:
+        count_time_budget_exceeded(resource_type)
+        _LOGGER.warning(
+            f"[search] time budget exceeded: domain_id: {domain_id}, "
+            f"resource_type: {resource_type}, max_time_ms: {max_time_ms}"
+        )
+
+        # an empty page has no last key to continue from, so it is not a result
+        if not results:
+            raise ERROR_SEARCH_TIME_BUDGET_EXCEEDED(
+                resource_type=resource_type, max_time_ms=max_time_ms
+            )
+
+    def _make_sorted_query(
+        self,
+        find_filter: dict,
+        projection: dict,
+        sort_key: str,
+        last_key: Union[dict, None],
+    ) -> Tuple[dict, dict, list]:
+        if last_key:
+            find_filter = {
+                "$and": [find_filter, self._make_keyset_filter(sort_key, last_key)]
+            }
+
+        sort = [("_id", 1)]
+        if sort_key != "_id":
+            sort.insert(0, (sort_key, 1))
+            projection = self._add_sort_key_to_projection(projection, sort_key)
+
+        return find_filter, projection, sort
+
+    def _enrich_results(self, domain_id: str, resource_type: str, results: list):
+        if resource_type == "identity.Project":
+            self._set_project_group_paths(
+                results,
+                self.get_project_group_map(
+                    domain_id, self._get_project_group_ids(results)
+                ),
+            )
+        elif resource_type == "dashboard.PublicDashboard":
+            self._set_dashboard_descriptions(
+                results,
+                self.get_project_and_project_group_name_map(
+                    domain_id, self._get_project_ids(results)
+                ),
+            )
+
+    @measured("resource_manager.list_workspaces")
+    def list_workspaces(self, find_filter: dict) -> list:
+        db_name, collection_name = self._get_collection_and_db_name(
+            "identity.Workspace"
+        )
         response = list(
             self.client[db_name][collection_name].find(
-                {
-                    "domain_id": domain_id,
-                    "users": {"$in": [user_id]},
-                    "project_type": "PRIVATE",
-                    "workspace_id": workspace_id,
-                }
+                filter=find_filter, projection={"_id": 0, "workspace_id": 1}
             )
         )
         return response
 
-    @cache.cacheable(
-        key="search:project-map:{domain_id}:{project_ids}",
-        expire=180,
-    )
-    def get_project_and_project_group_name_map(
-        self, domain_id: str, project_ids: list
+    @measured("resource_manager.get_workspace_project_map")
+    def get_workspace_project_map(
+        self, domain_id: str, workspaces: list, user_id: str
     ) -> dict:
         db_name, collection_name = self._get_collection_and_db_name("identity.Project")
-        project_results = list(
-            self.client[db_name][collection_name].find(
-                {
-                    "domain_id": domain_id,
-                    "project_id": {"$in": project_ids},
-                }
-            )
+        response = self.client[db_name][collection_name].find(
+            {
+                "domain_id": domain_id,
+                "workspace_id": {"$in": workspaces},
+                "$or": [
+                    {"project_type": "PUBLIC"},
+                    {"project_type": "PRIVATE", "users": user_id},
+                ],
+            },
+            projection={"_id": 0, "project_id": 1, "workspace_id": 1},
         )
 
-        project_group_ids = self._get_project_group_ids(project_results)
-        project_group_map = self.get_project_group_map(domain_id, project_group_ids)
+        workspace_project_map = {workspace_id: [] for workspace_id in workspaces}
+        for project_info in response:
+            workspace_project_map[project_info["workspace_id"]].append(
+                project_info["project_id"]
+            )
 
-        project_and_project_group_name_map = {
-            project_info["project_id"]: {
-                "project_name": project_info["name"],
-                "project_group_name": project_group_map.get(
-                    project_info.get("project_group_id")
-                ),
-            }
-            for project_info in project_results
-        }
+        return workspace_project_map
 
-        return project_and_project_group_name_map
+    @measured("resource_manager.get_project_and_project_group_name_map")
+    def get_project_and_project_group_name_map(
+        self, domain_id: str, project_ids: list
+    ) -> dict:
+        project_map = self.get_project_map(domain_id, project_ids)
 
-    @cache.cacheable(
-        key="search:project-group-map:{domain_id}:{project_group_ids}",
-        expire=180,
-    )
-    def get_project_group_map(self, domain_id: str, project_group_ids: list) -> dict:
-        db_name, collection_name = self._get_collection_and_db_name(
-            "identity.ProjectGroup"
+        project_group_ids = self._get_project_group_ids(project_map.values())
+        project_group_map = self.get_project_group_map(domain_id, project_group_ids)
+
+        return self._make_project_and_project_group_name_map(
+            project_map, project_group_map
         )
-        response = list(
-            self.client[db_name][collection_name].find(
+
+    @measured("resource_manager.get_project_map")
+    def get_project_map(self, domain_id: str, project_ids: list) -> dict:
+        key_prefix = f"search:project:{domain_id}"
+        project_ids = list(dict.fromkeys(project_ids))
+        project_map = entity_cache.get_many(key_prefix, project_ids)
+
+        if missing_ids := self._get_missing_ids(project_ids, project_map):
+            db_name, collection_name = self._get_collection_and_db_name(
+                "identity.Project"
+            )
+            response = self.client[db_name][collection_name].find(
                 {
                     "domain_id": domain_id,
-                    "project_group_id": {"$in": project_group_ids},
-                }
+                    "project_id": {"$in": missing_ids},
+                },
+                projection={
+                    "_id": 0,
+                    "project_id": 1,
+                    "name": 1,
+                    "project_group_id": 1,
+                },
             )
-        )
-        project_group_map = {
-            pg_info["project_group_id"]: pg_info["name"] for pg_info in response
-        }
+            missing_project_map = {
+                project_info["project_id"]: self._make_project_info(project_info)
+                for project_info in response
+            }
+
+            entity_cache.set_many(key_prefix, missing_project_map, ENTITY_CACHE_EXPIRE)
+            project_map.update(missing_project_map)
+
+        return project_map
 
-        return project_group_map
+    @measured("resource_manager.get_project_group_map")
+    def get_project_group_map(self, domain_id: str, project_group_ids: list) -> dict:
+        # full paths of the project groups, served from the in-memory tree
+        project_group_tree_mgr = self.locator.get_manager("ProjectGroupTreeManager")
+        return project_group_tree_mgr.get_project_group_paths(
+            domain_id, list(dict.fromkeys(project_group_ids))
+        )
 
+    @measured("resource_manager.get_role_bindings")
     def get_role_bindings(
         self,
         domain_id: str,
@@ -173,9 +421,21 @@ class ResourceManager(BaseManager):
         if role_type:
             find_filter["role_type"] = role_type
 
-        results = list(self.client[db_name][collection_name].find(filter=find_filter))
+        results = list(
+            self.client[db_name][collection_name].find(
+                filter=find_filter,
+                projection={"_id": 0, "workspace_id": 1, "role_type": 1},
+            )
+        )
         return results
 
+    def _get_search_collection(self, db_name: str, collection_name: str):
+        # only the searched collections are read from secondaries, as they tolerate
+        # replica lag
+        return self.client[db_name][collection_name].with_options(
+            read_preference=SpaceONEPymongoClient.get_search_read_preference()
+        )
+
     def _get_collection_and_db_name(self, resource_type: str) -> Tuple[str, str]:
         service, resource = resource_type.split(".")
 
@@ -188,6 +448,131 @@ class ResourceManager(BaseManager):
 
         return db_name, collection_name
 
+    @staticmethod
+    def _make_keyset_filter(sort_key: str, last_key: dict) -> dict:
+        last_id = last_key["_id"]
+        if ObjectId.is_valid(last_id):
+            last_id = ObjectId(last_id)
+
+        if sort_key == "_id":
+            return {"_id": {"$gt": last_id}}
+
+        last_value = last_key.get("value")
+        if last_value is None:
+            # null values are sorted first, so every non-null value comes after
+            after_value_filter = {sort_key: {"$ne": None}}
+        else:
+            after_value_filter = {sort_key: {"$gt": last_value}}
+
+        return {
+            "$or": [
+                after_value_filter,
+                {sort_key: last_value, "_id": {"$gt": last_id}},
+            ]
+        }
+
+    @staticmethod
+    def _make_last_key(results: list, sort_key: str) -> Union[dict, None]:
+        if not results:
+            return None
+
+        last_result = results[-1]
+        last_key = {"_id": str(last_result["_id"])}
+        if sort_key != "_id":
+            last_key["value"] = get_dict_value(last_result, sort_key)
+        return last_key
+
+    @staticmethod
+    def _make_ranked_pipeline(
+        find_filter: dict,
+        projection: dict,
+        limit: int,
+        last_key: Union[dict, None],
+        score: dict,
+        pipeline: Union[Sequence[dict], None] = None,
+    ) -> list:
+        # every match is scored, since any of them can be an exact hit. The keyword
+        # regex reads them all anyway, and $sort with $limit keeps only the top ones.
+        stages = [
+            {"$match": find_filter},
+            {"$set": {SCORE_FIELD: score}},
+        ]
+        if last_key:
+            last_id = last_key["_id"]
+            if ObjectId.is_valid(last_id):
+                last_id = ObjectId(last_id)
+
+            stages.append(
+                {
+                    "$match": {
+                        "$or": [
+                            {SCORE_FIELD: {"$lt": last_key["score"]}},
+                            {SCORE_FIELD: last_key["score"], "_id": {"$gt": last_id}},
+                        ]
+                    }
+                }
+            )
+
+        stages.append({"$sort": {SCORE_FIELD: -1, "_id": 1}})
+        if limit:
+            stages.append({"$limit": limit})
+        if projection:
+            stages.append({"$project": {**projection, SCORE_FIELD: 1}})
+        stages.extend(pipeline or [])
+        return stages
+
+    @staticmethod
+    def _make_sorted_pipeline(
+        find_filter: dict,
+        projection: dict,
+        sort: list,
+        limit: int,
+        pipeline: Sequence[dict],
+    ) -> list:
+        stages = [{"$match": find_filter}, {"$sort": dict(sort)}]
+        if limit:
+            stages.append({"$limit": limit})
+        if projection:
+            stages.append({"$project": projection})
+
+        # the declared stages may rewrite the sort field, so its value is kept
+        sort_key = sort[0][0]
+        if sort_key != "_id":
+            stages.append({"$set": {SORT_VALUE_FIELD: f"${sort_key}"}})
+
+        stages.extend(pipeline)
+        return stages
+
+    @staticmethod
+    def _pop_ranked_last_key(results: list) -> Union[dict, None]:
+        if not results:
+            return None
+
+        last_key = {
+            "_id": str(results[-1]["_id"]),
+            "score": results[-1].get(SCORE_FIELD),
+        }
+        for result in results:
+            result.pop(SCORE_FIELD, None)
+        return last_key
+
+    def _pop_sort_value_last_key(self, results: list) -> Union[dict, None]:
+        last_key = self._make_last_key(results, SORT_VALUE_FIELD)
+        for result in results:
+            result.pop(SORT_VALUE_FIELD, None)
+        return last_key
+
+    @staticmethod
+    def _add_sort_key_to_projection(projection: dict, sort_key: str) -> dict:
+        if not projection:
+            return projection
+
+        for field in projection.keys():
+            if sort_key == field or sort_key.startswith(f"{field}."):
+                return projection
+
+        return {**projection, sort_key: 1}
+
     @staticmethod
     def get_workspace_owner_workspaces(role_bindings_info: list):
         workspace_owner_workspaces = []
@@ -208,6 +593,53 @@ class ResourceManager(BaseManager):
                 return []
         return workspace_member_workspaces
 
+    @staticmethod
+    def _get_missing_ids(ids: list, cached_map: dict) -> list:
+        return [entity_id for entity_id in ids if entity_id not in cached_map]
+
+    @staticmethod
+    def _make_project_info(project_info: dict) -> dict:
+        return {
+            "name": project_info["name"],
+            "project_group_id": project_info.get("project_group_id"),
+        }
+
+    @staticmethod
+    def _make_project_and_project_group_name_map(
+        project_map: dict, project_group_map: dict
+    ) -> dict:
+        return {
+            project_id: {
+                "project_name": project_info["name"],
+                "project_group_name": project_group_map.get(
+                    project_info.get("project_group_id")
+                ),
+            }
+            for project_id, project_info in project_map.items()
+        }
+
+    @staticmethod
+    def _set_project_group_paths(results: list, project_group_map: dict) -> None:
+        for result in results:
+            if project_group_path := project_group_map.get(
+                result.get("project_group_id")
+            ):
+                _name = result.get("name")
+                result["name"] = f"{project_group_path} > {_name}"
+
+    def _set_dashboard_descriptions(
+        self, results: list, project_and_project_group_name_map: dict
+    ) -> None:
+        for result in results:
+            dashboard_type = self._get_dashboard_type(result)
+            if result["project_id"] != "*":
+                project_path = self._make_project_path(
+                    result["project_id"], project_and_project_group_name_map
+                )
+                result["description"] = f"{dashboard_type} ({project_path})"
+            else:
+                result["description"] = dashboard_type
+
     @staticmethod
     def _get_dashboard_type(result: dict) -> str:
         dashboard_type = "Workspace"
@@ -227,7 +659,7 @@ class ResourceManager(BaseManager):
         return project_ids
 
     @staticmethod
-    def _get_project_group_ids(results: list) -> list:
+    def _get_project_group_ids(results: Iterable[dict]) -> list:
         project_group_ids = []
         for result in results:
             if pg_id := result.get("project_group_id"):
@@ -0,0 +1,379 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Union
+
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
+from spaceone.core import cache, config
+
+from cloudforet.search.lib.search_plan import ResourceTypePlan, get_search_plans
+from cloudforet.search.manager.cache_manager import CacheManager
+from cloudforet.search.manager.identity_change_manager import UNRESUMABLE_ERROR_CODES
+from cloudforet.search.manager.ngram_index_manager import NgramIndexManager
+from cloudforet.search.manager.prefix_index_manager import PrefixIndexManager
+from cloudforet.search.manager.project_group_tree_manager import (
+    ProjectGroupTreeManager,
+)
+from cloudforet.search.manager.resource_manager import ResourceManager
+from cloudforet.search.manager.search_index_manager import SearchIndexManager
+
+_LOGGER = logging.getLogger("spaceone")
+
+DEFAULT_SEARCH_INDEX_CHANGE_STREAM_CONF = {
+    "enabled": False,
+    "retry_interval": 5,
+    # changed documents re-read with one query
+    "batch_size": 500,
+    # seconds before another process takes over the watcher of a database
+    "lease_ttl": 60,
+}
+RESUME_TOKEN_KEY = "search:search-index-change-stream:{db_name}:resume-token"
+RESUME_TOKEN_EXPIRE = 86400
+LEASE_RESOURCE_TYPE = "search.SearchIndexLease"
+
+# search index entries are enriched with the names of identity documents
+# {changed resource type: {enriched resource type: field of the changed document
+# the entries refer to, or None when any entry of the domain can change}}
+ENRICHMENT_DEPENDENCIES = {
+    # renaming or moving a group changes the paths of all of its descendants
+    "identity.ProjectGroup": {
+        "identity.Project": None,
+        "dashboard.PublicDashboard": None,
+    },
+    "identity.Project": {"dashboard.PublicDashboard": "project_id"},
+}
+
+_WATCHER_THREADS = []
+_WATCHER_STOP_EVENT = threading.Event()
+_WATCHER_LOCK = threading.Lock()
+
+
+class SearchIndexChangeManager(ResourceManager):
+    """Applies changes of one source database to the search indexes.
+
+    Consumes one change stream on the database, filtered to the collections of
+    resource types with request.search_index, request.ngram_index or match prefix.
+    Changed documents are re-read in batches by _id and re-indexed, and entries of
+    documents that are gone or no longer match request.filter are deleted. When
+    changes may have been missed, the indexed domains are marked STALE, so searches
+    use the source collections, and rebuilt.
+
+    Every process starts the watchers, but only the holder of the lease of a
+    database consumes its stream, so changes are applied once. Changes of project
+    groups and projects re-index the search index entries enriched with their
+    names, see ENRICHMENT_DEPENDENCIES.
+    """
+
+    def __init__(self, db_name: str, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.db_name = db_name
+        self.watch_conf = {
+            **DEFAULT_SEARCH_INDEX_CHANGE_STREAM_CONF,
+            **config.get_global("SEARCH_INDEX_CHANGE_STREAM", {}),
+        }
+
+        self.search_index_mgr = SearchIndexManager()
+        self.project_group_tree_mgr = ProjectGroupTreeManager()
+        self.cache_mgr = CacheManager()
+
+        index_mgrs = {
+            "search_index": self.search_index_mgr,
+            "ngram_index": NgramIndexManager(),
+            "prefix_index": PrefixIndexManager(),
+        }
+        search_plans = get_search_plans()
+        # collection name: [(index manager, plan)]
+        self.index_plans = {}
+        for resource_type, plan in search_plans.items():
+            db_name, collection_name = self._get_collection_and_db_name(resource_type)
+            if db_name != self.db_name:
+                continue
+
+            for index_name in _get_plan_indexes(plan):
+                self.index_plans.setdefault(collection_name, []).append(
+                    (index_mgrs[index_name], plan)
+                )
+
+        # collection name: (resource type, [(enriched plan, reference key)])
+        self.dependent_plans = {}
+        for resource_type in ENRICHMENT_DEPENDENCIES:
+            db_name, collection_name = self._get_collection_and_db_name(resource_type)
+            if db_name != self.db_name:
+                continue
+
+            if dependent_plans := _get_dependent_plans(resource_type, search_plans):
+                self.dependent_plans[collection_name] = (resource_type, dependent_plans)
+
+        self.lease_owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+        self._lease_renew_at = None
+        self._saved_resume_token = None
+
+    def watch(self, stop_event: threading.Event) -> None:
+        while not stop_event.is_set():
+            try:
+                if not self._hold_lease():
+                    # another process applies the changes of the database
+                    stop_event.wait(self.watch_conf["retry_interval"])
+                    continue
+
+                self._watch_changes(stop_event)
+            except OperationFailure as e:
+                if e.code in UNRESUMABLE_ERROR_CODES:
+                    _LOGGER.warning(
+                        f"[watch] cannot resume {self.db_name} changes: {e}"
+                    )
+                    self._save_resume_token(None)
+                else:
+                    _LOGGER.error(f"[watch] {self.db_name} change stream failed: {e}")
+                    stop_event.wait(self.watch_conf["retry_interval"])
+            except PyMongoError as e:
+                _LOGGER.error(f"[watch] {self.db_name} change stream failed: {e}")
+                stop_event.wait(self.watch_conf["retry_interval"])
+
+        self._release_lease()
+
+    def handle_changes(self, changes: list) -> None:
+        source_ids = {}
+        for change in changes:
+            if change["operationType"] in [
+                "drop",
+                "rename",
+                "dropDatabase",
+                "invalidate",
+            ]:
+                self.rebuild_indexes()
+                return
+
+            collection_name = change.get("ns", {}).get("coll")
+            if (
+                collection_name in self.index_plans
+                or collection_name in self.dependent_plans
+            ):
+                source_ids.setdefault(collection_name, []).append(
+                    change["documentKey"]["_id"]
+                )
+
+        # deletes are re-read as well and drop the entries of missing documents
+        for collection_name, ids in source_ids.items():
+            ids = list(dict.fromkeys(ids))
+            for index_mgr, plan in self.index_plans.get(collection_name, []):
+                index_mgr.index_source_ids(plan, ids)
+
+            if collection_name in self.dependent_plans:
+                self._index_dependents(collection_name, ids)
+
+    def rebuild_indexes(self) -> None:
+        index_plans = [
+            (index_mgr, plan, index_mgr.get_indexed_domains(plan.resource_type))
+            for collection_index_plans in self.index_plans.values()
+            for index_mgr, plan in collection_index_plans
+        ]
+
+        for index_mgr, plan, domain_ids in index_plans:
+            for domain_id in domain_ids:
+                index_mgr.set_index_stale(domain_id, plan.resource_type)
+
+        for index_mgr, plan, domain_ids in index_plans:
+            for domain_id in domain_ids:
+                # a rebuild can outlast the lease, which is renewed between domains
+                if not self._hold_lease():
+                    return
+                index_mgr.rebuild_index(domain_id, plan)
+
+    def _watch_changes(self, stop_event: threading.Event) -> None:
+        resume_token = self._get_resume_token()
+
+        collection_names = list(
+            dict.fromkeys([*self.index_plans, *self.dependent_plans])
+        )
+        pipeline = [{"$match": {"ns.coll": {"$in": collection_names}}}]
+        with self.client[self.db_name].watch(
+            pipeline, max_await_time_ms=1000, resume_after=resume_token
+        ) as stream:
+            _LOGGER.debug(f"[_watch_changes] watch {collection_names}")
+
+            if resume_token is None:
+                # the stream is open first, so changes made while rebuilding replay
+                self.rebuild_indexes()
+
+            while stream.alive and not stop_event.is_set():
+                if not self._hold_lease():
+                    _LOGGER.warning(f"[_watch_changes] lost lease of {self.db_name}")
+                    return
+
+                if changes := self._read_changes(stream):
+                    self.handle_changes(changes)
+                self._save_resume_token(stream.resume_token)
+
+    def _index_dependents(self, collection_name: str, source_ids: list) -> None:
+        resource_type, dependent_plans = self.dependent_plans[collection_name]
+
+        # deleted documents are gone, and the entries referring to them keep their
+        # names until the next rebuild
+        domain_documents = defaultdict(list)
+        for document in self.client[self.db_name][collection_name].find(
+            {"_id": {"$in": source_ids}}
+        ):
+            domain_documents[document["domain_id"]].append(document)
+
+        for domain_id, documents in domain_documents.items():
+            # the names are read from this process's caches, which may lag behind
+            if resource_type == "identity.ProjectGroup":
+                self.project_group_tree_mgr.apply_changes(domain_id, documents)
+            elif resource_type == "identity.Project":
+                for document in documents:
+                    self.cache_mgr.delete_project_cache(
+                        domain_id, document["project_id"]
+                    )
+
+            for plan, reference_key in dependent_plans:
+                match_filter = {"domain_id": domain_id}
+                if reference_key:
+                    match_filter[reference_key] = {
+                        "$in": [document[reference_key] for document in documents]
+                    }
+                self.search_index_mgr.index_source_filter(plan, match_filter)
+
+    def _hold_lease(self) -> bool:
+        # renewed well before it expires, so a slow batch doesn't lose it
+        if self._lease_renew_at and datetime.utcnow() < self._lease_renew_at:
+            return True
+
+        now = datetime.utcnow()
+        lease_ttl = self.watch_conf["lease_ttl"]
+        db_name, collection_name = self._get_collection_and_db_name(
+            LEASE_RESOURCE_TYPE
+        )
+        try:
+            self.client[db_name][collection_name].update_one(
+                {
+                    "_id": self.db_name,
+                    "$or": [
+                        {"owner": self.lease_owner},
+                        {"expires_at": {"$lt": now}},
+                    ],
+                },
+                {
+                    "$set": {
+                        "owner": self.lease_owner,
+                        "expires_at": now + timedelta(seconds=lease_ttl),
+                    }
+                },
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # the lease of another process hasn't expired
+            self._lease_renew_at = None
+            return False
+
+        self._lease_renew_at = now + timedelta(seconds=lease_ttl / 3)
+        return True
+
+    def _release_lease(self) -> None:
+        if self._lease_renew_at is None:
+            return
+
+        self._lease_renew_at = None
+        db_name, collection_name = self._get_collection_and_db_name(
+            LEASE_RESOURCE_TYPE
+        )
+        try:
+            self.client[db_name][collection_name].delete_one(
+                {"_id": self.db_name, "owner": self.lease_owner}
+            )
+        except PyMongoError as e:
+            _LOGGER.warning(f"[_release_lease] failed to release lease: {e}")
+
+    def _read_changes(self, stream) -> list:
+        changes = []
+        while len(changes) < self.watch_conf["batch_size"]:
+            change = stream.try_next()
+            if change is None:
+                break
+            changes.append(change)
+        return changes
+
+    def _get_resume_token(self) -> Union[dict, None]:
+        if not cache.is_set():
+            return self._saved_resume_token
+        return cache.get(RESUME_TOKEN_KEY.format(db_name=self.db_name)) or None
+
+    def _save_resume_token(self, resume_token: Union[dict, None]) -> None:
+        if resume_token == self._saved_resume_token:
+            return
+
+        self._saved_resume_token = resume_token
+        if cache.is_set():
+            resume_token_key = RESUME_TOKEN_KEY.format(db_name=self.db_name)
+            if resume_token:
+                cache.set(resume_token_key, resume_token, expire=RESUME_TOKEN_EXPIRE)
+            else:
+                cache.delete(resume_token_key)
+
+
+def _get_plan_indexes(plan: ResourceTypePlan) -> list:
+    # indexes of the plan that are maintained from the change stream
+    return [
+        index_name
+        for index_name, enabled in [
+            ("search_index", plan.search_index),
+            ("ngram_index", plan.ngram_index),
+            ("prefix_index", plan.match == "prefix"),
+        ]
+        if enabled
+    ]
+
+
+def _get_dependent_plans(resource_type: str, search_plans: dict) -> list:
+    # search index plans enriched from the resource type, with their reference key
+    dependencies = ENRICHMENT_DEPENDENCIES[resource_type]
+    return [
+        (search_plans[dependent_type], reference_key)
+        for dependent_type, reference_key in dependencies.items()
+        if dependent_type in search_plans and search_plans[dependent_type].search_index
+    ]
+
+
+def start_search_index_watchers() -> None:
+    if not config.get_global("SEARCH_INDEX_CHANGE_STREAM", {}).get("enabled", False):
+        return
+
+    with _WATCHER_LOCK:
+        if _WATCHER_THREADS:
+            return
+
+        resource_mgr = ResourceManager()
+        search_plans = get_search_plans()
+        db_names = {
+            resource_mgr._get_collection_and_db_name(resource_type)[0]
+            for resource_type, plan in search_plans.items()
+            if _get_plan_indexes(plan)
+        }
+        db_names.update(
+            resource_mgr._get_collection_and_db_name(resource_type)[0]
+            for resource_type in ENRICHMENT_DEPENDENCIES
+            if _get_dependent_plans(resource_type, search_plans)
+        )
+
+        for db_name in sorted(db_names):
+            watcher_thread = threading.Thread(
+                target=SearchIndexChangeManager(db_name).watch,
+                args=(_WATCHER_STOP_EVENT,),
+                name=f"search-index-change-stream-{db_name}",
+                daemon=True,
+            )
+            watcher_thread.start()
+            _WATCHER_THREADS.append(watcher_thread)
+
+
+def stop_search_index_watchers() -> None:
+    with _WATCHER_LOCK:
+        _WATCHER_STOP_EVENT.set()
+        for watcher_thread in _WATCHER_THREADS:
+            watcher_thread.join()
+        _WATCHER_THREADS.clear()
+        _WATCHER_STOP_EVENT.clear()
@@ -0,0 +1,191 @@
+import logging
+from datetime import datetime
+from typing import Union
+
+from pymongo import ASCENDING, ReplaceOne
+
+from cloudforet.search.lib.search_plan import (
+    DEFAULT_SORT_KEY,
+    SEARCH_INDEX_TYPE,
+    SEARCH_KEYS_FIELD,
+    SEARCH_SORT_VALUE_FIELD,
+    ResourceTypePlan,
+)
+from cloudforet.search.manager.ngram_index_manager import NgramIndexManager
+
+_LOGGER = logging.getLogger("spaceone")
+
+SEARCH_INDEX_BULK_SIZE = 500
+# raw values of the search fields and the sort key, read next to the projected fields
+SOURCE_KEYS_FIELD = "_search_keys"
+SOURCE_SORT_VALUE_FIELD = "_search_sort_value"
+
+
+class SearchIndexManager(NgramIndexManager):
+    """Maintains denormalized search entries of resource types in search.search_index.
+
+    An entry holds the scope fields, the formatted name, description and tags, the
+    sort value and lowercase search keys of one resource, so searches read small
+    documents from one well-indexed collection instead of the source collections.
+    Entries are computed with the projection of search_conf, followed by the same
+    enrichment as ResourceManager.search_resource. As with the ngram index, entries
+    are only read while SEARCH_INDEX_CHANGE_STREAM keeps them up to date.
+    """
+
+    index_name = "search-index"
+    index_resource_type = SEARCH_INDEX_TYPE
+    state_resource_type = "search.SearchIndexState"
+
+    def find_candidate_ids(
+        self, domain_id: str, plan: ResourceTypePlan, keyword: str
+    ) -> Union[list, None]:
+        # searches read the entries themselves, see make_search_index_plan
+        return None
+
+    def create_indexes(self) -> None:
+        db_name, collection_name = self._get_collection_and_db_name(
+            self.index_resource_type
+        )
+        collection = self.client[db_name][collection_name]
+        collection.create_index(
+            [("resource_type", ASCENDING), ("resource_id", ASCENDING)], unique=True
+        )
+        collection.create_index(
+            [("resource_type", ASCENDING), ("source_id", ASCENDING)]
+        )
+        collection.create_index(
+            [("domain_id", ASCENDING), ("resource_type", ASCENDING), ("_id", ASCENDING)]
+        )
+        collection.create_index(
+            [
+                ("domain_id", ASCENDING),
+                ("resource_type", ASCENDING),
+                (SEARCH_SORT_VALUE_FIELD, ASCENDING),
+                ("_id", ASCENDING),
+            ]
+        )
+
+        db_name, collection_name = self._get_collection_and_db_name(
+            self.state_resource_type
+        )
+        self.client[db_name][collection_name].create_index(
+            [("domain_id", ASCENDING), ("resource_type", ASCENDING)], unique=True
+        )
+
+    def _index_source(
+        self, plan: ResourceTypePlan, match_filter: dict, indexed_at: datetime
+    ) -> int:
+        source_db_name, source_collection_name = self._get_collection_and_db_name(
+            plan.resource_type
+        )
+        cursor = self.client[source_db_name][source_collection_name].aggregate(
+            self._make_source_pipeline(plan, match_filter),
+            batchSize=SEARCH_INDEX_BULK_SIZE,
+        )
+        return self._index_cursor(plan, cursor, indexed_at, SEARCH_INDEX_BULK_SIZE)
+
+    def index_resources(
+        self, plan: ResourceTypePlan, resources: list, indexed_at: datetime
+    ) -> int:
+        entries = [self._make_entry_base(resource, plan) for resource in resources]
+
+        # enrichment is per domain, and change streams mix domains in a batch
+        domain_resources = {}
+        for resource in resources:
+            domain_resources.setdefault(resource["domain_id"], []).append(resource)
+        for domain_id, results in domain_resources.items():
+            self._enrich_results(domain_id, plan.resource_type, results)
+
+        operations = []
+        for resource, entry in zip(resources, entries):
+            if not entry["resource_id"]:
+                continue
+
+            try:
+                plan.format_result(resource)
+            except (KeyError, IndexError, ValueError, TypeError) as e:
+                _LOGGER.warning(
+                    f"[index_resources] skip {plan.resource_type} "
+                    f"{entry['resource_id']}: {e}"
+                )
+                continue
+
+            entry.update(
+                {
+                    "name": resource["name"],
+                    "description": resource.get("description"),
+                    "tags": resource["tags"],
+                    "indexed_at": indexed_at,
+                }
+            )
+            operations.append(
+                ReplaceOne(
+                    {
+                        "resource_type": plan.resource_type,
+                        "resource_id": entry["resource_id"],
+                    },
+                    entry,
+                    upsert=True,
+                )
+            )
+
+        if operations:
+            db_name, collection_name = self._get_collection_and_db_name(
+                self.index_resource_type
+            )
+            self.client[db_name][collection_name].bulk_write(operations, ordered=False)
+
+        return len(operations)
+
+    def _make_entry_base(self, resource: dict, plan: ResourceTypePlan) -> dict:
+        # taken before enrichment and formatting change the display fields
+        entry = {
+            "resource_type": plan.resource_type,
+            "resource_id": resource.get(plan.resource_id_key),
+            "source_id": resource["_id"],
+            "domain_id": resource.get("domain_id"),
+            "workspace_id": resource.get("workspace_id"),
+            "project_id": resource.get("project_id"),
+            SEARCH_KEYS_FIELD: self._make_search_keys(
+                resource.pop(SOURCE_KEYS_FIELD, []), plan
+            ),
+        }
+        if plan.sort_key != DEFAULT_SORT_KEY:
+            entry[SEARCH_SORT_VALUE_FIELD] = resource.pop(SOURCE_SORT_VALUE_FIELD, None)
+        return entry
+
+    @staticmethod
+    def _make_source_pipeline(plan: ResourceTypePlan, match_filter: dict) -> list:
+        # raw values, as the source query matches and sorts them before projecting
+        source_fields = {
+            SOURCE_KEYS_FIELD: [f"${field}" for field in plan.search_fields]
+        }
+        if plan.sort_key != DEFAULT_SORT_KEY:
+            source_fields[SOURCE_SORT_VALUE_FIELD] = f"${plan.sort_key}"
+
+        projection = {**plan.projection, "_id": 1}
+        for field in ["domain_id", "workspace_id", "project_id", *source_fields]:
+            projection.setdefault(field, 1)
+
+        return [
+            {"$match": {"$and": [match_filter, *plan.request_filters]}},
+            {"$set": source_fields},
+            {"$project": projection},
+        ]
+
+    @staticmethod
+    def _make_search_keys(values: list, plan: ResourceTypePlan) -> dict:
+        # nested by field path, so that keys.<field> is queried like <field>
+        search_keys = {}
+        for field, value in zip(plan.search_fields, values):
+            if isinstance(value, str):
+                value = value.lower()
+            elif isinstance(value, list):
+                value = [v.lower() if isinstance(v, str) else v for v in value]
+
+            *parents, name = field.split(".")
+            target = search_keys
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[name] = value
+        return search_keys
@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+from typing import Union
+
+from spaceone.core import config
+from spaceone.core.utils import dict_to_hash
+
+from cloudforet.search.lib.metrics import measured
+from cloudforet.search.lib.single_flight import SingleFlight
+from cloudforet.search.manager.resource_manager import ResourceManager
+
+_LOGGER = logging.getLogger("spaceone")
+
+DEFAULT_WORKSPACE_DIRECTORY_CONF = {
+    # seconds between reloads of the workspaces and role bindings of a domain, which
+    # bounds how long a revoked role binding or disabled workspace keeps access
+    # when IDENTITY_CHANGE_STREAM is not enabled
+    "refresh_interval": 10,
+}
+
+_WORKSPACE_DIRECTORIES = {}
+_WORKSPACE_DIRECTORIES_LOCK = threading.Lock()
+# directories are shared read-only, so waiters get the loaded one as is
+_LOAD_FLIGHT = SingleFlight("workspace_directory_manager.load", copy_result=False)
+
+
+class WorkspaceDirectory:
+    """Workspace states and user role bindings of one domain.
+
+    version changes with the content, so caches built from a directory can key on
+    it and expire together with it.
+    """
+
+    def __init__(self, domain_id: str, workspaces: list, role_bindings: list):
+        self.domain_id = domain_id
+        self.states = {
+            workspace_info["workspace_id"]: workspace_info.get("state")
+            for workspace_info in workspaces
+        }
+        self.enabled_workspaces = [
+            workspace_id
+            for workspace_id, state in self.states.items()
+            if state == "ENABLED"
+        ]
+        self.not_enabled_workspaces = [
+            workspace_id
+            for workspace_id, state in self.states.items()
+            if state != "ENABLED"
+        ]
+
+        self.role_bindings = {}
+        for role_binding_info in role_bindings:
+            if user_id := role_binding_info.get("user_id"):
+                self.role_bindings.setdefault(user_id, []).append(
+                    {
+                        "workspace_id": role_binding_info.get("workspace_id"),
+                        "role_type": role_binding_info.get("role_type"),
+                    }
+                )
+
+        for role_bindings_info in self.role_bindings.values():
+            role_bindings_info.sort(
+                key=lambda info: (str(info["workspace_id"]), str(info["role_type"]))
+            )
+
+        self.version = dict_to_hash(
+            {"states": self.states, "role_bindings": self.role_bindings}
+        )
+        self.loaded_at = time.monotonic()
+
+    @property
+    def workspace_ids(self) -> list:
+        return list(self.states.keys())
+
+    def get_role_bindings(
+        self, user_id: str, workspaces: list = None, role_type: str = None
+    ) -> list:
+        role_bindings_info = self.role_bindings.get(user_id, [])
+        if workspaces:
+            workspaces = set(workspaces) | {"*"}
+            role_bindings_info = [
+                role_binding_info
+                for role_binding_info in role_bindings_info
+                if role_binding_info["workspace_id"] in workspaces
+            ]
+        if role_type:
+            role_bindings_info = [
+                role_binding_info
+                for role_binding_info in role_bindings_info
+                if role_binding_info["role_type"] == role_type
+            ]
+        return role_bindings_info
+
+    def get_user_workspaces(self, user_id: str) -> list:
+        # enabled workspaces the user is bound to, like UserProfile.get_workspaces
+        workspace_ids = {
+            role_binding_info["workspace_id"]
+            for role_binding_info in self.role_bindings.get(user_id, [])
+        }
+        return [
+            workspace_id
+            for workspace_id in self.enabled_workspaces
+            if workspace_id in workspace_ids
+        ]
+
+    def make_state_filter(self) -> Union[dict, None]:
+        """Returns the filter on workspace_id that excludes not enabled workspaces.
+
+        Always $nin, never $in on the enabled workspaces. The directory can be older
+        than a new workspace, and documents of unknown workspaces stay searchable.
+        """
+
+        if not self.not_enabled_workspaces:
+            return None
+
+        return {"workspace_id": {"$nin": self.not_enabled_workspaces}}
+
+
+class WorkspaceDirectoryManager(ResourceManager):
+    """Serves workspaces and role bindings from a per-domain directory in memory.
+
+    Replaces the per-request Workspace.list and UserProfile.get_workspaces calls to
+    identity and the role binding queries of the access scope.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.directory_conf = {
+            **DEFAULT_WORKSPACE_DIRECTORY_CONF,
+            **config.get_global("WORKSPACE_DIRECTORY", {}),
+        }
+
+    def get_directory(self, domain_id: str) -> WorkspaceDirectory:
+        directory = _WORKSPACE_DIRECTORIES.get(domain_id)
+        if directory is None or self._is_expired(directory):
+            directory = _LOAD_FLIGHT.do(domain_id, self._load, domain_id)
+        return directory
+
+    @staticmethod
+    def reset(domain_id: str = None) -> None:
+        with _WORKSPACE_DIRECTORIES_LOCK:
+            if domain_id:
+                _WORKSPACE_DIRECTORIES.pop(domain_id, None)
+            else:
+                _WORKSPACE_DIRECTORIES.clear()
+
+    @measured("workspace_directory_manager.load")
+    def _load(self, domain_id: str) -> WorkspaceDirectory:
+        workspaces = self._find(
+            "identity.Workspace",
+            domain_id,
+            {"_id": 0, "workspace_id": 1, "state": 1},
+        )
+        role_bindings = self._find(
+            "identity.RoleBinding",
+            domain_id,
+            {"_id": 0, "user_id": 1, "workspace_id": 1, "role_type": 1},
+        )
+
+        directory = WorkspaceDirectory(domain_id, workspaces, role_bindings)
+        with _WORKSPACE_DIRECTORIES_LOCK:
+            _WORKSPACE_DIRECTORIES[domain_id] = directory
+
+        _LOGGER.debug(
+            f"[_load] domain_id: {domain_id}, workspaces: {len(workspaces)}, "
+            f"role bindings: {len(role_bindings)}"
+        )
+        return directory
+
+    def _find(self, resource_type: str, domain_id: str, projection: dict) -> list:
+        db_name, collection_name = self._get_collection_and_db_name(resource_type)
+        return list(
+            self.client[db_name][collection_name].find(
+                {"domain_id": domain_id}, projection=projection
+            )
+        )
+
+    def _is_expired(self, directory: WorkspaceDirectory) -> bool:
+        return (
+            time.monotonic() - directory.loaded_at
+            >= self.directory_conf["refresh_interval"]
+        )
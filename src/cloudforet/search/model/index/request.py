@@ -0,0 +1,17 @@
+from typing import List
+from pydantic import BaseModel, Field
+
+
+class NgramIndexRebuildRequest(BaseModel):
+    domain_id: str
+    resource_types: List[str] = Field(default=[])
+
+
+class PrefixIndexRebuildRequest(BaseModel):
+    domain_id: str
+    resource_types: List[str] = Field(default=[])
+
+
+class SearchIndexRebuildRequest(BaseModel):
+    domain_id: str
+    resource_types: List[str] = Field(default=[])
@@ -0,0 +1,14 @@
+from typing import Dict
+from pydantic import BaseModel
+
+
+class NgramIndexRebuildResponse(BaseModel):
+    results: Dict[str, int] = None
+
+
+class PrefixIndexRebuildResponse(BaseModel):
+    results: Dict[str, int] = None
+
+
+class SearchIndexRebuildResponse(BaseModel):
+    results: Dict[str, int] = None
@@ -9,6 +9,7 @@ class ResourceSearchRequest(BaseModel):
     workspaces: List[str] = Field(default=[], max_items=5)
     all_workspaces: Union[bool, None] = Field(default=False)
     next_token: Union[str, None] = None
+    max_time_ms: Union[int, None] = Field(default=None, ge=1)
     domain_id: str
     workspace_id: Union[str, None] = None
     user_projects: Union[list, None] = None
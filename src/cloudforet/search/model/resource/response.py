@@ -15,3 +15,4 @@ class ResourceResponse(BaseModel):
 class ResourcesResponse(BaseModel):
     results: List[ResourceResponse] = None
     next_token: Union[str, None] = None
+    partial: bool = False
@@ -0,0 +1,138 @@
+import logging
+from typing import Union
+
+from spaceone.core.error import *
+from spaceone.core.service import *
+from spaceone.core.service.utils import *
+
+from cloudforet.search.lib.search_plan import get_search_plans
+from cloudforet.search.manager.ngram_index_manager import NgramIndexManager
+from cloudforet.search.manager.prefix_index_manager import PrefixIndexManager
+from cloudforet.search.manager.search_index_manager import SearchIndexManager
+from cloudforet.search.model.index.request import *
+from cloudforet.search.model.index.response import *
+
+_LOGGER = logging.getLogger("spaceone")
+
+
+@authentication_handler
+@authorization_handler
+@mutation_handler
+@event_handler
+class IndexService(BaseService):
+    resource = "Index"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.search_plans = get_search_plans()
+        self.ngram_index_manager = NgramIndexManager()
+        self.prefix_index_manager = PrefixIndexManager()
+        self.search_index_manager = SearchIndexManager()
+
+    @transaction(exclude=["authentication", "authorization", "mutation"])
+    @convert_model
+    def rebuild_ngram_index(
+        self, params: NgramIndexRebuildRequest
+    ) -> Union[NgramIndexRebuildResponse, dict]:
+        """Rebuild ngram index of a domain (called by worker tasks)
+        Args:
+            params (NgramIndexRebuildRequest): {
+                'domain_id': 'str',         # required
+                'resource_types': 'list'    # default: every resource type with ngram_index
+            }
+        Returns:
+            NgramIndexRebuildResponse:
+        """
+
+        resource_types = params.resource_types or [
+            resource_type
+            for resource_type, plan in self.search_plans.items()
+            if plan.ngram_index
+        ]
+
+        results = {}
+        for resource_type in resource_types:
+            plan = self.search_plans.get(resource_type)
+            if plan is None or not plan.ngram_index:
+                raise ERROR_INVALID_PARAMETER(
+                    key="resource_types",
+                    reason=f"ngram_index is not enabled for {resource_type}.",
+                )
+
+            results[resource_type] = self.ngram_index_manager.rebuild_index(
+                params.domain_id, plan
+            )
+
+        return NgramIndexRebuildResponse(results=results)
+
+    @transaction(exclude=["authentication", "authorization", "mutation"])
+    @convert_model
+    def rebuild_prefix_index(
+        self, params: PrefixIndexRebuildRequest
+    ) -> Union[PrefixIndexRebuildResponse, dict]:
+        """Rebuild prefix index of a domain (called by worker tasks)
+        Args:
+            params (PrefixIndexRebuildRequest): {
+                'domain_id': 'str',         # required
+                'resource_types': 'list'    # default: every resource type with match "prefix"
+            }
+        Returns:
+            PrefixIndexRebuildResponse:
+        """
+
+        resource_types = params.resource_types or [
+            resource_type
+            for resource_type, plan in self.search_plans.items()
+            if plan.match == "prefix"
+        ]
+
+        results = {}
+        for resource_type in resource_types:
+            plan = self.search_plans.get(resource_type)
+            if plan is None or plan.match != "prefix":
+                raise ERROR_INVALID_PARAMETER(
+                    key="resource_types",
+                    reason=f"match is not prefix for {resource_type}.",
+                )
+
+            results[resource_type] = self.prefix_index_manager.rebuild_index(
+                params.domain_id, plan
+            )
+
+        return PrefixIndexRebuildResponse(results=results)
+
+    @transaction(exclude=["authentication", "authorization", "mutation"])
+    @convert_model
+    def rebuild_search_index(
+        self, params: SearchIndexRebuildRequest
+    ) -> Union[SearchIndexRebuildResponse, dict]:
+        """Rebuild search index of a domain (called by worker tasks)
+        Args:
+            params (SearchIndexRebuildRequest): {
+                'domain_id': 'str',         # required
+                'resource_types': 'list'    # default: every resource type with search_index
+            }
+        Returns:
+            SearchIndexRebuildResponse:
+        """
+
+        resource_types = params.resource_types or [
+            resource_type
+            for resource_type, plan in self.search_plans.items()
+            if plan.search_index
+        ]
+
+        results = {}
+        for resource_type in resource_types:
+            plan = self.search_plans.get(resource_type)
+            if plan is None or not plan.search_index:
+                raise ERROR_INVALID_PARAMETER(
+                    key="resource_types",
+                    reason=f"search_index is not enabled for {resource_type}.",
+                )
+
+            results[resource_type] = self.search_index_manager.rebuild_index(
+                params.domain_id, plan
+            )
+
+        return SearchIndexRebuildResponse(results=results)
@@ -1,4 +1,9 @@
+import base64
+import hashlib
+import json
 import logging
+import zlib
+from typing import Tuple
 
 from spaceone.core import cache
 from spaceone.core import config
@@ -8,15 +13,42 @@ from spaceone.core.service import *
 from spaceone.core.service.utils import *
 from spaceone.core.utils import *
 
+from cloudforet.search.lib.filter_optimizer import optimize_filter
+from cloudforet.search.lib.metrics import measure, measured, trace_request
+from cloudforet.search.lib.search_plan import (
+    ResourceTypePlan,
+    get_search_index_plans,
+    get_search_plans,
+)
+from cloudforet.search.lib.single_flight import SingleFlight, make_flight_key
 from cloudforet.search.lib.utils import *
 from cloudforet.search.manager.resource_manager import ResourceManager
-from cloudforet.search.manager.identity_manager import IdentityManager
+from cloudforet.search.manager.async_resource_manager import AsyncResourceManager
+from cloudforet.search.manager.ngram_index_manager import NgramIndexManager
+from cloudforet.search.manager.prefix_index_manager import PrefixIndexManager
+from cloudforet.search.manager.search_index_manager import SearchIndexManager
+from cloudforet.search.manager.workspace_directory_manager import (
+    WorkspaceDirectory,
+    WorkspaceDirectoryManager,
+)
 from cloudforet.search.model.resource.response import *
 from cloudforet.search.model.resource.request import *
 
 _LOGGER = logging.getLogger("spaceone")
 
 DISABLED_PROJECT_RESOURCE_TYPES = ["identity.Workspace", "inventory.CloudServiceType"]
+QUERY_HANDLE_EXPIRE = 600
+# also bounds how long a project membership change takes without the change stream
+ACCESS_SCOPE_EXPIRE = 10
+DEFAULT_TIME_BUDGET_CONF = {
+    # milliseconds a search may run before it returns partial results, 0 for none
+    "max_time_ms": 3000,
+    # {resource_type: max_time_ms} overrides of max_time_ms
+    "resource_type_max_time_ms": {},
+}
+
+# concurrent identical searches of the same user share one result
+_SEARCH_FLIGHT = SingleFlight("resource_service.search")
 
 
 @authentication_handler
@@ -28,8 +60,16 @@ class ResourceService(BaseService):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.search_conf = self._get_search_conf()
+        self.search_plans = get_search_plans()
+        self.search_index_plans = get_search_index_plans()
         self.resource_manager = ResourceManager()
+        self.ngram_index_manager = NgramIndexManager()
+        self.prefix_index_manager = PrefixIndexManager()
+        self.search_index_manager = SearchIndexManager()
+        self.workspace_directory_manager = WorkspaceDirectoryManager()
+        self.async_resource_manager = None
+        if config.get_global("ASYNC_RESOURCE_MANAGER", False):
+            self.async_resource_manager = AsyncResourceManager()
 
     @transaction(
         permission="search:Resource.read",
@@ -46,6 +86,7 @@ class ResourceService(BaseService):
                 'workspaces': 'list',
                 'all_workspaces': 'bool',
                 'next_token': 'str'
+                'max_time_ms': 'int'
                 'workspace_id': 'str'       # injected from auth
                 'domain_id': 'str'          # injected from auth
                 'user_projects': 'list'     # injected from auth
@@ -60,157 +101,347 @@ class ResourceService(BaseService):
         user_id = self.transaction.meta.get("authorization.user_id")
         role_type = self.transaction.meta.get("authorization.role_type")
 
+        flight_key = self._make_search_flight_key(params, user_id, role_type)
+        response = _SEARCH_FLIGHT.do(
+            flight_key, self._search, params, user_id, role_type
+        )
+        return ResourcesResponse(**response)
+
+    def _make_search_flight_key(
+        self, params: ResourceSearchRequest, user_id: Union[str, None], role_type: str
+    ) -> str:
+        # next tokens are sealed with the user token, so it is part of the key too
+        token_hash = hashlib.sha256(
+            self.transaction.meta.get("token", "").encode("utf-8")
+        ).hexdigest()
+        return make_flight_key(
+            params.domain_id, user_id, role_type, token_hash, params.dict()
+        )
+
+    def _search(
+        self, params: ResourceSearchRequest, user_id: Union[str, None], role_type: str
+    ) -> dict:
         domain_id = params.domain_id
-        all_workspaces = params.all_workspaces
-        workspaces = [] if params.all_workspaces else params.workspaces
         resource_type = params.resource_type
-        next_token = params.next_token
-        limit = params.limit
-        page = 0
+
+        with trace_request("search", resource_type, domain_id=domain_id):
+            plan, find_filter, limit, last_key, keyword, scope = (
+                self._make_search_args(params, user_id, role_type)
+            )
+
+            return self._search_resource_type(
+                domain_id,
+                user_id,
+                plan,
+                find_filter,
+                limit,
+                last_key,
+                keyword,
+                scope,
+                self._get_max_time_ms(resource_type, params.max_time_ms),
+            )
+
+    def _make_search_args(
+        self,
+        params: ResourceSearchRequest,
+        user_id: Union[str, None],
+        role_type: str,
+    ) -> Tuple[
+        ResourceTypePlan, dict, int, Union[dict, None], Union[str, None], dict
+    ]:
+        domain_id = params.domain_id
+        resource_type = params.resource_type
+        workspaces = [] if params.all_workspaces else params.workspaces
+
+        if params.next_token:
+            with measure("search.decode_next_token"):
+                decoded_next_token = self._decode_next_token(
+                    resource_type, params.next_token
+                )
+                plan = self._get_search_plan(
+                    domain_id,
+                    resource_type,
+                    decoded_next_token.get("search_index", False),
+                )
+                find_filter = self._get_find_filter_from_next_token(
+                    domain_id,
+                    user_id,
+                    role_type,
+                    plan,
+                    decoded_next_token,
+                    params.workspace_id,
+                    params.user_projects,
+                )
+
+            return (
+                plan,
+                find_filter,
+                decoded_next_token.get("limit"),
+                decoded_next_token.get("last_key"),
+                decoded_next_token.get("keyword"),
+                decoded_next_token.get("scope"),
+            )
+
+        find_filter: dict = {"$and": [{"domain_id": domain_id}]}
+        find_filter["$and"].extend(
+            self._get_access_scope_filter(
+                domain_id,
+                user_id,
+                role_type,
+                resource_type,
+                workspaces,
+                params.all_workspaces,
+                params.workspace_id,
+                params.user_projects,
+            )
+        )
+
+        plan = self._get_search_plan(domain_id, resource_type)
+        find_filter = self._make_find_filter_by_resource_type(
+            find_filter, domain_id, plan, params.keyword
+        )
+
+        return (
+            plan,
+            find_filter,
+            params.limit,
+            None,
+            params.keyword,
+            self._make_search_scope(workspaces, params.all_workspaces),
+        )
+
+    def _search_resource_type(
+        self,
+        domain_id: str,
+        user_id: Union[str, None],
+        plan: ResourceTypePlan,
+        find_filter: dict,
+        limit: int,
+        last_key: Union[dict, None],
+        keyword: Union[str, None] = None,
+        scope: Union[dict, None] = None,
+        max_time_ms: Union[int, None] = None,
+    ) -> dict:
+        score = self._make_score_expression(plan, keyword)
+
+        with measure("search.search_resource_type", resource_type=plan.resource_type):
+            search_args = (
+                domain_id,
+                self._add_candidate_filter(find_filter, domain_id, plan, keyword),
+                plan.projection,
+                plan.collection_type,
+                limit,
+                plan.sort_key,
+                last_key,
+                score,
+                max_time_ms,
+                plan.pipeline,
+            )
+            if self.async_resource_manager:
+                # the worker thread waits while the query runs on the shared loop
+                results, last_key, partial = self.async_resource_manager.run_coroutine(
+                    self.async_resource_manager.search_resource(*search_args)
+                )
+            else:
+                results, last_key, partial = self.resource_manager.search_resource(
+                    *search_args
+                )
+
+            return self._make_resource_type_response(
+                domain_id,
+                user_id,
+                plan,
+                find_filter,
+                limit,
+                results,
+                last_key,
+                keyword,
+                scope,
+                partial,
+            )
+
+    @measured("search.make_response")
+    def _make_resource_type_response(
+        self,
+        domain_id: str,
+        user_id: Union[str, None],
+        plan: ResourceTypePlan,
+        find_filter: dict,
+        limit: int,
+        results: list,
+        last_key: Union[dict, None],
+        keyword: Union[str, None] = None,
+        scope: Union[dict, None] = None,
+        partial: bool = False,
+    ) -> dict:
+        next_token = self._encode_next_token_base64(
+            len(results),
+            plan.resource_type,
+            domain_id,
+            user_id,
+            find_filter,
+            limit,
+            last_key,
+            keyword,
+            scope,
+            partial=partial,
+            search_index=plan.is_search_index_plan,
+        )
+
+        return {**self._make_response(results, next_token, plan), "partial": partial}
+
+    @measured("search.access_scope")
+    def _get_access_scope_filter(
+        self,
+        domain_id: str,
+        user_id: Union[str, None],
+        role_type: str,
+        resource_type: str,
+        workspaces: list,
+        all_workspaces: bool,
+        workspace_id: Union[str, None],
+        user_projects: Union[list, None],
+    ) -> list:
+        access_scope = {
+            # a cached scope is never older than the directory it was built from
+            "directory_version": self.workspace_directory_manager.get_directory(
+                domain_id
+            ).version,
+            "project_disabled": resource_type in DISABLED_PROJECT_RESOURCE_TYPES,
+            "workspaces": sorted(workspaces or []),
+            "all_workspaces": bool(all_workspaces),
+            "workspace_id": workspace_id,
+            "user_projects": sorted(user_projects or []),
+        }
+        scope_hash = dict_to_hash(access_scope)
+
+        return self._make_access_scope_filter(
+            domain_id, user_id, role_type, scope_hash, access_scope
+        )
+
+    @cache.cacheable(
+        key="search:access-scope:{domain_id}:{user_id}:{role_type}:{scope_hash}",
+        expire=ACCESS_SCOPE_EXPIRE,
+    )
+    def _make_access_scope_filter(
+        self,
+        domain_id: str,
+        user_id: Union[str, None],
+        role_type: str,
+        scope_hash: str,
+        access_scope: dict,
+    ) -> list:
+        project_disabled = access_scope["project_disabled"]
+        workspaces = access_scope["workspaces"]
+        all_workspaces = access_scope["all_workspaces"]
+        workspace_id = access_scope["workspace_id"]
+        user_projects = access_scope["user_projects"]
 
         workspace_owner_workspaces = []
         workspace_project_map = {}
-        find_filter: dict = {"$and": [{"domain_id": domain_id}]}
+        scope_filter = {"$and": []}
 
-        if next_token:
-            decoded_next_token = self._decode_next_token(resource_type, next_token)
-            limit = decoded_next_token.get("limit")
-            find_filter = decoded_next_token.get("find_filter")
-            page = decoded_next_token.get("page")
-        else:
-            user_role_type = self._get_user_role_type(domain_id, user_id)
+        directory = self.workspace_directory_manager.get_directory(domain_id)
+        user_role_type = self._get_user_role_type(directory, user_id)
 
-            if role_type == "DOMAIN_ADMIN" or user_role_type == "DOMAIN_ADMIN":
-                if workspaces:
-                    workspaces = self._get_accessible_workspaces(
-                        domain_id, role_type, workspaces, user_id
-                    )
-                else:
-                    params.workspace_id = None
-                    not_enabled_workspaces = self._get_not_enabled_workspaces(domain_id)
-                    find_filter["$and"].append(
-                        {"workspace_id": {"$nin": not_enabled_workspaces}}
-                    )
+        if role_type == "DOMAIN_ADMIN" or user_role_type == "DOMAIN_ADMIN":
+            if workspaces:
+                workspaces = self._get_accessible_workspaces(
+                    directory, role_type, workspaces, user_id
+                )
             else:
-                if all_workspaces or workspaces:
-                    workspaces = self._get_accessible_workspaces(
-                        domain_id, role_type, workspaces, user_id
+                workspace_id = None
+                if state_filter := directory.make_state_filter():
+                    scope_filter["$and"].append(state_filter)
+        else:
+            if all_workspaces or workspaces:
+                workspaces = self._get_accessible_workspaces(
+                    directory, role_type, workspaces, user_id
+                )
+
+            if workspaces and not project_disabled:
+                role_bindings_info = directory.get_role_bindings(user_id, workspaces)
+                workspace_owner_workspaces = (
+                    self.resource_manager.get_workspace_owner_workspaces(
+                        role_bindings_info
                     )
+                )
 
-                if workspaces:
-                    if resource_type not in DISABLED_PROJECT_RESOURCE_TYPES:
-                        role_bindings_info = self.resource_manager.get_role_bindings(
-                            domain_id, user_id, workspaces
-                        )
-                        workspace_owner_workspaces = (
-                            self.resource_manager.get_workspace_owner_workspaces(
-                                role_bindings_info
-                            )
-                        )
-
-                        workspace_member_workspaces = (
-                            self.resource_manager.get_workspace_member_workspaces(
-                                role_bindings_info
-                            )
-                        )
-
-                        workspace_project_map = self._get_workspace_project_map(
-                            domain_id, workspace_member_workspaces, user_id
-                        )
-
-            if workspace_owner_workspaces or workspace_project_map:
-                find_filter = self._make_filter_by_workspaces(
-                    find_filter,
-                    workspace_owner_workspaces,
+                workspace_member_workspaces = (
+                    self.resource_manager.get_workspace_member_workspaces(
+                        role_bindings_info
+                    )
                 )
 
-                find_filter = self._make_filter_by_workspace_project_map(
-                    find_filter,
-                    workspace_project_map,
+                workspace_project_map = self._get_workspace_project_map(
+                    domain_id, workspace_member_workspaces, user_id
                 )
-            elif workspaces:
-                find_filter["$and"].append({"workspace_id": {"$in": workspaces}})
-            elif params.workspace_id:
-                find_filter["$and"].append({"workspace_id": params.workspace_id})
-                if (
-                    params.user_projects
-                    and resource_type not in DISABLED_PROJECT_RESOURCE_TYPES
-                ):
-                    find_filter["$and"].append(
-                        {"project_id": {"$in": params.user_projects}}
-                    )
 
-            regex_pattern = self._get_regex_pattern(params.keyword)
+        if workspace_owner_workspaces or workspace_project_map:
+            scope_filter = self._make_filter_by_workspaces(
+                scope_filter,
+                workspace_owner_workspaces,
+            )
 
-            find_filter = self._make_find_filter_by_resource_type(
-                find_filter, resource_type, regex_pattern
+            scope_filter = self._make_filter_by_workspace_project_map(
+                scope_filter,
+                workspace_project_map,
             )
+        elif workspaces:
+            scope_filter["$and"].append({"workspace_id": {"$in": workspaces}})
+        elif workspace_id:
+            scope_filter["$and"].append({"workspace_id": workspace_id})
+            if user_projects and not project_disabled:
+                scope_filter["$and"].append({"project_id": {"$in": user_projects}})
 
-        # search resources
-        projection = self.search_conf[resource_type]["request"].get("projection", {})
-        results = self.resource_manager.search_resource(
-            domain_id, find_filter, projection, resource_type, limit, page
-        )
+        return scope_filter["$and"]
 
-        next_token = self._encode_next_token_base64(
-            results, resource_type, find_filter, limit, page
-        )
+    def _get_rank_keyword(
+        self, resource_type: str, keyword: Union[str, None]
+    ) -> Union[str, None]:
+        if not keyword:
+            return None
 
-        response_conf = self.search_conf.get(resource_type).get("response")
-        response = self._make_response(results, next_token, response_conf)
+        rank = self.search_plans[resource_type].rank
+        if rank is None:
+            rank = config.get_global("SEARCH_RANKING", {}).get("enabled", False)
+        return keyword if rank else None
 
-        return ResourcesResponse(**response)
+    @staticmethod
+    def _get_max_time_ms(
+        resource_type: str, max_time_ms: Union[int, None]
+    ) -> Union[int, None]:
+        # the request can only shorten the budget of the resource type
+        budget_conf = {
+            **DEFAULT_TIME_BUDGET_CONF,
+            **config.get_global("SEARCH_TIME_BUDGET", {}),
+        }
+        budget = budget_conf["resource_type_max_time_ms"].get(
+            resource_type, budget_conf["max_time_ms"]
+        )
+        return min(filter(None, [budget, max_time_ms]), default=None)
 
     def check_resource_type(self, resource_type: str):
-        if resource_type not in self.search_conf:
+        if resource_type not in self.search_plans:
             raise ERROR_INVALID_PARAMETER(
                 key=f"resource_type",
-                reason=f"Supported resource types: {list(self.search_conf.keys())}",
+                reason=f"Supported resource types: {list(self.search_plans.keys())}",
             )
 
+    @staticmethod
     def _get_all_workspaces(
-        self,
-        domain_id: str,
+        directory: WorkspaceDirectory,
         role_type: str,
         user_id: str = None,
     ) -> list:
-        identity_mgr: IdentityManager = self.locator.get_manager("IdentityManager")
-
         if role_type == "DOMAIN_ADMIN":
-            results = identity_mgr.list_workspace(query={}).get("results", [])
+            return directory.workspace_ids
         elif user_id:
             # In case of USER who has WORKSPACE_OWNER or WORKSPACE_MEMBER role
-            results = identity_mgr.get_workspaces(domain_id, user_id).get("results", [])
+            return directory.get_user_workspaces(user_id)
         else:
             # In case of WORKSPACE_OWNER App
-            results = []
-
-        workspaces = [result["workspace_id"] for result in results]
-        return workspaces
-
-    def _get_all_projects(
-        self, domain_id: str, workspace_id: str, user_id: str = None
-    ) -> list:
-        user_projects = []
-
-        public_projects_info = self.resource_manager.list_public_projects(
-            domain_id, workspace_id
-        )
-        user_projects.extend(
-            [project_info["project_id"] for project_info in public_projects_info]
-        )
-
-        private_projects_info = self.resource_manager.list_private_projects(
-            domain_id,
-            workspace_id,
-            user_id,
-        )
-
-        user_projects.extend(
-            [project_info["project_id"] for project_info in private_projects_info]
-        )
-
-        return user_projects
+            return []
 
     def _get_workspace_project_map(
         self,
@@ -218,23 +449,22 @@ class ResourceService(BaseService):
         workspaces: list,
         user_id: str,
     ) -> dict:
-        workspace_project_map = {}
-        for workspace_id in workspaces:
-            workspace_projects = self._get_all_projects(
-                domain_id, workspace_id, user_id
-            )
-            workspace_project_map[workspace_id] = workspace_projects
-        return workspace_project_map
+        if not workspaces:
+            return {}
+
+        return self.resource_manager.get_workspace_project_map(
+            domain_id, workspaces, user_id
+        )
 
     def _get_accessible_workspaces(
         self,
-        domain_id: str,
+        directory: WorkspaceDirectory,
         role_type: str,
         workspaces: list = None,
         user_id: str = None,
     ) -> list:
         # check is accessible workspace with params.workspaces
-        workspace_ids = self._get_all_workspaces(domain_id, role_type, user_id)
+        workspace_ids = self._get_all_workspaces(directory, role_type, user_id)
         if workspaces:
             workspaces = list(set(workspaces) & set(workspace_ids))
         else:
@@ -242,52 +472,86 @@ class ResourceService(BaseService):
 
         return workspaces
 
-    def _get_not_enabled_workspaces(self, domain_id: str) -> list:
-        # get disabled and deleted workspaces
-        find_filter = {
-            "$and": [{"domain_id": domain_id}, {"state": {"$ne": "ENABLED"}}]
-        }
-        workspaces_info = self.resource_manager.list_workspaces(find_filter)
-        not_enabled_workspaces = [
-            workspace_info["workspace_id"] for workspace_info in workspaces_info
-        ]
-        return not_enabled_workspaces
+    def _get_search_plan(
+        self,
+        domain_id: str,
+        resource_type: str,
+        search_index: Union[bool, None] = None,
+    ) -> ResourceTypePlan:
+        if search_index is None:
+            search_index = (
+                resource_type in self.search_index_plans
+                and self.search_index_manager.is_index_ready(domain_id, resource_type)
+            )
 
+        if not search_index:
+            return self.search_plans[resource_type]
+
+        if resource_type not in self.search_index_plans:
+            raise ERROR_INVALID_PARAMETER(
+                key="next_token", reason="next_token is expired."
+            )
+        return self.search_index_plans[resource_type]
+
+    @measured("search.find_filter")
     def _make_find_filter_by_resource_type(
-        self, find_filter: dict, resource_type: str, regex_pattern: str
+        self,
+        find_filter: dict,
+        domain_id: str,
+        plan: ResourceTypePlan,
+        keyword: Union[str, None],
     ) -> dict:
-        if search_target := self.search_conf.get(resource_type):
-            or_filter = {"$or": []}
-            for keyword in search_target["request"]["search"]:
-                or_filter["$or"].append(
-                    {keyword: {"$regex": regex_pattern, "$options": "i"}}
-                )
-
-            if request_filters := search_target["request"].get("filter"):
-                for request_filter in request_filters:
-                    find_filter["$and"].append(request_filter)
+        regex_pattern = self._get_regex_pattern(keyword, plan.match)
+        find_filter["$and"].extend(plan.bind_filter(regex_pattern))
 
-            find_filter["$and"].append(or_filter)
+        # canonical form, so that equal filters also share a query handle
+        return optimize_filter(find_filter)
 
+    def _add_candidate_filter(
+        self,
+        find_filter: dict,
+        domain_id: str,
+        plan: ResourceTypePlan,
+        keyword: Union[str, None],
+    ) -> dict:
+        # looked up for every page, so next tokens don't carry the candidates
+        if keyword:
+            candidate_ids = self._find_candidate_ids(domain_id, plan, keyword)
+            if candidate_ids is not None:
+                # the keyword regex in find_filter verifies the candidates
+                return {
+                    "$and": [
+                        find_filter,
+                        {plan.resource_id_key: {"$in": candidate_ids}},
+                    ]
+                }
         return find_filter
 
+    def _make_score_expression(
+        self, plan: ResourceTypePlan, keyword: Union[str, None]
+    ) -> Union[dict, None]:
+        rank_keyword = self._get_rank_keyword(plan.resource_type, keyword)
+        return plan.make_score_expression(rank_keyword) if rank_keyword else None
+
+    def _find_candidate_ids(
+        self, domain_id: str, plan: ResourceTypePlan, keyword: str
+    ) -> Union[list, None]:
+        if plan.match == "prefix":
+            return self.prefix_index_manager.find_candidate_ids(
+                domain_id, plan, keyword
+            )
+        elif plan.ngram_index:
+            return self.ngram_index_manager.find_candidate_ids(
+                domain_id, plan, keyword
+            )
+        return None
+
+    @staticmethod
     def _make_response(
-        self, results: list, next_token: str, response_conf: dict
+        results: list, next_token: str, plan: ResourceTypePlan
     ) -> dict:
-        name_format = response_conf["name"]
-        description_format = response_conf.get("description")
-        tags: dict = response_conf.get("tags")
         for result in results:
-            # Make description at response
-            if description_format:
-                result["description"] = description_format.format(**result)
-            if tags:
-                result = self._add_additional_info_to_tags(result, tags)
-            else:
-                result["tags"] = {}
-
-            result["name"] = name_format.format(**result)
-            result["resource_id"] = result[response_conf["resource_id"]]
+            plan.format_result(result)
 
         return {
             "results": results,
@@ -296,27 +560,52 @@ class ResourceService(BaseService):
 
     def _encode_next_token_base64(
         self,
-        results: list,
+        result_count: int,
         resource_type: str,
+        domain_id: str,
+        user_id: Union[str, None],
         find_filter: dict,
         limit: int,
-        page: int,
+        last_key: Union[dict, None],
+        keyword: Union[str, None] = None,
+        scope: Union[dict, None] = None,
+        partial: bool = False,
+        search_index: bool = False,
     ) -> Union[str, None]:
-        if limit == 0 or len(results) != limit:
+        if limit == 0 or last_key is None:
+            return None
+
+        # partial results continue after the last result that was read in time
+        if result_count != limit and not partial:
             return None
 
         next_token_payload = {
             "resource_type": resource_type,
-            "find_filter": find_filter,
             "limit": limit,
-            "page": page + 1,
+            "last_key": last_key,
         }
-        secret_key = self.transaction.meta.get("token")
+        if keyword:
+            # the next page is scored and narrowed down by indexes with the keyword
+            next_token_payload["keyword"] = keyword
+        if search_index:
+            # last keys and filters of search index entries only work on the index
+            next_token_payload["search_index"] = True
+
+        if query_handle := self._save_query_handle(domain_id, user_id, find_filter):
+            next_token_payload["query_handle"] = query_handle
+            if scope is not None:
+                # makes the filter again when the handle is evicted or expired
+                next_token_payload["scope"] = scope
+        else:
+            next_token_payload["compressed_filter"] = self._compress_find_filter(
+                find_filter
+            )
+        secret_key = self._get_next_token_secret_key()
         next_token = JWTUtil.encode(next_token_payload, secret_key, algorithm="HS256")
         return next_token
 
     def _decode_next_token(self, resource_type: str, next_token: str) -> dict:
-        secret_key = self.transaction.meta.get("token")
+        secret_key = self._get_next_token_secret_key()
 
         try:
             next_token = JWTUtil.decode(
@@ -332,15 +621,114 @@ class ResourceService(BaseService):
 
         return next_token
 
-    @cache.cacheable(key="search:user-role-type:{domain_id}:{user_id}", expire=10)
+    def _get_next_token_secret_key(self) -> dict:
+        # JWTUtil takes a JWK, so the user token is hashed into a 256-bit octet key
+        token = self.transaction.meta.get("token", "")
+        secret = hashlib.sha256(token.encode("utf-8")).digest()
+        return {
+            "kty": "oct",
+            "k": base64.urlsafe_b64encode(secret).rstrip(b"=").decode("utf-8"),
+        }
+
+    def _get_find_filter_from_next_token(
+        self,
+        domain_id: str,
+        user_id: Union[str, None],
+        role_type: str,
+        plan: ResourceTypePlan,
+        next_token: dict,
+        workspace_id: Union[str, None],
+        user_projects: Union[list, None],
+    ) -> dict:
+        if query_handle := next_token.get("query_handle"):
+            find_filter = cache.get(
+                self._make_query_handle_key(domain_id, user_id, query_handle)
+            )
+            if find_filter is not None:
+                return find_filter
+
+            scope = next_token.get("scope")
+            if scope is None:
+                raise ERROR_INVALID_PARAMETER(
+                    key="next_token", reason="next_token is expired."
+                )
+
+            # the access scope is resolved again with the current permissions
+            find_filter = {"$and": [{"domain_id": domain_id}]}
+            find_filter["$and"].extend(
+                self._get_access_scope_filter(
+                    domain_id,
+                    user_id,
+                    role_type,
+                    plan.resource_type,
+                    scope["workspaces"],
+                    scope["all_workspaces"],
+                    workspace_id,
+                    user_projects,
+                )
+            )
+            return self._make_find_filter_by_resource_type(
+                find_filter, domain_id, plan, next_token.get("keyword")
+            )
+
+        try:
+            return self._decompress_find_filter(next_token["compressed_filter"])
+        except Exception:
+            raise ERROR_PERMISSION_DENIED(reason="Invalid next_token.")
+
+    @staticmethod
+    def _make_search_scope(workspaces: Union[list, None], all_workspaces: bool) -> dict:
+        # request parameters that make the find filter together with the keyword
+        return {
+            "workspaces": sorted(workspaces or []),
+            "all_workspaces": bool(all_workspaces),
+        }
+
+    def _save_query_handle(
+        self, domain_id: str, user_id: Union[str, None], find_filter: dict
+    ) -> Union[str, None]:
+        if not cache.is_set():
+            return None
+
+        query_handle = dict_to_hash(find_filter)
+        try:
+            cache.set(
+                self._make_query_handle_key(domain_id, user_id, query_handle),
+                find_filter,
+                expire=QUERY_HANDLE_EXPIRE,
+            )
+        except Exception as e:
+            _LOGGER.warning(f"[_save_query_handle] failed to save query handle: {e}")
+            return None
+
+        return query_handle
+
+    @staticmethod
+    def _make_query_handle_key(
+        domain_id: str, user_id: Union[str, None], query_handle: str
+    ) -> str:
+        return f"search:query-handle:{domain_id}:{user_id}:{query_handle}"
+
+    @staticmethod
+    def _compress_find_filter(find_filter: dict) -> str:
+        find_filter_json = json.dumps(find_filter, separators=(",", ":"))
+        compressed = zlib.compress(find_filter_json.encode("utf-8"), 9)
+        return base64.urlsafe_b64encode(compressed).decode("utf-8")
+
+    @staticmethod
+    def _decompress_find_filter(compressed_filter: str) -> dict:
+        compressed = base64.urlsafe_b64decode(compressed_filter.encode("utf-8"))
+        return json.loads(zlib.decompress(compressed).decode("utf-8"))
+
+    @staticmethod
     def _get_user_role_type(
-        self, domain_id: str, user_id: str = None
+        directory: WorkspaceDirectory, user_id: str = None
     ) -> Union[str, None]:
         user_role_type = None
 
         if user_id:
-            role_bindings_info = self.resource_manager.get_role_bindings(
-                domain_id, user_id, role_type="DOMAIN_ADMIN"
+            role_bindings_info = directory.get_role_bindings(
+                user_id, role_type="DOMAIN_ADMIN"
             )
 
             if role_bindings_info:
@@ -354,7 +742,7 @@ class ResourceService(BaseService):
         workspaces: list,
     ):
         if workspaces:
-            find_filter["$and"].append({"$or": [{"workspace_id": {"$in": workspaces}}]})
+            find_filter["$and"].append({"workspace_id": {"$in": workspaces}})
 
         _LOGGER.debug(f"[_make_filter_by_workspaces] find_filter: {find_filter}")
         return find_filter
@@ -371,6 +759,8 @@ class ResourceService(BaseService):
                     "project_id": {"$in": user_projects},
                 }
             )
+
+        if or_filter["$or"]:
             find_filter["$and"].append(or_filter)
         _LOGGER.debug(
             f"[_make_filer_by_workspace_project_map] find_filter: {find_filter}"
@@ -378,21 +768,15 @@ class ResourceService(BaseService):
         return find_filter
 
     @staticmethod
-    def _get_regex_pattern(keyword: str) -> str:
+    def _get_regex_pattern(keyword: str, match: str = "contains") -> str:
         regex_pattern = ".*"
-        if keyword:
+        if keyword and match == "prefix":
+            regex_pattern = f"^{keyword}"
+        elif keyword:
             regex_pattern = f".*{keyword}.*"
 
         return regex_pattern
 
-    @staticmethod
-    def _get_search_conf() -> dict:
-        package = config.get_package()
-        search_conf_module = __import__(
-            f"{package}.conf.search_conf", fromlist=["search_conf"]
-        )
-        return getattr(search_conf_module, "RESOURCE_TYPES", [])
-
     @staticmethod
     def _convert_result_by_alias(result: dict, aliases: list) -> dict:
         for alias in aliases:
@@ -402,12 +786,3 @@ class ResourceService(BaseService):
                         result[alias_name] = value.format(**result)
                         # result = save_to_dict_value(result, alias_name, value)
         return result
-
-    @staticmethod
-    def _add_additional_info_to_tags(result: dict, tags: dict) -> dict:
-        response_tags = {}
-        for key, value in tags.items():
-            if target_value := get_dict_value(result, value):
-                response_tags[key] = target_value
-        result["tags"] = response_tags
-        return result
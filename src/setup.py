@@ -26,7 +26,7 @@ setup(
     author_email="admin@cloudforet.io",
     license="Apache License 2.0",
     packages=find_packages(),
-    install_requires=["spaceone-core", "spaceone-api", "pymongo"],
+    install_requires=["spaceone-core", "spaceone-api", "pymongo", "prometheus-client"],
     package_data={},
     zip_safe=False,
 )
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import mongomock
+from spaceone.core import config
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+
+from cloudforet.search.lib.pymongo_client import SpaceONEPymongoClient  # noqa: E402
+
+config.init_conf(package="cloudforet.search")
+config.set_global_force(CACHES={})
+
+SpaceONEPymongoClient._client = mongomock.MongoClient()
@@ -0,0 +1,147 @@
+import re
+import unittest
+
+import mongomock
+
+from cloudforet.search.lib.filter_optimizer import SCALAR_FIELDS, optimize_filter
+
+DOCUMENTS = [
+    {"domain_id": "d-1", "workspace_id": "w-1", "project_id": "p-1", "name": "ins-1"},
+    {"domain_id": "d-1", "workspace_id": "w-1", "project_id": "p-2", "name": "db-1"},
+    {"domain_id": "d-1", "workspace_id": "w-2", "project_id": "p-3", "name": "ins-2"},
+    {"domain_id": "d-1", "workspace_id": "w-3", "project_id": "p-4", "name": "ins-3"},
+    {"domain_id": "d-1", "workspace_id": "*", "name": "ins-4"},
+    {"domain_id": "d-1", "workspace_id": None, "name": "bucket"},
+    {"domain_id": "d-2", "workspace_id": "w-1", "project_id": "p-1", "name": "ins-5"},
+    {"domain_id": "d-1", "workspace_id": "w-1", "users": ["u-1", "u-2"]},
+    {"domain_id": "d-1", "workspace_id": "w-2", "users": ["u-2"], "tags": []},
+    {"domain_id": "d-1", "workspace_id": "w-2", "users": "u-1", "tags": ["a", "b"]},
+]
+
+KEYWORD_FILTER = {
+    "$or": [
+        {"name": {"$regex": "ins", "$options": "i"}},
+        {"users": {"$regex": "ins", "$options": "i"}},
+    ]
+}
+
+# filters of the shape ResourceService builds, plus array and edge cases
+FILTERS = [
+    {"$and": [{"users": {"$in": ["u-1"]}}, {"users": {"$in": ["u-2"]}}]},
+    {"$and": [{"tags": {"$in": ["a"]}}, {"tags": {"$in": ["b"]}}]},
+    {"$and": [{"users": {"$nin": ["u-1"]}}, {"users": {"$nin": ["u-2"]}}]},
+    {"$and": [{"users": {"$in": [re.compile("^u-1")]}}, {"users": {"$in": ["u-2"]}}]},
+    {
+        "$and": [
+            {"domain_id": "d-1"},
+            {"workspace_id": {"$in": ["w-1", "w-2", "*", None]}},
+            {"workspace_id": {"$in": ["w-2", "w-3", "*"]}},
+            KEYWORD_FILTER,
+        ]
+    },
+    {
+        "$and": [
+            {"domain_id": "d-1"},
+            {"workspace_id": {"$nin": ["w-3"]}},
+            {"workspace_id": {"$nin": ["w-2"]}},
+            {
+                "$or": [
+                    {"workspace_id": "w-1", "project_id": {"$in": ["p-1", "p-2"]}},
+                    {"workspace_id": "w-2", "project_id": {"$in": ["p-3"]}},
+                ]
+            },
+            KEYWORD_FILTER,
+        ]
+    },
+    {
+        "$and": [
+            {"domain_id": "d-1"},
+            {"$and": [{"workspace_id": "w-1"}, {"$and": [{"project_id": "p-1"}]}]},
+            {"$or": [{"project_id": "p-1"}, {"project_id": {"$in": ["p-2"]}}]},
+        ]
+    },
+    {
+        "$and": [
+            {"domain_id": "d-1"},
+            {"$or": [{"workspace_id": {"$in": []}}, {"project_id": "p-3"}]},
+        ]
+    },
+    {"$and": [{"domain_id": "d-1"}, {"$or": [{"workspace_id": {"$in": []}}]}]},
+    {"$and": [{"domain_id": "d-1"}, {"$or": [{}, {"project_id": "p-1"}]}]},
+    {"$and": [{"domain_id": "d-1"}, {"$nor": [{"$and": [{"project_id": "p-1"}]}]}]},
+    {"$and": [{"project_id": {"$in": ["p-1", "p-1", "p-2"]}}, {"domain_id": "d-1"}]},
+]
+
+
+def get_index_fields(find_filter: dict) -> set:
+    """Returns the fields of the conditions the query planner can use an index for.
+
+    These are the conditions of the top-level $and, including nested $and. Fields
+    only used in $or, $nor or with $nin don't select an index scan on their own.
+    """
+
+    index_fields = set()
+    for key, value in find_filter.items():
+        if key == "$and":
+            for sub_filter in value:
+                index_fields |= get_index_fields(sub_filter)
+        elif key.startswith("$") or (isinstance(value, dict) and "$nin" in value):
+            continue
+        else:
+            index_fields.add(key)
+    return index_fields
+
+
+class TestFilterOptimizer(unittest.TestCase):
+    def setUp(self):
+        self.collection = mongomock.MongoClient().db.resources
+        self.collection.insert_many([dict(document) for document in DOCUMENTS])
+
+    def _find_ids(self, find_filter: dict) -> list:
+        return sorted(document["_id"] for document in self.collection.find(find_filter))
+
+    def test_optimized_filter_matches_same_documents(self):
+        for find_filter in FILTERS:
+            with self.subTest(find_filter=find_filter):
+                self.assertEqual(
+                    self._find_ids(optimize_filter(find_filter)),
+                    self._find_ids(find_filter),
+                )
+
+    def test_optimized_filter_keeps_index_fields(self):
+        for find_filter in FILTERS:
+            with self.subTest(find_filter=find_filter):
+                self.assertLessEqual(
+                    get_index_fields(find_filter),
+                    get_index_fields(optimize_filter(find_filter)),
+                )
+
+    def test_array_field_in_clauses_are_not_intersected(self):
+        self.assertEqual(
+            optimize_filter(FILTERS[0]),
+            {"$and": [{"users": {"$in": ["u-1"]}}, {"users": {"$in": ["u-2"]}}]},
+        )
+
+    def test_scalar_field_in_clauses_are_intersected(self):
+        optimized_filter = optimize_filter(FILTERS[4])
+        self.assertIn({"workspace_id": {"$in": ["*", "w-2"]}}, optimized_filter["$and"])
+
+    def test_equal_filters_are_equal(self):
+        self.assertEqual(
+            optimize_filter(
+                {"$and": [{"workspace_id": {"$in": ["w-2", "w-1"]}}, {"domain_id": 1}]}
+            ),
+            optimize_filter(
+                {"domain_id": 1, "workspace_id": {"$in": ["w-1", "w-2", "w-1"]}}
+            ),
+        )
+
+    def test_optimize_filter_is_idempotent(self):
+        for find_filter in FILTERS:
+            with self.subTest(find_filter=find_filter):
+                optimized_filter = optimize_filter(find_filter)
+                self.assertEqual(optimize_filter(optimized_filter), optimized_filter)
+
+
+if __name__ == "__main__":
+    unittest.main()
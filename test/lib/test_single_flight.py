@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from cloudforet.search.lib.single_flight import (
+    AsyncSingleFlight,
+    SingleFlight,
+    make_flight_key,
+)
+from cloudforet.search.model.resource.request import ResourceSearchRequest
+from cloudforet.search.service.resource import ResourceService
+
+WAITERS = 4
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def _run_together(self, flight: SingleFlight, func: callable) -> list:
+        """Starts WAITERS callers of one key and lets the leader finish only
+        after the others are waiting on it."""
+
+        def wait_for_waiters():
+            self.calls += 1
+            self.release.wait(5)
+            return func()
+
+        with ThreadPoolExecutor(max_workers=WAITERS) as executor:
+            futures = [
+                executor.submit(flight.do, "key", wait_for_waiters)
+                for _ in range(WAITERS)
+            ]
+            while flight._calls.get("key") is None or (
+                flight._calls["key"].waiters < WAITERS - 1
+            ):
+                time.sleep(0.01)
+            self.release.set()
+
+        return [future.exception() or future.result() for future in futures]
+
+    def test_waiters_get_their_own_copy(self):
+        results = self._run_together(
+            SingleFlight("test"), lambda: {"results": [{"name": "web"}]}
+        )
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len({id(result) for result in results}), WAITERS)
+        results[0]["results"][0]["name"] = "changed"
+        for result in results[1:]:
+            self.assertEqual(result, {"results": [{"name": "web"}]})
+
+    def test_waiters_share_the_result_without_copy(self):
+        results = self._run_together(
+            SingleFlight("test", copy_result=False), lambda: {"results": []}
+        )
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len({id(result) for result in results}), 1)
+
+    def test_error_is_raised_to_every_waiter(self):
+        error = ValueError("search failed")
+
+        def fail():
+            raise error
+
+        results = self._run_together(SingleFlight("test"), fail)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [error] * WAITERS)
+
+    def test_next_call_runs_again(self):
+        flight = SingleFlight("test")
+        func = mock.Mock(side_effect=[{"total_count": 1}, {"total_count": 2}])
+
+        self.assertEqual(flight.do("key", func), {"total_count": 1})
+        self.assertEqual(flight.do("key", func), {"total_count": 2})
+        self.assertEqual(flight._calls, {})
+
+
+class TestAsyncSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+
+    def _run_together(self, flight: AsyncSingleFlight, func: callable) -> list:
+        async def run():
+            async def wait_for_waiters():
+                self.calls += 1
+                await asyncio.sleep(0.01)
+                return func()
+
+            return await asyncio.gather(
+                *[flight.do("key", wait_for_waiters) for _ in range(WAITERS)],
+                return_exceptions=True,
+            )
+
+        return asyncio.run(run())
+
+    def test_waiters_get_their_own_copy(self):
+        results = self._run_together(
+            AsyncSingleFlight("test"), lambda: {"results": [{"name": "web"}]}
+        )
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len({id(result) for result in results}), WAITERS)
+        results[0]["results"][0]["name"] = "changed"
+        for result in results[1:]:
+            self.assertEqual(result, {"results": [{"name": "web"}]})
+
+    def test_error_is_raised_to_every_waiter(self):
+        error = ValueError("search failed")
+
+        def fail():
+            raise error
+
+        results = self._run_together(AsyncSingleFlight("test"), fail)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [error] * WAITERS)
+
+
+class TestSearchFlightKey(unittest.TestCase):
+    def setUp(self):
+        self.resource_svc = ResourceService()
+        self.params = ResourceSearchRequest(
+            resource_type="identity.Project",
+            keyword="web",
+            domain_id="d-1",
+            workspace_id="w-1",
+        )
+
+    def _make_key(self, token: str, user_id: str, role_type: str, **params) -> str:
+        self.resource_svc.transaction.set_meta("token", token)
+        return self.resource_svc._make_search_flight_key(
+            self.params.copy(update=params), user_id, role_type
+        )
+
+    def test_principals_never_share_a_key(self):
+        key = self._make_key("token-1", "u-1", "WORKSPACE_MEMBER")
+
+        self.assertEqual(key, self._make_key("token-1", "u-1", "WORKSPACE_MEMBER"))
+        for principal, params in [
+            (("token-2", "u-1", "WORKSPACE_MEMBER"), {}),
+            (("token-1", "u-2", "WORKSPACE_MEMBER"), {}),
+            (("token-1", "u-1", "WORKSPACE_OWNER"), {}),
+            (("token-1", "u-1", "WORKSPACE_MEMBER"), {"domain_id": "d-2"}),
+            (("token-1", "u-1", "WORKSPACE_MEMBER"), {"workspace_id": "w-2"}),
+            (("token-1", "u-1", "WORKSPACE_MEMBER"), {"user_projects": ["p-1"]}),
+        ]:
+            with self.subTest(principal=principal, params=params):
+                self.assertNotEqual(self._make_key(*principal, **params), key)
+
+    def test_key_parts_do_not_run_together(self):
+        self.assertNotEqual(
+            make_flight_key("d-1", "u-1", None), make_flight_key("d-1", "u-1None")
+        )
+        self.assertNotEqual(
+            make_flight_key("d-1", "u", "-1"), make_flight_key("d-1", "u-", "1")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import threading
+import unittest
+from unittest import mock
+
+from pymongo.errors import OperationFailure
+
+from cloudforet.search.manager.identity_change_manager import IdentityChangeManager
+
+
+class FakeChangeStream:
+    """Replica set stand-in that replays change events like a pymongo ChangeStream."""
+
+    def __init__(self, changes: list, resume_after: dict = None):
+        self.changes = list(changes)
+        self.resume_token = resume_after
+        self.alive = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.alive = False
+
+    def try_next(self):
+        if not self.changes:
+            self.alive = False
+            return None
+
+        change = self.changes.pop(0)
+        self.resume_token = change["_id"]
+        return change
+
+
+class FakeDatabase:
+    def __init__(self, *streams):
+        self.streams = list(streams)
+        self.watch_options = []
+
+    def watch(self, pipeline: list, **options):
+        self.watch_options.append(options)
+        stream = self.streams.pop(0)
+        if isinstance(stream, Exception):
+            raise stream
+        return FakeChangeStream(stream, options.get("resume_after"))
+
+
+def make_change(token: int, collection_name: str, operation_type: str, **document):
+    return {
+        "_id": {"_data": str(token)},
+        "operationType": operation_type,
+        "ns": {"db": "identity", "coll": collection_name},
+        "fullDocument": document or None,
+    }
+
+
+class TestIdentityChangeManager(unittest.TestCase):
+    def setUp(self):
+        self.workspace_directory_mgr = mock.patch(
+            "cloudforet.search.manager.identity_change_manager.WorkspaceDirectoryManager"
+        ).start()
+        self.project_group_tree_mgr = mock.patch(
+            "cloudforet.search.manager.identity_change_manager.ProjectGroupTreeManager"
+        ).start()
+        self.cache_mgr = mock.patch(
+            "cloudforet.search.manager.identity_change_manager.CacheManager"
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _make_manager(self, database: FakeDatabase) -> IdentityChangeManager:
+        identity_change_mgr = IdentityChangeManager()
+        identity_change_mgr.client = {identity_change_mgr.db_name: database}
+        return identity_change_mgr
+
+    def test_role_binding_change_resets_domain_directory(self):
+        identity_change_mgr = self._make_manager(FakeDatabase())
+
+        identity_change_mgr.handle_change(
+            make_change(1, "role_binding", "insert", domain_id="d-1", user_id="u-1")
+        )
+
+        self.workspace_directory_mgr.return_value.reset.assert_called_once_with("d-1")
+        self.cache_mgr.return_value.delete_role_binding_caches.assert_called_once_with(
+            "d-1", "u-1"
+        )
+
+    def test_project_update_keeps_access_scope_without_access_change(self):
+        identity_change_mgr = self._make_manager(FakeDatabase())
+        change = make_change(1, "project", "update", domain_id="d-1", project_id="p-1")
+        change["updateDescription"] = {"updatedFields": {"name": "renamed"}}
+
+        identity_change_mgr.handle_change(change)
+
+        cache_mgr = self.cache_mgr.return_value
+        cache_mgr.delete_project_cache.assert_called_once_with("d-1", "p-1")
+        cache_mgr.delete_access_scope_caches.assert_not_called()
+
+    def test_watch_resumes_from_own_position(self):
+        database = FakeDatabase(
+            [
+                make_change(1, "workspace", "update", domain_id="d-1"),
+                make_change(2, "project_group", "insert", domain_id="d-1"),
+            ],
+            [],
+        )
+        identity_change_mgr = self._make_manager(database)
+
+        identity_change_mgr._watch_changes(threading.Event())
+        identity_change_mgr._watch_changes(threading.Event())
+
+        self.assertEqual(database.watch_options[0]["resume_after"], None)
+        self.assertEqual(database.watch_options[1]["resume_after"], {"_data": "2"})
+        # caches are reset only when the stream starts without a position
+        self.cache_mgr.return_value.delete_identity_caches.assert_called_once()
+
+    def test_resume_token_is_not_shared_between_processes(self):
+        first_mgr = self._make_manager(
+            FakeDatabase([make_change(1, "workspace", "update", domain_id="d-1")])
+        )
+        first_mgr._watch_changes(threading.Event())
+
+        database = FakeDatabase([])
+        second_mgr = self._make_manager(database)
+        second_mgr._watch_changes(threading.Event())
+
+        self.assertEqual(database.watch_options[0]["resume_after"], None)
+        self.assertEqual(self.project_group_tree_mgr.return_value.reset.call_count, 2)
+        self.assertEqual(
+            self.workspace_directory_mgr.return_value.reset.call_args_list[-1],
+            mock.call(),
+        )
+
+    def test_unresumable_stream_resets_caches(self):
+        stop_event = threading.Event()
+        database = FakeDatabase(
+            OperationFailure("resume point no longer in oplog", code=286), []
+        )
+        identity_change_mgr = self._make_manager(database)
+        identity_change_mgr._save_resume_token({"_data": "1"})
+        identity_change_mgr.handle_change = mock.Mock(
+            side_effect=lambda change: stop_event.set()
+        )
+        database.streams[1] = [make_change(2, "workspace", "update", domain_id="d-1")]
+
+        identity_change_mgr.watch(stop_event)
+
+        self.assertEqual(database.watch_options[0]["resume_after"], {"_data": "1"})
+        self.assertEqual(database.watch_options[1]["resume_after"], None)
+        self.cache_mgr.return_value.delete_identity_caches.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from spaceone.core import config
+
+from cloudforet.search.lib.search_plan import compile_search_plans
+from cloudforet.search.manager.ngram_index_manager import NgramIndexManager
+from cloudforet.search.service.resource import ResourceService
+
+MODULE = "cloudforet.search.manager.ngram_index_manager"
+
+PLAN = compile_search_plans(
+    {
+        "inventory.CloudService": {
+            "request": {"search": ["name"], "ngram_index": True},
+            "response": {"resource_id": "cloud_service_id", "name": "{name}"},
+        }
+    }
+)["inventory.CloudService"]
+
+
+class TestNgramIndexManager(unittest.TestCase):
+    def setUp(self):
+        # the index is only searched while the change stream keeps it up to date
+        mock.patch.dict(
+            "spaceone.core.config._GLOBAL",
+            {"SEARCH_INDEX_CHANGE_STREAM": {"enabled": True}},
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.ngram_index_mgr = NgramIndexManager()
+        db_name, collection_name = self.ngram_index_mgr._get_collection_and_db_name(
+            NgramIndexManager.index_resource_type
+        )
+        self.index_collection = self.ngram_index_mgr.client[db_name][collection_name]
+        db_name, collection_name = self.ngram_index_mgr._get_collection_and_db_name(
+            NgramIndexManager.state_resource_type
+        )
+        self.state_collection = self.ngram_index_mgr.client[db_name][collection_name]
+        for collection in [self.index_collection, self.state_collection]:
+            collection.delete_many({})
+
+        self._index("d-1", "cs-1", "web-server")
+        self._index("d-1", "cs-2", "Web-Frontend")
+        self._index("d-1", "cs-3", "database")
+        self._index("d-2", "cs-4", "web-server")
+        self.ngram_index_mgr._set_index_state(
+            "d-1", PLAN.resource_type, "READY", datetime.utcnow()
+        )
+
+    def _index(self, domain_id: str, resource_id: str, name: str):
+        self.index_collection.insert_one(
+            {
+                "resource_type": PLAN.resource_type,
+                "resource_id": resource_id,
+                "domain_id": domain_id,
+                "grams": sorted(self.ngram_index_mgr.make_ngrams(name)),
+            }
+        )
+
+    def test_candidates_are_the_resources_with_every_keyword_ngram(self):
+        self.assertCountEqual(
+            self.ngram_index_mgr.find_candidate_ids("d-1", PLAN, "WEB-"),
+            ["cs-1", "cs-2"],
+        )
+        self.assertEqual(
+            self.ngram_index_mgr.find_candidate_ids("d-1", PLAN, "server"), ["cs-1"]
+        )
+        self.assertEqual(
+            self.ngram_index_mgr.find_candidate_ids("d-1", PLAN, "missing"), []
+        )
+
+    def test_too_many_candidates_fall_back_to_regex(self):
+        with mock.patch(f"{MODULE}.NGRAM_MAX_CANDIDATES", 1):
+            self.assertIsNone(
+                self.ngram_index_mgr.find_candidate_ids("d-1", PLAN, "web")
+            )
+            self.assertEqual(
+                self.ngram_index_mgr.find_candidate_ids("d-1", PLAN, "data"), ["cs-3"]
+            )
+
+    def test_regex_and_short_keywords_fall_back_to_regex(self):
+        for keyword in ["web.*", "web-(1)", "data|web", "we"]:
+            with self.subTest(keyword=keyword):
+                self.assertIsNone(
+                    self.ngram_index_mgr.find_candidate_ids("d-1", PLAN, keyword)
+                )
+
+    def test_index_not_ready_falls_back_to_regex(self):
+        self.assertIsNone(self.ngram_index_mgr.find_candidate_ids("d-2", PLAN, "web"))
+
+        self.ngram_index_mgr.set_index_stale("d-1", PLAN.resource_type)
+        self.assertIsNone(self.ngram_index_mgr.find_candidate_ids("d-1", PLAN, "web"))
+
+        self.ngram_index_mgr._set_index_state(
+            "d-2", PLAN.resource_type, "READY", datetime.utcnow()
+        )
+        config.set_global_force(SEARCH_INDEX_CHANGE_STREAM={"enabled": False})
+        self.assertIsNone(self.ngram_index_mgr.find_candidate_ids("d-2", PLAN, "web"))
+
+    def test_candidates_narrow_the_regex_filter(self):
+        resource_svc = ResourceService()
+        find_filter = {"$and": [{"domain_id": "d-1"}, *PLAN.bind_filter(".*web.*")]}
+
+        self.assertEqual(
+            resource_svc._add_candidate_filter(find_filter, "d-1", PLAN, "web"),
+            {
+                "$and": [
+                    find_filter,
+                    {"cloud_service_id": {"$in": ["cs-1", "cs-2"]}},
+                ]
+            },
+        )
+        self.assertIs(
+            resource_svc._add_candidate_filter(find_filter, "d-1", PLAN, "web.*"),
+            find_filter,
+        )
+        with mock.patch(f"{MODULE}.NGRAM_MAX_CANDIDATES", 1):
+            self.assertIs(
+                resource_svc._add_candidate_filter(find_filter, "d-1", PLAN, "web"),
+                find_filter,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import threading
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from cloudforet.search.manager.search_index_change_manager import (
+    LEASE_RESOURCE_TYPE,
+    SearchIndexChangeManager,
+)
+
+MODULE = "cloudforet.search.manager.search_index_change_manager"
+
+
+def make_plan(resource_type: str, search_index: bool = True) -> SimpleNamespace:
+    return SimpleNamespace(
+        resource_type=resource_type,
+        search_index=search_index,
+        ngram_index=False,
+        match="contains",
+    )
+
+
+def make_change(collection_name: str, document_id) -> dict:
+    return {
+        "operationType": "update",
+        "ns": {"db": "identity", "coll": collection_name},
+        "documentKey": {"_id": document_id},
+    }
+
+
+class TestSearchIndexChangeManager(unittest.TestCase):
+    def setUp(self):
+        self.project_plan = make_plan("identity.Project")
+        self.dashboard_plan = make_plan("dashboard.PublicDashboard")
+        mock.patch(
+            f"{MODULE}.get_search_plans",
+            return_value={
+                "identity.Project": self.project_plan,
+                "identity.Workspace": make_plan("identity.Workspace", False),
+                "dashboard.PublicDashboard": self.dashboard_plan,
+            },
+        ).start()
+        self.search_index_mgr = mock.patch(f"{MODULE}.SearchIndexManager").start()
+        mock.patch(f"{MODULE}.NgramIndexManager").start()
+        mock.patch(f"{MODULE}.PrefixIndexManager").start()
+        self.project_group_tree_mgr = mock.patch(
+            f"{MODULE}.ProjectGroupTreeManager"
+        ).start()
+        self.cache_mgr = mock.patch(f"{MODULE}.CacheManager").start()
+        self.addCleanup(mock.patch.stopall)
+
+        change_mgr = SearchIndexChangeManager("identity")
+        db_name, collection_name = change_mgr._get_collection_and_db_name(
+            LEASE_RESOURCE_TYPE
+        )
+        self.identity_db = change_mgr.client["identity"]
+        self.lease_collection = change_mgr.client[db_name][collection_name]
+        for collection in [
+            self.identity_db["project"],
+            self.identity_db["project_group"],
+            self.lease_collection,
+        ]:
+            collection.delete_many({})
+
+    def test_only_one_process_holds_the_lease(self):
+        first_mgr = SearchIndexChangeManager("identity")
+        second_mgr = SearchIndexChangeManager("identity")
+
+        self.assertTrue(first_mgr._hold_lease())
+        self.assertFalse(second_mgr._hold_lease())
+
+        # renewing keeps the lease with its holder
+        first_mgr._lease_renew_at = None
+        self.assertTrue(first_mgr._hold_lease())
+        self.assertFalse(second_mgr._hold_lease())
+
+    def test_expired_lease_is_taken_over(self):
+        first_mgr = SearchIndexChangeManager("identity")
+        second_mgr = SearchIndexChangeManager("identity")
+        first_mgr._hold_lease()
+
+        self.lease_collection.update_one(
+            {"_id": "identity"},
+            {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}},
+        )
+
+        self.assertTrue(second_mgr._hold_lease())
+        first_mgr._lease_renew_at = None
+        self.assertFalse(first_mgr._hold_lease())
+
+    def test_released_lease_is_taken_over(self):
+        first_mgr = SearchIndexChangeManager("identity")
+        second_mgr = SearchIndexChangeManager("identity")
+        first_mgr._hold_lease()
+
+        first_mgr._release_lease()
+
+        self.assertTrue(second_mgr._hold_lease())
+
+    def test_watch_waits_without_the_lease(self):
+        SearchIndexChangeManager("identity")._hold_lease()
+        change_mgr = SearchIndexChangeManager("identity")
+        change_mgr._watch_changes = mock.Mock()
+        stop_event = threading.Event()
+        stop_event.wait = mock.Mock(side_effect=lambda timeout: stop_event.set())
+
+        change_mgr.watch(stop_event)
+
+        change_mgr._watch_changes.assert_not_called()
+
+    def test_project_group_change_reindexes_domain_entries(self):
+        project_group_id = self.identity_db["project_group"].insert_one(
+            {"domain_id": "d-1", "project_group_id": "pg-1", "name": "renamed"}
+        ).inserted_id
+        change_mgr = SearchIndexChangeManager("identity")
+
+        change_mgr.handle_changes([make_change("project_group", project_group_id)])
+
+        self.project_group_tree_mgr.return_value.apply_changes.assert_called_once()
+        self.assertEqual(
+            self.search_index_mgr.return_value.index_source_filter.call_args_list,
+            [
+                mock.call(self.project_plan, {"domain_id": "d-1"}),
+                mock.call(self.dashboard_plan, {"domain_id": "d-1"}),
+            ],
+        )
+
+    def test_project_change_reindexes_referring_dashboards(self):
+        project_id = self.identity_db["project"].insert_one(
+            {"domain_id": "d-1", "project_id": "p-1", "name": "renamed"}
+        ).inserted_id
+        change_mgr = SearchIndexChangeManager("identity")
+
+        change_mgr.handle_changes([make_change("project", project_id)])
+
+        search_index_mgr = self.search_index_mgr.return_value
+        search_index_mgr.index_source_ids.assert_called_once_with(
+            self.project_plan, [project_id]
+        )
+        search_index_mgr.index_source_filter.assert_called_once_with(
+            self.dashboard_plan, {"domain_id": "d-1", "project_id": {"$in": ["p-1"]}}
+        )
+        self.cache_mgr.return_value.delete_project_cache.assert_called_once_with(
+            "d-1", "p-1"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()